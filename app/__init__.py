@@ -8,6 +8,46 @@ def create_app(test_config=None):
         SECRET_KEY='dev',
         DATABASE=os.path.join(app.instance_path, 'attendance.sqlite'),
         UPLOAD_FOLDER=os.path.join(app.static_folder, 'member_images'),
+        GALLERY_SNAPSHOT_DIR=os.path.join(app.instance_path, 'gallery'),
+        # Recognition budget shared by all cameras (None = derive from CPU count)
+        RECOGNITION_SLOTS=None,
+        RECOGNITION_THREADS=None,
+        RECOGNITION_WORKERS=0,
+        # Scheduling weight per camera ID, e.g. {0: 3.0} for a busy entrance
+        CAMERA_WEIGHTS={},
+        # Stream tiers selectable with /camera/stream?profile=<name> (height None = capture size)
+        STREAM_PROFILES={
+            'full': {'height': None, 'quality': 95, 'fps': None},
+            '720p': {'height': 720, 'quality': 80, 'fps': 15},
+            '480p': {'height': 480, 'quality': 70, 'fps': 10},
+            '320p': {'height': 320, 'quality': 60, 'fps': 5},
+        },
+        # Ask cameras for raw MJPEG so streams can forward it without re-encoding.
+        # Only used while recognition is off and no client needs re-encoded frames
+        CAMERA_MJPEG_PASSTHROUGH=False,
+        # Camera IDs backed by recordings or generated frames instead of a device, e.g.
+        # {100: 'video:/recordings/entrance.mp4?pacing=fast', 101: 'synthetic:?seed=1'}
+        CAMERA_SOURCES={},
+        # Unix socket of a camera daemon (camera_daemon.py); None = cameras run in the web process
+        CAMERA_DAEMON_SOCKET=None,
+        # Processes for group-photo detection and encoding (None = CPU count)
+        GROUP_PHOTO_WORKERS=None,
+        # Background threads extracting face encodings from member photos
+        ENROLLMENT_WORKERS=1,
+        # Processes encoding photos for bulk member imports (None = CPU count)
+        IMPORT_WORKERS=None,
+        # Faces closer than this to an enrolled member are flagged as possible duplicates
+        DUPLICATE_FACE_THRESHOLD=0.45,
+        # Compact gallery index for large rosters: None (exact), 'float16', 'int8' or 'pq'
+        GALLERY_QUANTIZATION=None,
+        # Candidates from the index re-checked against the exact encodings
+        GALLERY_RERANK=16,
+        # Without a roster, members are matched first if they attended at least
+        # ROSTER_MIN_ATTENDED of the last ROSTER_HISTORY_MEETINGS meetings with a similar title
+        ROSTER_HISTORY_MEETINGS=10,
+        ROSTER_MIN_ATTENDED=1,
+        # Roster matches closer than this are accepted without searching the full gallery
+        ROSTER_MATCH_TOLERANCE=0.5,
     )
 
     if test_config is None:
@@ -32,6 +72,25 @@ def create_app(test_config=None):
     from app.camera import routes as camera_routes
     app.register_blueprint(camera_routes.bp)
     
+    from app.camera.offline import process_video_command
+    app.cli.add_command(process_video_command)
+    
+    from app.camera.bulk_import import import_members_command
+    app.cli.add_command(import_members_command)
+    
+    from app.camera.reencode import reencode_gallery_command
+    app.cli.add_command(reencode_gallery_command)
+    
+    from app.camera.member_images import generate_image_derivatives_command, member_image_url
+    app.cli.add_command(generate_image_derivatives_command)
+    app.add_template_global(member_image_url)
+    
+    from app.camera.duplicates import find_duplicates_command
+    app.cli.add_command(find_duplicates_command)
+    
+    from app.camera.gallery_benchmark import benchmark_gallery_command
+    app.cli.add_command(benchmark_gallery_command)
+    
     from app.routes import members, meetings, admin, main
     app.register_blueprint(members.bp)
     app.register_blueprint(meetings.bp)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import MultiDict
+from app.camera.utils.stream_encoder import parse_stream_profile
+
+class Broadcast:
+    """Latest-value channel: one producer, any number of async subscribers.
+
+    Subscribers always get the newest value; a slow viewer skips frames
+    instead of building up a queue.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.version = 0
+        self.subscribers = 0
+        self.closed = False
+        self.condition = asyncio.Condition()
+
+    async def publish(self, value):
+        async with self.condition:
+            self.value = value
+            self.version += 1
+            self.condition.notify_all()
+
+    async def close(self):
+        async with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    async def wait(self, version):
+        """Wait for a value newer than version.
+
+        Returns:
+            (version, value), or None once the channel is closed
+        """
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.version != version or self.closed)
+            if self.closed:
+                return None
+            return self.version, self.value
+
+class AsyncStreamingApp:
+    """ASGI app serving camera streams and overlay events from one event loop.
+
+    /camera/stream and /camera/overlays are served here: each distinct
+    stream (camera, show_faces, profile, passthrough) has a single producer
+    task that pulls frames from the camera in a worker thread and broadcasts
+    them to every viewer, so a hundred viewers cost one encode per frame and
+    no threads each. Every other request is passed to the Flask app.
+    """
+
+    # Paths handled here instead of by the Flask blueprint
+    STREAM_PATH = '/camera/stream'
+    OVERLAYS_PATH = '/camera/overlays'
+
+    def __init__(self, flask_app, fallback):
+        """Create the ASGI app.
+
+        Args:
+            flask_app: Flask app providing config and camera access
+            fallback: ASGI app for all other requests (the Flask app wrapped for ASGI)
+        """
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.channels = {}  # {stream key: Broadcast}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.STREAM_PATH:
+            await self._serve_stream(scope, receive, send)
+        elif scope["type"] == "http" and scope["path"] == self.OVERLAYS_PATH:
+            await self._serve_overlays(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for channel in list(self.channels.values()):
+                    await channel.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _get_camera(self, camera_id, start=False):
+        """Look up (and optionally start) a camera; runs in a worker thread."""
+        from app.camera.routes import get_camera_manager
+
+        with self.flask_app.app_context():
+            camera_manager = get_camera_manager()
+            camera = camera_manager.get(camera_id)
+            if camera is None and start:
+                camera = camera_manager.start(camera_id if camera_id is not None else 0)
+            return camera
+
+    async def _serve_stream(self, scope, receive, send):
+        """Serve an MJPEG stream with the same query arguments as the Flask route."""
+        args = MultiDict(parse_qsl(scope.get("query_string", b"").decode('latin-1')))
+        camera_id = args.get('id', default=0, type=int)
+        show_faces = args.get('show_faces', default='false').lower() == 'true'
+        passthrough = args.get('passthrough', default='false').lower() == 'true'
+        profile = parse_stream_profile(args, self.flask_app.config['STREAM_PROFILES'])
+        if profile is None:
+            await self._send_text(send, 400, "Unknown stream profile")
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            camera = await loop.run_in_executor(None, self._get_camera, camera_id, True)
+        except RuntimeError:
+            camera = None
+        if camera is None:
+            await self._send_text(send, 404, "Camera not available")
+            return
+
+        key = ("stream", camera_id, show_faces, profile, passthrough)
+        producer = lambda channel: self._produce_frames(channel, camera, show_faces, profile, passthrough)
+
+        def render(value):
+            frame, sequence = value
+            sequence_header = f'X-Frame-Sequence: {sequence}\r\n'.encode() if sequence is not None else b''
+            return (b'--frame\r\n'
+                    b'Content-Type: image/jpeg\r\n' + sequence_header + b'\r\n' + frame + b'\r\n')
+
+        await self._serve_channel(send, receive, key, producer, render,
+                                  'multipart/x-mixed-replace; boundary=frame')
+
+    async def _serve_overlays(self, scope, receive, send):
+        """Serve overlay server-sent events like the Flask route."""
+        args = MultiDict(parse_qsl(scope.get("query_string", b"").decode('latin-1')))
+        camera_id = args.get('id', default=None, type=int)
+
+        loop = asyncio.get_running_loop()
+        camera = await loop.run_in_executor(None, self._get_camera, camera_id)
+        if camera is None:
+            await self._send_text(send, 400, "No active camera")
+            return
+
+        key = ("overlays", camera.camera_id)
+        producer = lambda channel: self._produce_overlays(channel, camera)
+        render = lambda overlay: f"data: {json.dumps(overlay)}\n\n".encode('utf-8')
+
+        await self._serve_channel(send, receive, key, producer, render, 'text/event-stream',
+                                  keepalive=b": keepalive\n\n")
+
+    async def _serve_channel(self, send, receive, key, producer, render, content_type, keepalive=None):
+        """Subscribe a client to a broadcast channel until it disconnects."""
+        channel = self.channels.get(key)
+        if channel is None or channel.closed:
+            channel = self.channels[key] = Broadcast()
+            asyncio.create_task(self._run_producer(key, channel, producer))
+        channel.subscribers += 1
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+
+        async def forward():
+            version = 0
+            while True:
+                try:
+                    update = await asyncio.wait_for(channel.wait(version), timeout=15.0)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    if keepalive:
+                        await send({"type": "http.response.body", "body": keepalive, "more_body": True})
+                    continue
+                if update is None:
+                    return
+                version, value = update
+                await send({"type": "http.response.body", "body": render(value), "more_body": True})
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        sender = asyncio.create_task(forward())
+        watcher = asyncio.create_task(wait_for_disconnect())
+        try:
+            done, pending = await asyncio.wait({sender, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            if sender in done and not watcher.done():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        except Exception as e:
+            print(f"Error streaming to client: {e}")
+        finally:
+            channel.subscribers -= 1
+
+    async def _run_producer(self, key, channel, producer):
+        try:
+            await producer(channel)
+        except Exception as e:
+            print(f"Error in stream producer: {e}")
+        finally:
+            if self.channels.get(key) is channel:
+                del self.channels[key]
+            await channel.close()
+
+    async def _produce_frames(self, channel, camera, show_faces, profile, passthrough):
+        """Pull new frames from the camera and broadcast them while anyone is watching."""
+        loop = asyncio.get_running_loop()
+        frame_interval = 1.0 / profile.fps if profile.fps else 0.0
+        last_sequence = None
+        last_check = loop.time()
+
+        # Let the first viewer's subscription land before checking for viewers
+        await asyncio.sleep(0)
+        while channel.subscribers > 0:
+            # Stop once the camera has been stopped through the web UI
+            if loop.time() - last_check > 1.0:
+                last_check = loop.time()
+                current = await loop.run_in_executor(None, self._get_camera, camera.camera_id)
+                if current is None:
+                    return
+
+            frame, sequence = await loop.run_in_executor(
+                None, camera.get_frame_with_sequence, show_faces, profile, passthrough
+            )
+            if frame is None or (sequence is not None and sequence == last_sequence):
+                await asyncio.sleep(0.01)
+                continue
+
+            last_sequence = sequence
+            await channel.publish((frame, sequence))
+            if frame_interval:
+                await asyncio.sleep(frame_interval)
+
+    async def _produce_overlays(self, channel, camera, interval=0.05):
+        """Broadcast each new overlay while anyone is subscribed."""
+        loop = asyncio.get_running_loop()
+        last_timestamp = None
+
+        await asyncio.sleep(0)
+        while channel.subscribers > 0:
+            overlay = await loop.run_in_executor(None, camera.get_overlay)
+            timestamp = overlay["timestamp"] if overlay else None
+            if timestamp != last_timestamp:
+                last_timestamp = timestamp
+                await channel.publish(overlay)
+            await asyncio.sleep(interval)
+
+    async def _send_text(self, send, status, text):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        })
+        await send({"type": "http.response.body", "body": text.encode('utf-8')})
+
+def create_asgi_app(flask_app):
+    """Wrap the Flask app for an ASGI server, with async camera streaming.
+
+    Requires asgiref (and an ASGI server such as uvicorn to run it).
+    """
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        raise RuntimeError("Async streaming requires asgiref: pip install asgiref uvicorn")
+
+    return AsyncStreamingApp(flask_app, WsgiToAsgi(flask_app))
@@ -0,0 +1,332 @@
+import csv
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+import click
+import cv2
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+REPORT_FIELDS = ['row', 'name', 'status', 'member_id', 'message']
+
+def _init_worker():
+    # Each process already gets its own core; don't let OpenCV oversubscribe them
+    cv2.setNumThreads(1)
+
+def _extract(task):
+    """Encode the face in one photo and write its sized copies (runs in a worker process).
+
+    Returns:
+        (encoding or None, error message or None, derivatives or None)
+    """
+    from app.camera.enrollment import extract_face_encoding
+    from app.camera.member_images import make_derivatives
+
+    data, image_path, upload_folder = task
+    if data is None:
+        return None, None, None
+    try:
+        variants = make_derivatives(data, image_path, upload_folder)
+        return extract_face_encoding(data), None, variants
+    except Exception as e:
+        return None, str(e), None
+
+class PhotoSource:
+    """Member photos in a directory or a zip archive, read one at a time.
+
+    Archives are never extracted; each photo is decompressed into memory
+    when its row is reached, so memory stays flat however big the archive.
+    Photos are looked up by their path in the source, falling back to the
+    file name alone (case-insensitive), so archives with a top-level folder work.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = None
+        self.by_name = {}  # {lower-case file name: path or ZipInfo}
+        self.by_path = {}
+
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            for info in self.archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(PHOTO_EXTENSIONS):
+                    self._add(info.filename, info)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in files:
+                    if filename.lower().endswith(PHOTO_EXTENSIONS):
+                        full_path = os.path.join(root, filename)
+                        self._add(os.path.relpath(full_path, path).replace(os.sep, '/'), full_path)
+        else:
+            raise ValueError(f"{path} is neither a directory nor a zip archive")
+
+    def _add(self, relative_path, entry):
+        self.by_path[relative_path.lower()] = entry
+        self.by_name.setdefault(os.path.basename(relative_path).lower(), entry)
+
+    def find(self, name):
+        """Return the entry for a photo name, or None."""
+        name = name.strip().replace('\\', '/').lower()
+        return self.by_path.get(name) or self.by_name.get(os.path.basename(name))
+
+    def read(self, entry):
+        if self.archive is not None:
+            return self.archive.read(entry)
+        with open(entry, 'rb') as f:
+            return f.read()
+
+    def entry_name(self, entry):
+        return entry.filename if self.archive is not None else entry
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+def _parse_row(row):
+    """Validate one CSV row.
+
+    Returns:
+        (member fields dict, error message or None)
+    """
+    name = (row.get('name') or '').strip()
+    if not name:
+        return None, 'Name is required.'
+
+    age = (row.get('age') or '').strip()
+    try:
+        age = int(age) if age else None
+    except ValueError:
+        return None, f'Age "{age}" is not a number.'
+
+    return {
+        "name": name,
+        "major": (row.get('major') or '').strip() or None,
+        "age": age,
+        "bio": (row.get('bio') or '').strip() or None,
+    }, None
+
+def _photo_for(row, member, photos):
+    """Find a row's photo: the photo column, else a file named after the member."""
+    if photos is None:
+        return None
+    if (row.get('photo') or '').strip():
+        return photos.find(row['photo'])
+    stem = member['name'].replace(' ', '_').lower()
+    for ext in PHOTO_EXTENSIONS:
+        entry = photos.find(stem + ext) or photos.find(member['name'] + ext)
+        if entry is not None:
+            return entry
+    return None
+
+def _save_photo(member, entry_name, data):
+    """Write a profile photo to the upload folder and return its file name."""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    ext = os.path.splitext(entry_name)[1].lower()
+    stem = secure_filename(member['name'].replace(' ', '_').lower()) or 'member'
+    filename = f"{stem}{ext}"
+    counter = 1
+    while os.path.exists(os.path.join(upload_folder, filename)):
+        counter += 1
+        filename = f"{stem}_{counter}{ext}"
+    with open(os.path.join(upload_folder, filename), 'wb') as f:
+        f.write(data)
+    return filename
+
+def import_members(csv_lines, photos_path=None, workers=None, batch_size=100, progress=print):
+    """Create members from CSV rows, encoding their photos on a process pool.
+
+    Rows are read and handled in batches: while the pool encodes one
+    batch's photos, the previous batch is inserted in a single transaction.
+    Must be called inside an app context.
+
+    Args:
+        csv_lines: Iterable of CSV lines with a header row; columns are name
+                   (required), major, age, bio and photo (file name in the
+                   photo source; defaults to the member's name)
+        photos_path: Directory or zip archive of photos (None = no photos)
+        workers: Number of processes (default: CPU count)
+        batch_size: Rows per batch and per transaction
+        progress: Callable receiving progress messages
+
+    Returns:
+        List of report dicts (row, name, status, member_id, message), one
+        per CSV row; status is "created", "no_face", "no_photo" or "failed"
+    """
+    from app.database.members import create_members_batch, save_image_variants
+
+    photos = PhotoSource(photos_path) if photos_path else None
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    report = []
+
+    def submit(pool, batch):
+        tasks = [(item.pop("data"), item["member"].get("image_path"), upload_folder) for item in batch]
+        return pool.map_async(_extract, tasks)
+
+    def insert(batch, result):
+        members = []
+        image_variants = []
+        for item, (encoding, error, variants) in zip(batch, result.get()):
+            item["member"]["face_encoding"] = encoding
+            members.append(item["member"])
+            if variants:
+                image_variants.append((item["member"]["image_path"], variants))
+            if item["status"] == "created" and encoding is None:
+                item["status"] = "no_face"
+                item["message"] = error or 'No face detected in the photo.'
+
+        try:
+            member_ids = create_members_batch(members)
+        except Exception as e:
+            print(f"Error inserting imported members: {e}")
+            member_ids = [None] * len(batch)
+            for item in batch:
+                item["status"], item["message"] = "failed", f'Database error: {e}'
+
+        # The members are committed either way; pages fall back to the original
+        # photo, and generate-image-derivatives can record the variants later
+        if image_variants and member_ids[0] is not None:
+            try:
+                save_image_variants(image_variants)
+            except Exception as e:
+                print(f"Error saving image variants: {e}")
+
+        for item, member_id in zip(batch, member_ids):
+            report.append({
+                "row": item["row"], "name": item["member"]["name"], "status": item["status"],
+                "member_id": member_id, "message": item["message"],
+            })
+        progress(f"Imported {len(report)} rows")
+
+    context = multiprocessing.get_context('spawn')
+    try:
+        with context.Pool(workers or os.cpu_count() or 1, initializer=_init_worker) as pool:
+            pending = None
+            batch = []
+            # Row 1 is the header
+            for row_number, row in enumerate(csv.DictReader(csv_lines), start=2):
+                member, error = _parse_row(row)
+                if error is not None:
+                    report.append({"row": row_number, "name": (row.get('name') or '').strip(),
+                                   "status": "failed", "member_id": None, "message": error})
+                    continue
+
+                item = {"row": row_number, "member": member, "status": "created", "message": None, "data": None}
+                entry = _photo_for(row, member, photos)
+                if entry is None:
+                    item["status"] = "no_photo"
+                    item["message"] = 'Photo not found.' if photos is not None else None
+                else:
+                    try:
+                        item["data"] = photos.read(entry)
+                        member["image_path"] = _save_photo(member, photos.entry_name(entry), item["data"])
+                    except (OSError, zipfile.BadZipFile) as e:
+                        item["status"], item["message"] = "no_photo", f'Could not read photo: {e}'
+                        item["data"] = None
+                batch.append(item)
+
+                if len(batch) >= batch_size:
+                    result = submit(pool, batch)
+                    if pending is not None:
+                        insert(*pending)
+                    pending, batch = (batch, result), []
+
+            if batch:
+                result = submit(pool, batch)
+                if pending is not None:
+                    insert(*pending)
+                pending = (batch, result)
+            if pending is not None:
+                insert(*pending)
+    finally:
+        if photos is not None:
+            photos.close()
+
+    report.sort(key=lambda entry: entry["row"])
+    return report
+
+def write_report(report, f):
+    """Write an import report as CSV to a text file object."""
+    writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(report)
+
+def refresh_camera_gallery():
+    """Reload the running cameras' gallery after an import."""
+    from app.camera.routes import get_camera_manager
+
+    try:
+        get_camera_manager().reload_gallery()
+    except RuntimeError as e:
+        print(f"Error reloading camera gallery: {e}")
+
+# Imports started from the admin page: {job_id: job dict}
+import_jobs = {}
+_import_lock = threading.Lock()
+
+def start_import_job(app, directory, csv_path, photos_path=None):
+    """Run an uploaded import on a background thread.
+
+    Args:
+        app: Flask app the import runs in
+        directory: Directory holding the uploaded files; removed when done
+        csv_path: Uploaded CSV file
+        photos_path: Uploaded zip archive, or None
+
+    Returns:
+        str: Job ID for import_jobs
+    """
+    job_id = uuid.uuid4().hex
+    job = {"id": job_id, "status": "running", "progress": "Starting", "report": None, "error": None}
+    with _import_lock:
+        import_jobs[job_id] = job
+
+    def run():
+        try:
+            with app.app_context():
+                with open(csv_path, newline='', encoding='utf-8-sig') as f:
+                    report = import_members(f, photos_path, workers=app.config.get('IMPORT_WORKERS'),
+                                            progress=lambda message: job.update(progress=message))
+                refresh_camera_gallery()
+            job.update(status="done", report=report)
+        except Exception as e:
+            print(f"Error importing members: {e}")
+            job.update(status="failed", error=str(e))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    threading.Thread(target=run, daemon=True).start()
+    return job_id
+
+@click.command('import-members')
+@click.argument('csv_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--photos', type=click.Path(exists=True), default=None,
+              help='Directory or zip archive of member photos.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--batch-size', type=int, default=100, help='Rows per database transaction.')
+@click.option('--report', type=click.Path(dir_okay=False), default=None,
+              help='Where to write the per-row report (default: next to the CSV).')
+@with_appcontext
+def import_members_command(csv_file, photos, workers, batch_size, report):
+    """Create members from a CSV file and a folder or zip of photos."""
+    with open(csv_file, newline='', encoding='utf-8-sig') as f:
+        try:
+            results = import_members(f, photos, workers=workers, batch_size=batch_size, progress=click.echo)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    refresh_camera_gallery()
+
+    report = report or os.path.splitext(csv_file)[0] + '.report.csv'
+    with open(report, 'w', newline='') as f:
+        write_report(results, f)
+
+    counts = {}
+    for entry in results:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    click.echo(', '.join(f'{count} {status}' for status, count in sorted(counts.items())) or 'No rows found.')
+    click.echo(f'Wrote report to {report}.')
@@ -1,19 +1,64 @@
 import cv2
+import os
 import threading
 import time
 import numpy as np
-from app.camera.utils.camera_utils import try_camera_resolutions, set_camera_mjpeg, create_blank_frame
+from datetime import datetime
+from flask import current_app
+from app.database.members import create_member
+from app.camera.utils.camera_utils import (
+    try_camera_resolutions, set_camera_mjpeg, enable_raw_mjpeg, create_blank_frame, measure_motion
+)
 from app.camera.utils.face_processor import FaceProcessor
+from app.camera.utils.frame_buffer import FrameRing
+from app.camera.utils.stream_encoder import StreamEncoder, FULL_PROFILE
+from app.camera.frame_bus import FrameBus
+from app.camera.sources import FrameSource, open_source
+from app.camera.member_images import generate_member_derivatives
+from app.camera.duplicates import check_duplicate_face
 
 class Camera:
     """Base camera class for accessing webcam or USB cameras with face recognition."""
     
-    def __init__(self, camera_id=0, recognition_enabled=False):
+    # Mean thumbnail change (0-255) above which the scene counts as moving
+    MOTION_THRESHOLD = 4.0
+    
+    # In MJPEG passthrough mode, stop decoding frames once nothing has needed pixels for this long
+    DECODE_IDLE_SECONDS = 2.0
+    
+    # Give up on a frame sent to the recognition workers after this long (the worker may have died)
+    WORKER_RESULT_TIMEOUT = 10.0
+    
+    def __init__(self, camera_id=0, recognition_enabled=False, gallery=None, attendance_writer=None,
+                 scheduler=None, worker_pool=None, passthrough=False, source=None):
+        """Create a camera.
+        
+        Args:
+            camera_id: OpenCV device index
+            recognition_enabled: Start with face recognition turned on
+            gallery: Optional FaceGallery shared with other cameras
+            attendance_writer: Optional AttendanceWriter shared with other cameras
+            scheduler: Optional RecognitionScheduler deciding which frames get processed
+            worker_pool: Optional RecognitionWorkerPool to run detection out of process
+            passthrough: Ask the camera for raw MJPEG so streams can forward it without re-encoding
+            source: Optional frame source spec (see open_source) used instead of
+                    the device, e.g. "video:/recordings/entrance.mp4?pacing=fast"
+        """
         self.camera_id = camera_id
+        self.source = source
         self.camera = None
         self.thread = None
-        self.frame = None
-        self.processed_frame = None  # Frame with face boxes drawn
+        self.frame_ring = FrameRing(size=4)  # Captured frames, filled in place by read()
+        self.status_frame = None  # Message frame shown while no live frames are available
+        
+        # Streaming: one shared encoder per (profile, annotated) and the camera's own JPEG
+        self.encoders = {}
+        self.encoders_lock = threading.Lock()
+        self.passthrough = passthrough
+        self.raw_mjpeg = False  # True if the camera can deliver undecoded JPEG frames
+        self.raw_active = False  # True while read() returns JPEG bytes instead of decoded frames
+        self.latest_jpeg = None  # (sequence, JPEG bytes) of the last raw frame
+        self.decoded_requested_at = 0.0
         self.stopped = False
         
         # Camera error tracking
@@ -21,10 +66,31 @@ class Camera:
         self.max_frame_errors = 10
         self.last_error = None
         
+        # Capture statistics
+        self.stats = {
+            "frames_captured": 0,
+            "frames_dropped": 0,
+            "frame_errors": 0,
+            "last_processing_ms": 0.0,
+            "avg_processing_ms": 0.0,
+        }
+        
         # Face recognition
         self.recognition_enabled = recognition_enabled
         self.process_this_frame = True  # Always process frames for better recognition
-        self.face_processor = FaceProcessor()
+        self.face_processor = FaceProcessor(gallery, attendance_writer)
+        self.scheduler = scheduler
+        self.motion_thumbnail = None
+        
+        # Out-of-process recognition: frames go to the workers through shared memory
+        self.worker_pool = worker_pool
+        self.frame_bus = None
+        self.pending_sequence = None  # Bus sequence of the frame the workers are processing
+        self.pending_frame_sequence = None  # Its capture sequence, for overlays
+        self.pending_since = None
+        self.pending_lock = threading.Lock()  # Result delivery and timeouts race to clear the pending frame
+        if worker_pool is not None:
+            worker_pool.register(self.camera_id, self._handle_worker_result)
         
         # Start the camera
         self.initialize_camera()
@@ -32,27 +98,35 @@ class Camera:
     def initialize_camera(self):
         """Initialize the camera with the best settings for the device."""
         try:
-            # Initialize camera with more time to connect (especially for USB cameras)
-            self.camera = cv2.VideoCapture(self.camera_id)
+            # Open the device, or the file/synthetic source configured for this camera ID
+            self.camera = open_source(self.source if self.source is not None else self.camera_id)
             
-            # Give USB cameras a moment to initialize (important for external cameras)
-            time.sleep(0.5)
+            if isinstance(self.camera, FrameSource):
+                # Sources have a fixed format; no device tuning needed
+                print(f"Starting camera {self.camera_id} from source {self.camera.describe()}")
+            else:
+                # Give USB cameras a moment to initialize (important for external cameras)
+                time.sleep(0.5)
             
             # Check if camera opened successfully
             if not self.camera.isOpened():
                 raise RuntimeError(f"Could not open camera with ID {self.camera_id}")
             
-            # Try to find best resolution
-            print(f"Starting camera {self.camera_id} with optimal settings")
-            try_camera_resolutions(self.camera)
-            
-            # Try to set MJPEG format for better compatibility
-            set_camera_mjpeg(self.camera)
+            if not isinstance(self.camera, FrameSource):
+                # Try to find best resolution
+                print(f"Starting camera {self.camera_id} with optimal settings")
+                try_camera_resolutions(self.camera)
+                
+                # Try to set MJPEG format for better compatibility
+                set_camera_mjpeg(self.camera)
+                
+                # Keep the camera's JPEG bytes so streams can forward them as-is
+                self.raw_mjpeg = self.raw_active = self.passthrough and enable_raw_mjpeg(self.camera)
             
             # Create initial blank frame
             width = int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            self.frame = create_blank_frame(width, height, "Initializing camera...")
+            self.status_frame = create_blank_frame(width, height, "Initializing camera...")
             
             print(f"Camera initialized with resolution: {width}x{height}")
             return True
@@ -77,24 +151,52 @@ class Camera:
     def _capture_loop(self):
         """Main loop for capturing frames from the camera."""
         while not self.stopped:
+            slot = None
             try:
-                # Read a frame from the camera
-                success, frame = self.camera.read()
+                # Read straight into a free ring buffer (reused once the ring has warmed up)
+                slot, buffer = self.frame_ring.acquire_write()
+                raw = self._use_raw_capture()
+                if raw:
+                    success, frame = self._read_mjpeg()
+                elif slot is None:
+                    # Slow readers hold every slot: still read, so the camera doesn't fall behind
+                    success, frame = self.camera.read()
+                elif buffer is not None:
+                    success, frame = self.camera.read(image=buffer)
+                else:
+                    success, frame = self.camera.read()
                 
                 # Handle frame read failures
                 if not success:
+                    self.frame_ring.abandon(slot)
                     self._handle_frame_error()
                     continue
                 
                 # Reset error counter on successful frame
                 self.frame_error_count = 0
+                self.stats["frames_captured"] += 1
+                
+                # Passthrough frame nobody needs decoded: streams forward latest_jpeg
+                if frame is None and raw:
+                    self.frame_ring.abandon(slot)
+                    self.frame_ring.clear()
+                    self.status_frame = None
+                    continue
+                
+                # No ring slot to publish into; readers keep the previous frame
+                if slot is None:
+                    self.stats["frames_dropped"] += 1
+                    continue
                 
                 # Validate frame
                 if not self._validate_frame(frame):
+                    self.frame_ring.abandon(slot)
                     continue
                 
-                # Store the original frame (make a copy to avoid threading issues)
-                self.frame = frame.copy()
+                # Publish the frame; readers get read-only views, so no copy is needed
+                sequence = self.frame_ring.publish(slot, frame, sequence=self.stats["frames_captured"])
+                slot = None
+                self.status_frame = None
                 
                 # Process for face recognition if enabled
                 if self.recognition_enabled:
@@ -103,25 +205,43 @@ class Camera:
                         if time.time() % 10 < 0.1:  # Roughly every 10 seconds
                             self.face_processor.clean_old_faces()
                         
-                        # Process the frame for face recognition
-                        # Process every frame for better recognition
-                        self.processed_frame, recognized_ids = self.face_processor.process_frame(frame)
+                        # Tell the scheduler what this camera sees, then ask for a slot.
+                        # Frames that don't get one are still streamed, just not processed.
+                        if self.worker_pool is not None:
+                            self._submit_to_workers(frame, sequence)
+                        elif self.scheduler is None:
+                            self._process()
+                        else:
+                            self._report_activity(frame)
+                            if self.scheduler.try_acquire(self.camera_id):
+                                self._process()
                         
                     except Exception as e:
                         print(f"Error in face recognition processing: {e}")
                         self.last_error = str(e)
-                        # Keep the original frame without processing
-                        self.processed_frame = frame.copy()
                 
             except Exception as e:
+                if slot is not None:
+                    self.frame_ring.abandon(slot)
                 self.last_error = str(e)
                 print(f"Error in camera capture loop: {e}")
                 time.sleep(0.1)  # Pause briefly before continuing
     
     def _handle_frame_error(self):
         """Handle errors when reading frames."""
+        # A non-looping recording that has ended is not an error
+        if getattr(self.camera, "finished", False):
+            if self.status_frame is None:
+                width = int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+                height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+                self.status_frame = create_blank_frame(width, height, "End of recording")
+                self.frame_ring.clear()
+            time.sleep(0.5)
+            return
+        
         # Increment error counter
         self.frame_error_count += 1
+        self.stats["frame_errors"] += 1
         
         # Log the error 
         print(f"Error reading frame from camera {self.camera_id} (error count: {self.frame_error_count})")
@@ -134,16 +254,18 @@ class Camera:
                 self.camera.release()
             
             # Create a blank white frame with message
-            self.frame = create_blank_frame(640, 480, "Camera reconnecting...")
+            self.status_frame = create_blank_frame(640, 480, "Camera reconnecting...")
             
             # Try to reopen the camera
             time.sleep(2.0)  # Give more time before reopening
             try:
-                self.camera = cv2.VideoCapture(self.camera_id)
+                self.camera = open_source(self.source if self.source is not None else self.camera_id)
                 print(f"Camera {self.camera_id} reset attempt")
                 
                 # Try setting to MJPG format which often works better
-                set_camera_mjpeg(self.camera)
+                if not isinstance(self.camera, FrameSource):
+                    set_camera_mjpeg(self.camera)
+                    self.raw_mjpeg = self.raw_active = self.passthrough and enable_raw_mjpeg(self.camera)
                 
                 self.frame_error_count = 0  # Reset error counter
             except Exception as reset_error:
@@ -152,6 +274,206 @@ class Camera:
         # Small sleep before next attempt
         time.sleep(0.1)
     
+    def _use_raw_capture(self):
+        """Switch the camera between raw MJPEG and decoded capture as needed.
+        
+        Raw capture is only used while nothing needs decoded frames; otherwise
+        the camera decodes straight into the frame ring's buffers, as without
+        passthrough.
+        
+        Returns:
+            bool: True if this read returns JPEG bytes
+        """
+        if not self.raw_mjpeg:
+            # raw_active stays True if the camera got stuck in raw mode
+            return self.raw_active
+        
+        want_raw = not self._needs_decoded_frames()
+        if want_raw != self.raw_active:
+            try:
+                switched = self.camera.set(cv2.CAP_PROP_FORMAT, -1 if want_raw else cv2.CV_8UC3)
+            except Exception as e:
+                print(f"Error switching camera {self.camera_id} capture format: {e}")
+                switched = False
+            if switched:
+                self.raw_active = want_raw
+                if not want_raw:
+                    # Streams encode the decoded frames until passthrough resumes
+                    self.latest_jpeg = None
+            elif not want_raw:
+                # The backend can't switch back: keep reading raw frames and decode
+                # them in _read_mjpeg, but stop offering passthrough on this camera
+                print(f"Camera {self.camera_id} can't leave raw MJPEG mode; passthrough disabled")
+                self.raw_mjpeg = False
+                self.latest_jpeg = None
+        return self.raw_active
+    
+    def _read_mjpeg(self):
+        """Read one raw MJPEG frame.
+        
+        Returns:
+            (success, frame) where frame is None unless the camera is stuck in
+            raw mode, in which case every frame is decoded here
+        """
+        success, raw = self.camera.read()
+        if not success or raw is None or raw.size == 0:
+            return False, None
+        
+        if self.raw_mjpeg:
+            self.latest_jpeg = (self.stats["frames_captured"] + 1, raw.tobytes())
+            return True, None
+        
+        # Passthrough was disabled because the camera couldn't leave raw mode
+        frame = cv2.imdecode(raw, cv2.IMREAD_COLOR)
+        return frame is not None, frame
+    
+    def _needs_decoded_frames(self):
+        """True if recognition or a re-encoded stream currently uses decoded frames."""
+        return (self.recognition_enabled
+                or time.time() - self.decoded_requested_at < self.DECODE_IDLE_SECONDS)
+    
+    def _process(self):
+        """Run face recognition on the latest frame and release the scheduler slot."""
+        process_start = time.time()
+        frame_ref = self.frame_ring.acquire_latest()
+        try:
+            if frame_ref is not None:
+                # The reference keeps the capture loop from reusing this buffer meanwhile
+                with frame_ref as frame:
+                    self.face_processor.process_frame(frame, sequence=frame_ref.sequence)
+        finally:
+            elapsed = time.time() - process_start
+            if self.scheduler is not None:
+                self.scheduler.release(self.camera_id, elapsed)
+            self._update_processing_time(elapsed * 1000)
+    
+    def _submit_to_workers(self, frame, frame_sequence):
+        """Publish a frame to the frame bus and hand it to a worker process.
+        
+        Only one frame per camera is in flight; later frames keep streaming
+        until its result comes back.
+        """
+        if self.pending_sequence is not None:
+            if time.time() - self.pending_since < self.WORKER_RESULT_TIMEOUT:
+                return
+            # The result was lost (e.g. the worker crashed); free the slot and move on
+            sequence = self.pending_sequence
+            if self._clear_pending(sequence):
+                print(f"Camera {self.camera_id}: no recognition result after {self.WORKER_RESULT_TIMEOUT}s, skipping frame")
+                self.worker_pool.cancel(self.camera_id, sequence)
+                if self.scheduler is not None:
+                    self.scheduler.release(self.camera_id, self.WORKER_RESULT_TIMEOUT)
+        
+        if self.scheduler is not None:
+            self._report_activity(frame)
+            if not self.scheduler.try_acquire(self.camera_id):
+                return
+        
+        submitted = False
+        try:
+            if self.frame_bus is None or frame.nbytes > self.frame_bus.max_frame_bytes:
+                if self.frame_bus is not None:
+                    self.frame_bus.close()
+                self.frame_bus = FrameBus(slots=4, max_frame_bytes=frame.nbytes)
+            
+            sequence = self.frame_bus.publish(frame)
+            with self.pending_lock:
+                self.pending_sequence = sequence
+                self.pending_frame_sequence = frame_sequence
+                self.pending_since = time.time()
+            submitted = self.worker_pool.submit(self.camera_id, self.frame_bus, sequence)
+        finally:
+            if not submitted:
+                with self.pending_lock:
+                    self.pending_sequence = None
+                if self.scheduler is not None:
+                    self.scheduler.release(self.camera_id, 0.0)
+    
+    def _clear_pending(self, sequence):
+        """Clear the pending frame if it is still sequence.
+        
+        Returns:
+            bool: True if it was (so the caller releases its scheduler slot)
+        """
+        with self.pending_lock:
+            if self.pending_sequence is None or self.pending_sequence != sequence:
+                return False
+            self.pending_sequence = None
+            return True
+    
+    def _handle_worker_result(self, result):
+        """Apply detections from a worker process (runs on the pool's collector thread)."""
+        # A result that arrives after its frame timed out has already been given up on
+        if self.pending_sequence != result["sequence"]:
+            return
+        
+        try:
+            if result.get("error"):
+                self.last_error = result["error"]
+            
+            if not result.get("dropped") and self.frame_bus is not None:
+                # The bus slot still holds the frame as long as is_current says so
+                frame = self.frame_bus.read(result["sequence"])
+                if frame is not None:
+                    # Faces the worker didn't encode (low quality) get None
+                    rows = iter(result["encodings"])
+                    encodings = [next(rows) if encoded else None for encoded in result["encoded"]]
+                    self.face_processor.apply_detections(
+                        frame, result["locations"], encodings, result["member_ids"],
+                        sequence=self.pending_frame_sequence, distances=result["distances"],
+                        qualities=result["qualities"]
+                    )
+        except Exception as e:
+            print(f"Error applying recognition result: {e}")
+            self.last_error = str(e)
+        finally:
+            released = self._clear_pending(result["sequence"])
+            elapsed = result.get("elapsed", 0.0)
+            if released and self.scheduler is not None:
+                self.scheduler.release(self.camera_id, elapsed)
+            if self.pending_since is not None:
+                self._update_processing_time((time.time() - self.pending_since) * 1000)
+    
+    def _report_activity(self, frame):
+        """Report motion and face presence to the scheduler."""
+        motion, self.motion_thumbnail = measure_motion(frame, self.motion_thumbnail)
+        self.scheduler.update_activity(
+            self.camera_id,
+            motion=motion > self.MOTION_THRESHOLD,
+            faces_present=len(self.face_processor.face_locations) > 0
+        )
+    
+    def _update_processing_time(self, elapsed_ms):
+        """Track the latest and smoothed recognition time per frame."""
+        self.stats["last_processing_ms"] = elapsed_ms
+        if self.stats["avg_processing_ms"] == 0:
+            self.stats["avg_processing_ms"] = elapsed_ms
+        else:
+            self.stats["avg_processing_ms"] = 0.9 * self.stats["avg_processing_ms"] + 0.1 * elapsed_ms
+    
+    def get_stats(self):
+        """Return capture and recognition statistics for this camera."""
+        stats = dict(self.stats)
+        stats.update(self.face_processor.stats)
+        roster_lookups = stats["roster_hits"] + stats["roster_misses"]
+        stats["roster_hit_rate"] = stats["roster_hits"] / roster_lookups if roster_lookups else None
+        tracked_faces = stats["matches_run"] + stats["matches_skipped"]
+        stats["match_skip_rate"] = stats["matches_skipped"] / tracked_faces if tracked_faces else None
+        stats["encoding_skip_rate"] = (stats["faces_skipped_quality"] / stats["faces_detected"]
+                                       if stats["faces_detected"] else None)
+        stats["last_error"] = self.last_error
+        stats["passthrough"] = self.raw_mjpeg and self.raw_active
+        with self.encoders_lock:
+            stats["stream_encoders"] = [
+                {"profile": profile._asdict(), "annotated": annotated, "frames_encoded": encoder.frames_encoded}
+                for (profile, annotated), encoder in self.encoders.items()
+            ]
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.get_camera_stats(self.camera_id)
+        if self.worker_pool is not None:
+            stats["workers"] = self.worker_pool.get_stats()
+        return stats
+    
     def _validate_frame(self, frame):
         """Validate a frame to ensure it's usable.
         
@@ -174,35 +496,89 @@ class Camera:
         
         return True
     
-    def get_frame(self, show_faces=False):
+    def get_frame(self, show_faces=False, profile=None, passthrough=False):
         """Convert frame to JPEG for MJPEG streaming.
         
         Args:
             show_faces: If True and recognition is enabled, show processed frame with face boxes
+            profile: StreamProfile to encode with (default: full resolution)
+            passthrough: Forward the camera's own JPEG when possible
             
         Returns:
             JPEG bytes of the frame
         """
-        # Choose which frame to encode
-        if show_faces and self.recognition_enabled and self.processed_frame is not None:
-            frame_to_encode = self.processed_frame
-        elif self.frame is not None:
-            frame_to_encode = self.frame
+        return self.get_frame_with_sequence(show_faces, profile, passthrough)[0]
+    
+    def get_frame_with_sequence(self, show_faces=False, profile=None, passthrough=False):
+        """Convert frame to JPEG, along with its capture sequence number.
+        
+        The sequence number matches the one in get_overlay(), so clients
+        drawing their own face boxes can tell which frame they belong to.
+        Clients asking for the same profile share one encoder, so each frame
+        is encoded at most once per profile.
+        
+        Args:
+            show_faces: If True and recognition is enabled, show processed frame with face boxes
+            profile: StreamProfile to encode with (default: full resolution)
+            passthrough: Forward the camera's own JPEG bytes, without decoding or
+                         re-encoding, unless face boxes have to be drawn in
+            
+        Returns:
+            (JPEG bytes or None, sequence number or None for placeholder frames)
+        """
+        annotated = show_faces and self.recognition_enabled
+        
+        # Passthrough: the camera already produced a JPEG; send it untouched
+        if passthrough and not annotated and self.status_frame is None and self.latest_jpeg is not None:
+            sequence, jpeg = self.latest_jpeg
+            return jpeg, sequence
+        
+        # Keep decoding in passthrough mode while clients want re-encoded frames
+        # (passthrough clients are only served this way until raw capture resumes)
+        if not passthrough or annotated:
+            self.decoded_requested_at = time.time()
+        
+        # Choose which frame to encode, holding a reference so it isn't overwritten mid-encode
+        frame_ref = None
+        if annotated:
+            self.face_processor.request_annotations()
+            frame_ref = self.face_processor.annotation_ring.acquire_latest()
+        if frame_ref is None and self.status_frame is None:
+            frame_ref = self.frame_ring.acquire_latest()
+        
+        # Annotated frames are numbered by their own ring; report the capture sequence instead
+        sequence = None
+        if frame_ref is not None and frame_ref.ring is self.frame_ring:
+            sequence = frame_ref.sequence
+        elif frame_ref is not None and self.face_processor.overlay is not None:
+            sequence = self.face_processor.overlay["sequence"]
+        
+        if frame_ref is not None:
+            frame_to_encode = frame_ref.array
+        elif self.status_frame is not None:
+            frame_to_encode = self.status_frame
+        elif self.latest_jpeg is not None:
+            # Decoding just resumed; use the last raw frame until a decoded one is published
+            sequence, jpeg = self.latest_jpeg
+            frame_to_encode = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
         else:
             # Create a blank frame with message if no frame is available
             frame_to_encode = create_blank_frame(640, 480, "Camera initializing...")
             
         try:    
-            # Encode frame as JPEG
-            ret, jpeg = cv2.imencode('.jpg', frame_to_encode)
-            if not ret:
+            # Encode frame as JPEG; cached per ring slot sequence so other clients reuse it
+            encoder = self._get_encoder(profile or FULL_PROFILE, frame_ref is not None and frame_ref.ring is not self.frame_ring)
+            jpeg = encoder.encode(frame_to_encode, key=frame_ref.sequence if frame_ref is not None else None)
+            if jpeg is None:
                 # Create a fallback frame if encoding fails
                 blank_frame = create_blank_frame(640, 480, "Frame encoding error")
                 ret, jpeg = cv2.imencode('.jpg', blank_frame)
+                sequence = None
                 if not ret:  # If even this fails, return None
-                    return None
+                    return None, None
+                jpeg = jpeg.tobytes()
                     
-            return jpeg.tobytes()
+            return jpeg, sequence
         except Exception as e:
             print(f"Error encoding frame: {e}")
             # Create an error frame
@@ -210,11 +586,33 @@ class Camera:
                 blank_frame = create_blank_frame(640, 480, f"Camera error: {str(e)[:30]}")
                 ret, jpeg = cv2.imencode('.jpg', blank_frame)
                 if ret:
-                    return jpeg.tobytes()
+                    return jpeg.tobytes(), None
             except:
                 pass
             
+            return None, None
+        finally:
+            if frame_ref is not None:
+                frame_ref.release()
+    
+    def _get_encoder(self, profile, annotated):
+        """Return the shared encoder for a profile, creating it on first use."""
+        with self.encoders_lock:
+            encoder = self.encoders.get((profile, annotated))
+            if encoder is None:
+                encoder = self.encoders[(profile, annotated)] = StreamEncoder(profile)
+            return encoder
+    
+    def get_overlay(self):
+        """Return face boxes and labels of the last processed frame, or None.
+        
+        Returns:
+            dict with the frame's sequence number, size, timestamp and a list of
+            faces ({"top", "right", "bottom", "left", "name"} in full-frame pixels)
+        """
+        if not self.recognition_enabled:
             return None
+        return self.face_processor.overlay
     
     def get_recognition_result(self):
         """Return the last face recognition result."""
@@ -256,6 +654,112 @@ class Camera:
         self.face_processor.reset_state()
         self.process_this_frame = True
     
+    def enroll_unknown_face(self, face_id, name, major=None, age=None, bio=None, allow_duplicate=False):
+        """Create a member from a tracked unknown face.
+        
+        Args:
+            face_id: ID of the face in the unknown faces gallery
+            name: Member name
+            major, age, bio: Optional member details
+            allow_duplicate: Enroll even if the face matches an existing member
+            
+        Returns:
+            int: The new member's ID
+            
+        Raises:
+            LookupError: If the face is no longer tracked
+            DuplicateFaceError: If the face looks like an enrolled member
+            ValueError: If the face has no encoding yet
+        """
+        face_processor = self.face_processor
+        
+        # Look for the specified face ID in the unknown faces
+        face = next((f for f in face_processor.persistent_faces["unknown"] if f["id"] == face_id), None)
+        if face is None or face["image"] is None:
+            raise LookupError("Face not found. The face may have been removed or the system restarted.")
+        if face["encoding"] is None:
+            raise ValueError("Face encoding not available. Please ensure the face is in view.")
+        face_image = face["image"]
+        face_encoding = face["encoding"]
+        
+        # Unknown means no match within the recognition threshold; a closer
+        # look catches people who were enrolled before from a poor photo
+        if not allow_duplicate:
+            check_duplicate_face(face_encoding, face_processor.gallery.snapshot(),
+                                 current_app.config['DUPLICATE_FACE_THRESHOLD'])
+        
+        # Generate a unique filename using timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{name.replace(' ', '_').lower()}_{timestamp}.jpg"
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        
+        # Save the image, with sized copies for the web pages
+        cv2.imwrite(filepath, face_image)
+        generate_member_derivatives(filename)
+        
+        # Save to database and get member ID
+        member_id = create_member(name, major, age, bio, face_encoding, filename)
+        
+        # Reload faces from the database to include the new member
+        face_processor.load_known_faces_from_db()
+        
+        # Add to persistent known faces - this will make them appear in recognized members list
+        # since they're obviously present in the current session
+        face_processor.persistent_faces["known"][name] = {
+            "image": face_image,
+            "in_view": True,
+            "last_seen": time.time(),
+            "member_id": member_id,
+            "encoding": face_encoding,
+            "quality": face.get("quality", 0.0)
+        }
+        
+        # Remove from unknown faces
+        self.remove_unknown_face(face_id)
+        
+        # Force an immediate update of the recognition result
+        self.process_this_frame = True
+        return member_id
+    
+    def rename_known_face(self, member_id, name):
+        """Update a tracked known face after its member was renamed."""
+        face_processor = self.face_processor
+        
+        # Find any known faces with this member ID
+        old_name = None
+        for face_name in list(face_processor.persistent_faces["known"].keys()):
+            face_data = face_processor.persistent_faces["known"][face_name]
+            if face_data.get("member_id") == member_id:
+                old_name = face_name
+                break
+                
+        # If found and name changed, update the entry
+        if old_name and old_name != name:
+            face_data = face_processor.persistent_faces["known"].pop(old_name)
+            face_processor.persistent_faces["known"][name] = face_data
+    
+    def remove_unknown_face(self, face_id):
+        """Remove an unknown face from the persistent faces list.
+        
+        Returns:
+            bool: True if the face was found and removed
+        """
+        face_processor = self.face_processor
+        before_count = len(face_processor.persistent_faces["unknown"])
+        face_processor.persistent_faces["unknown"] = [
+            face for face in face_processor.persistent_faces["unknown"] 
+            if face["id"] != face_id
+        ]
+        return len(face_processor.persistent_faces["unknown"]) != before_count
+    
+    def record_attendance(self, meeting_id):
+        """Record attendance for all recognized members.
+        
+        Returns:
+            int: Number of members recorded
+        """
+        return self.face_processor.record_attendance(meeting_id)
+    
     def get_camera_properties(self):
         """Return properties of the camera.
         
@@ -273,7 +777,9 @@ class Camera:
             "width": width,
             "height": height,
             "fps": fps,
-            "recognition_enabled": self.recognition_enabled
+            "source": self.camera.describe() if isinstance(self.camera, FrameSource) else None,
+            "recognition_enabled": self.recognition_enabled,
+            "stats": self.get_stats()
         }
     
     def stop(self):
@@ -283,6 +789,11 @@ class Camera:
             self.thread.join()
         if self.camera:
             self.camera.release()
+        if self.worker_pool is not None:
+            self.worker_pool.unregister(self.camera_id)
+        if self.frame_bus is not None:
+            self.frame_bus.close()
+            self.frame_bus = None
 
 
 def list_available_cameras(max_cameras=8):
@@ -0,0 +1,391 @@
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+from app.camera.manager import CameraManager
+from app.camera.duplicates import DuplicateFaceError
+from app.camera.utils.attendance_writer import AttendanceWriter
+from app.camera.utils.stream_encoder import StreamProfile
+
+# Message framing: header length and payload length (network byte order),
+# then a JSON header, then raw bytes (JPEG frames and thumbnails)
+FRAME_HEADER = struct.Struct('!II')
+
+# Exceptions that keep their type across the socket, so routes can map them to status codes.
+# Checked in order, so subclasses come before their base classes
+REMOTE_ERRORS = {
+    "DuplicateFaceError": DuplicateFaceError,
+    "LookupError": LookupError,
+    "ValueError": ValueError,
+    "RuntimeError": RuntimeError,
+}
+
+# Operations that can reload the gallery (and retrain a quantized index) or
+# open a camera; they get DaemonClient.slow_timeout instead of timeout
+SLOW_OPS = {"start", "toggle_recognition", "enroll", "reload_gallery", "update_gallery_member"}
+
+def send_message(sock, header, payload=b''):
+    """Send one framed message."""
+    body = json.dumps(header, default=str).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(body), len(payload)) + body + payload)
+
+def recv_message(sock):
+    """Receive one framed message.
+
+    Returns:
+        (header, payload), or (None, None) if the peer closed the connection
+    """
+    sizes = _recv_exact(sock, FRAME_HEADER.size)
+    if sizes is None:
+        return None, None
+    header_length, payload_length = FRAME_HEADER.unpack(sizes)
+
+    body = _recv_exact(sock, header_length)
+    payload = _recv_exact(sock, payload_length) if payload_length else b''
+    if body is None or payload is None:
+        return None, None
+    return json.loads(body.decode('utf-8')), payload
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(buffer)
+
+class CameraDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Owns the cameras and serves them to web workers over a Unix socket.
+
+    Every request runs inside an app context, so camera code that touches
+    the database or app config works exactly as it does in the web process.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, app, socket_path):
+        self.app = app
+        self.socket_path = socket_path
+        self.manager = CameraManager()
+
+        # A socket file left behind by a crashed daemon would block bind()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, CameraDaemonHandler)
+        os.chmod(socket_path, 0o660)
+
+    def dispatch(self, request):
+        """Run one request.
+
+        Returns:
+            (result, payload) where payload is bytes for frame and thumbnail requests
+        """
+        op = request.get("op")
+        args = request.get("args") or {}
+        manager = self.manager
+
+        # Manager-level operations
+        if op == "start":
+            camera = manager.start(args["camera_id"], args.get("recognition_enabled", False))
+            return {"camera_id": camera.camera_id}, b''
+        if op == "stop":
+            return {"stopped": manager.stop(args.get("camera_id"))}, b''
+        if op == "camera_ids":
+            return {"camera_ids": manager.camera_ids()}, b''
+        if op == "stats":
+            return manager.get_stats(), b''
+        if op == "reload_gallery":
+            manager.reload_gallery()
+            return {}, b''
+        if op == "update_gallery_member":
+            manager.update_gallery_member(args["member_id"], args["name"], args["encoding"])
+            return {}, b''
+        if op == "refresh_roster":
+            manager.refresh_roster()
+            return {}, b''
+        if op == "resolve":
+            camera = manager.get(args.get("camera_id"))
+            return {"camera_id": camera.camera_id if camera else None}, b''
+
+        # Camera-level operations
+        camera = manager.get(request.get("camera_id"))
+        if camera is None:
+            raise LookupError("No active camera")
+
+        if op == "frame":
+            profile = StreamProfile(*args["profile"]) if args.get("profile") else None
+            jpeg, sequence = camera.get_frame_with_sequence(
+                show_faces=args.get("show_faces", False),
+                profile=profile,
+                passthrough=args.get("passthrough", False)
+            )
+            return {"sequence": sequence}, jpeg or b''
+        if op == "overlay":
+            return {"overlay": camera.get_overlay()}, b''
+        if op == "thumbnail":
+            return {}, camera.get_face_thumbnail(args["thumbnail_id"]) or b''
+        if op == "recognition_enabled":
+            return {"enabled": camera.recognition_enabled}, b''
+        if op == "recognition_result":
+            return {"result": camera.get_recognition_result()}, b''
+        if op == "toggle_recognition":
+            return {"enabled": camera.toggle_recognition(args.get("enabled"))}, b''
+        if op == "reset":
+            camera.reset_recognition_state()
+            return {}, b''
+        if op == "properties":
+            return camera.get_camera_properties(), b''
+        if op == "camera_stats":
+            return camera.get_stats(), b''
+        if op == "enroll":
+            return {"member_id": camera.enroll_unknown_face(**args)}, b''
+        if op == "rename":
+            camera.rename_known_face(args["member_id"], args["name"])
+            return {}, b''
+        if op == "remove_unknown":
+            return {"removed": camera.remove_unknown_face(args["face_id"])}, b''
+        if op == "record_attendance":
+            return {"recorded": camera.record_attendance(args["meeting_id"])}, b''
+
+        raise ValueError(f"Unknown operation: {op}")
+
+    def server_close(self):
+        self.manager.stop_all()
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+class CameraDaemonHandler(socketserver.BaseRequestHandler):
+    """Serves requests from one web worker connection until it closes."""
+
+    def handle(self):
+        while True:
+            try:
+                request, _ = recv_message(self.request)
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+
+            payload = b''
+            try:
+                with self.server.app.app_context():
+                    result, payload = self.server.dispatch(request)
+                response = {"ok": True, "result": result}
+            except Exception as e:
+                kind = next((name for name, error in REMOTE_ERRORS.items() if isinstance(e, error)), "Exception")
+                response = {"ok": False, "error": str(e), "kind": kind}
+                if isinstance(e, DuplicateFaceError):
+                    response["matches"] = e.matches
+
+            try:
+                send_message(self.request, response, payload)
+            except OSError:
+                return
+
+class DaemonClient:
+    """Talks to a CameraDaemon; a drop-in replacement for CameraManager in the routes.
+
+    Each thread keeps its own connection, so concurrent streams don't wait
+    on each other.
+    """
+
+    def __init__(self, socket_path, timeout=10.0, slow_timeout=120.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.slow_timeout = slow_timeout
+        self.local = threading.local()
+        # Attendance goes straight to the database; SQLite serializes writers across processes
+        self.attendance_writer = AttendanceWriter()
+
+    def _connection(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self.local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self.local, "sock", None)
+        self.local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def call(self, op, camera_id=None, **args):
+        """Send a request to the daemon.
+
+        A request is only retried if it couldn't be sent. Once it was sent the
+        daemon may be running it, and operations like toggle_recognition and
+        enroll must not run twice, so errors waiting for the response
+        (including timeouts) are not retried.
+
+        Returns:
+            (result, payload)
+
+        Raises:
+            RuntimeError: If the daemon can't be reached or doesn't answer
+            LookupError, ValueError: Re-raised from the daemon
+        """
+        request = {"op": op, "camera_id": camera_id, "args": args}
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.settimeout(self.slow_timeout if op in SLOW_OPS else self.timeout)
+                send_message(sock, request)
+                break
+            except (BrokenPipeError, ConnectionResetError) as e:
+                # The daemon may have restarted since this connection was opened; retry once
+                self._disconnect()
+                if attempt == 1:
+                    raise RuntimeError(f"Camera daemon unavailable: {e}")
+            except OSError as e:
+                # Couldn't connect at all, or the send itself timed out part-way
+                self._disconnect()
+                raise RuntimeError(f"Camera daemon unavailable: {e}")
+
+        try:
+            response, payload = recv_message(sock)
+        except OSError as e:
+            self._disconnect()
+            raise RuntimeError(f"No response from camera daemon to {op}: {e}")
+        if response is None:
+            self._disconnect()
+            raise RuntimeError(f"Camera daemon closed the connection during {op}")
+
+        if not response["ok"]:
+            if response["kind"] == "DuplicateFaceError":
+                raise DuplicateFaceError(response["matches"])
+            raise REMOTE_ERRORS.get(response["kind"], RuntimeError)(response["error"])
+        return response["result"], payload
+
+    def start(self, camera_id, recognition_enabled=False):
+        result, _ = self.call("start", camera_id=camera_id, recognition_enabled=recognition_enabled)
+        return RemoteCamera(self, result["camera_id"])
+
+    def get(self, camera_id=None):
+        """Return a proxy for a running camera, or None (also if the daemon is down)."""
+        try:
+            result, _ = self.call("resolve", camera_id=camera_id)
+        except RuntimeError as e:
+            print(f"Error contacting camera daemon: {e}")
+            return None
+        if result["camera_id"] is None:
+            return None
+        return RemoteCamera(self, result["camera_id"])
+
+    def stop(self, camera_id=None):
+        result, _ = self.call("stop", camera_id=camera_id)
+        return result["stopped"]
+
+    def camera_ids(self):
+        try:
+            result, _ = self.call("camera_ids")
+        except RuntimeError:
+            return []
+        return result["camera_ids"]
+
+    def reload_gallery(self):
+        self.call("reload_gallery")
+
+    def update_gallery_member(self, member_id, name, encoding):
+        self.call("update_gallery_member", member_id=member_id, name=name,
+                  encoding=[float(v) for v in encoding])
+
+    def refresh_roster(self):
+        self.call("refresh_roster")
+
+    def get_stats(self):
+        result, _ = self.call("stats")
+        return result
+
+class RemoteCamera:
+    """Proxy with the parts of the Camera interface the routes use."""
+
+    def __init__(self, client, camera_id):
+        self.client = client
+        self.camera_id = camera_id
+
+    def _call(self, op, **args):
+        return self.client.call(op, camera_id=self.camera_id, **args)
+
+    @property
+    def recognition_enabled(self):
+        result, _ = self._call("recognition_enabled")
+        return result["enabled"]
+
+    def get_frame(self, show_faces=False, profile=None, passthrough=False):
+        return self.get_frame_with_sequence(show_faces, profile, passthrough)[0]
+
+    def get_frame_with_sequence(self, show_faces=False, profile=None, passthrough=False):
+        result, payload = self._call("frame", show_faces=show_faces, profile=profile, passthrough=passthrough)
+        return payload or None, result["sequence"]
+
+    def get_overlay(self):
+        result, _ = self._call("overlay")
+        return result["overlay"]
+
+    def get_face_thumbnail(self, thumbnail_id):
+        _, payload = self._call("thumbnail", thumbnail_id=thumbnail_id)
+        return payload or None
+
+    def get_recognition_result(self):
+        result, _ = self._call("recognition_result")
+        return result["result"]
+
+    def toggle_recognition(self, enabled=None):
+        result, _ = self._call("toggle_recognition", enabled=enabled)
+        return result["enabled"]
+
+    def reset_recognition_state(self):
+        self._call("reset")
+
+    def get_camera_properties(self):
+        result, _ = self._call("properties")
+        return result
+
+    def get_stats(self):
+        result, _ = self._call("camera_stats")
+        return result
+
+    def enroll_unknown_face(self, face_id, name, major=None, age=None, bio=None, allow_duplicate=False):
+        result, _ = self._call("enroll", face_id=face_id, name=name, major=major, age=age, bio=bio,
+                               allow_duplicate=allow_duplicate)
+        return result["member_id"]
+
+    def rename_known_face(self, member_id, name):
+        self._call("rename", member_id=member_id, name=name)
+
+    def remove_unknown_face(self, face_id):
+        result, _ = self._call("remove_unknown", face_id=face_id)
+        return result["removed"]
+
+    def record_attendance(self, meeting_id):
+        result, _ = self._call("record_attendance", meeting_id=meeting_id)
+        return result["recorded"]
+
+def run_daemon(app, socket_path=None):
+    """Serve cameras on a Unix socket until interrupted.
+
+    Args:
+        app: Flask app providing config and the database
+        socket_path: Socket to listen on (default: CAMERA_DAEMON_SOCKET, or camera.sock in the instance folder)
+    """
+    socket_path = socket_path or app.config.get('CAMERA_DAEMON_SOCKET') or os.path.join(app.instance_path, 'camera.sock')
+    server = CameraDaemon(app, socket_path)
+    print(f"Camera daemon listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping camera daemon")
+    finally:
+        server.server_close()
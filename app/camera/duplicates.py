@@ -0,0 +1,127 @@
+import csv
+import math
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+
+class DuplicateFaceError(ValueError):
+    """A face being enrolled looks like a member who is already enrolled."""
+
+    def __init__(self, matches):
+        self.matches = matches
+        names = ', '.join(f"{match['name']} ({match['distance']:.2f})" for match in matches)
+        super().__init__(f"This face looks like an existing member: {names}")
+
+def find_similar_members(encoding, gallery, threshold, exclude_member_id=None, limit=3):
+    """Find enrolled members whose face is close to an encoding.
+
+    Args:
+        encoding: 128-d face encoding
+        gallery: (encodings, names, member_ids)
+        threshold: Maximum face distance to report
+        exclude_member_id: Member to leave out (e.g. the one being re-enrolled)
+        limit: Maximum number of members returned
+
+    Returns:
+        List of {"member_id", "name", "distance"}, closest first
+    """
+    known, names, member_ids = gallery
+    if len(known) == 0:
+        return []
+
+    distances = np.linalg.norm(np.asarray(known, dtype=np.float32) - np.asarray(encoding, dtype=np.float32), axis=1)
+    order = np.argsort(distances)
+    matches = []
+    for index in order:
+        if distances[index] > threshold or len(matches) >= limit:
+            break
+        if member_ids[index] == exclude_member_id:
+            continue
+        matches.append({"member_id": member_ids[index], "name": names[index], "distance": float(distances[index])})
+    return matches
+
+def check_duplicate_face(encoding, gallery, threshold, exclude_member_id=None):
+    """Raise DuplicateFaceError if an encoding matches an enrolled member."""
+    matches = find_similar_members(encoding, gallery, threshold, exclude_member_id)
+    if matches:
+        raise DuplicateFaceError(matches)
+
+def block_size_for_budget(memory_mb):
+    """Return the largest block size whose working set fits in memory_mb.
+
+    Each block pair needs a float32 distance matrix and a boolean mask
+    (5 bytes per pair), plus the two blocks of encodings.
+    """
+    budget = max(1, memory_mb) * 1024 * 1024
+    return max(64, int(math.sqrt(budget / 6)))
+
+def iter_duplicate_pairs(encodings, threshold, block_size=2048):
+    """Find every pair of encodings closer than a threshold, block by block.
+
+    The full n x n distance matrix is never built: rows are compared in
+    block_size x block_size tiles written into one reused buffer, so memory
+    stays fixed however large the gallery (the encodings themselves can be
+    a memory-mapped snapshot). Only the upper triangle is computed.
+
+    Args:
+        encodings: (n, 128) array
+        threshold: Maximum face distance of a reported pair
+        block_size: Rows per block
+
+    Yields:
+        (i, j, distance) row indices with i < j
+    """
+    count = len(encodings)
+    limit = threshold * threshold
+    buffer = np.empty((block_size, block_size), dtype=np.float32)
+
+    for start_a in range(0, count, block_size):
+        block_a = np.asarray(encodings[start_a:start_a + block_size], dtype=np.float32)
+        norms_a = np.einsum('ij,ij->i', block_a, block_a)
+
+        for start_b in range(start_a, count, block_size):
+            block_b = np.asarray(encodings[start_b:start_b + block_size], dtype=np.float32)
+            norms_b = np.einsum('ij,ij->i', block_b, block_b)
+
+            # ||a - b||^2 = ||a||^2 + ||b||^2 - 2ab, computed in place
+            squared = buffer[:len(block_a), :len(block_b)]
+            np.matmul(block_a, block_b.T, out=squared)
+            squared *= -2.0
+            squared += norms_a[:, None]
+            squared += norms_b[None, :]
+
+            rows, cols = np.nonzero(squared <= limit)
+            if start_a == start_b:
+                # Diagonal tile: keep each pair once and skip self-matches
+                upper = rows < cols
+                rows, cols = rows[upper], cols[upper]
+
+            for row, col in zip(rows, cols):
+                yield start_a + int(row), start_b + int(col), math.sqrt(max(float(squared[row, col]), 0.0))
+
+@click.command('find-duplicates')
+@click.option('--threshold', type=float, default=None,
+              help='Maximum face distance of a reported pair (default: DUPLICATE_FACE_THRESHOLD).')
+@click.option('--memory-mb', type=int, default=256, help='Memory budget for the distance computation.')
+@click.option('--output', type=click.Path(dir_okay=False), default='duplicate_members.csv',
+              help='Where to write the report.')
+@with_appcontext
+def find_duplicates_command(threshold, memory_mb, output):
+    """Report pairs of members who look like the same person."""
+    from app.database.gallery import load_gallery
+
+    threshold = threshold if threshold is not None else current_app.config['DUPLICATE_FACE_THRESHOLD']
+    encodings, names, member_ids = load_gallery()
+    block_size = block_size_for_budget(memory_mb)
+    click.echo(f'Comparing {len(member_ids)} members in blocks of {block_size}.')
+
+    pairs = 0
+    with open(output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['member_a', 'name_a', 'member_b', 'name_b', 'distance'])
+        for i, j, distance in iter_duplicate_pairs(encodings, threshold, block_size):
+            writer.writerow([member_ids[i], names[i], member_ids[j], names[j], f'{distance:.4f}'])
+            pairs += 1
+
+    click.echo(f'Found {pairs} possible duplicate pairs; wrote {output}.')
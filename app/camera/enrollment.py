@@ -0,0 +1,196 @@
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import face_recognition
+import numpy as np
+
+# Longest side a photo is scaled to before detection. Phone photos are
+# 4000px+; a profile photo's face is still well over the 150px encoder input
+MAX_DETECTION_SIDE = 1024
+
+def extract_face_encoding(data, max_side=MAX_DETECTION_SIDE):
+    """Find the main face in an image and encode it.
+
+    The image is decoded from memory and downscaled before detection; if no
+    face is found at that size, detection is retried with upsampling.
+
+    Args:
+        data: Encoded image bytes (JPEG, PNG, ...)
+        max_side: Longest side to scale the image down to
+
+    Returns:
+        float32 encoding of the largest face, or None if there is none
+
+    Raises:
+        ValueError: If the data isn't an image
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("The file is not a readable image")
+
+    scale = max_side / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=0, model="hog")
+    if not locations:
+        locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=1, model="hog")
+    if not locations:
+        return None
+
+    # Profile photos can catch people in the background; enroll the largest face
+    largest = max(locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+    encodings = face_recognition.face_encodings(rgb, known_face_locations=[largest])
+    return np.asarray(encodings[0], dtype=np.float32) if encodings else None
+
+class EnrollmentQueue:
+    """Extracts face encodings for member photos on background threads.
+
+    Requests hand over the uploaded bytes and return at once; a worker
+    encodes the face, stores it on the member and adds it to the running
+    cameras' gallery. Job status is kept for polling until it ages out.
+    """
+
+    def __init__(self, workers=1, max_jobs=500):
+        """Create the queue.
+
+        Args:
+            workers: Number of worker threads
+            max_jobs: Finished jobs kept for status polling
+        """
+        self.workers = max(1, workers)
+        self.max_jobs = max_jobs
+        self.tasks = queue.Queue()
+        self.jobs = OrderedDict()  # {job_id: job dict}, oldest first
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.threads = []
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, app, member_id, data, allow_duplicate=False):
+        """Queue a photo for face extraction.
+
+        Args:
+            app: Flask app the job runs in
+            member_id: Member the encoding belongs to
+            data: Encoded image bytes
+            allow_duplicate: Store the face even if it looks like another member
+
+        Returns:
+            int: Job ID for get()
+        """
+        with self.lock:
+            job_id = next(self.ids)
+            self.jobs[job_id] = {
+                "id": job_id,
+                "member_id": member_id,
+                "status": "queued",
+                "message": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            # Forget the oldest jobs once there are too many
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        self.tasks.put((app, job_id, member_id, data, allow_duplicate))
+        return job_id
+
+    def get(self, job_id):
+        """Return a copy of a job's status, or None if it is unknown."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def get_stats(self):
+        with self.lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": self.tasks.qsize(),
+            "jobs": {status: statuses.count(status) for status in set(statuses)},
+        }
+
+    def _update(self, job_id, **changes):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(changes)
+
+    def _run(self):
+        while True:
+            app, job_id, member_id, data, allow_duplicate = self.tasks.get()
+            self._update(job_id, status="processing")
+            try:
+                with app.app_context():
+                    status, message = self._process(member_id, data, allow_duplicate)
+            except Exception as e:
+                print(f"Error processing enrollment photo for member {member_id}: {e}")
+                status, message = "failed", str(e)
+            self._update(job_id, status=status, message=message, finished_at=time.time())
+
+    def _process(self, member_id, data, allow_duplicate=False):
+        """Encode the photo and store the result.
+
+        Returns:
+            (status, message)
+        """
+        from flask import current_app
+        from app.camera.routes import get_camera_manager
+        from app.camera.member_images import generate_member_derivatives
+        from app.camera.duplicates import find_similar_members
+        from app.database.gallery import load_gallery
+        from app.database.members import get_member, update_member
+
+        # Sized copies for the web pages, so they never load the original upload
+        member = get_member(member_id)
+        if member is not None and member['image_path']:
+            generate_member_derivatives(member['image_path'], data)
+
+        try:
+            encoding = extract_face_encoding(data)
+        except ValueError as e:
+            return "failed", str(e)
+        if encoding is None:
+            return "no_face", "No face detected in the photo."
+
+        # Two members with one face would split that person's attendance
+        if not allow_duplicate:
+            matches = find_similar_members(encoding, load_gallery(), current_app.config['DUPLICATE_FACE_THRESHOLD'],
+                                           exclude_member_id=member_id)
+            if matches:
+                names = ', '.join(match['name'] for match in matches)
+                return "duplicate", (f"This face looks like {names}, so it was not saved. If this is a different "
+                                     "person, upload the photo again with \"different person\" ticked.")
+
+        member = update_member(member_id, face_encoding=encoding)
+        if member is None:
+            return "failed", "The member was deleted before the photo was processed."
+
+        try:
+            get_camera_manager().update_gallery_member(member_id, member['name'], encoding)
+        except RuntimeError as e:
+            # The daemon being down isn't fatal; it loads the gallery when it starts
+            print(f"Error updating camera gallery: {e}")
+        return "done", "Face encoding saved."
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_enrollment_queue(workers=1):
+    """Return the shared enrollment queue, starting it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = EnrollmentQueue(workers=workers).start()
+        return _queue
@@ -0,0 +1,110 @@
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+class FrameBus:
+    """A ring of frame slots in shared memory, readable from other processes.
+
+    The owning process publishes frames; recognition worker processes attach
+    by name and get numpy views straight onto the shared pages, so frames
+    cross the process boundary without being pickled or copied.
+
+    Each slot has a header of (sequence, height, width, channels). A slot's
+    sequence is set to 0 while it is being written, and readers call
+    is_current() after using a frame to check it wasn't overwritten meanwhile.
+    """
+
+    HEADER_FIELDS = 4
+
+    def __init__(self, slots=8, max_frame_bytes=1920 * 1080 * 3, name=None, create=True):
+        """Create or attach to a frame bus.
+
+        Args:
+            slots: Number of frame slots in the ring
+            max_frame_bytes: Largest frame (height * width * channels) a slot can hold
+            name: Shared memory block name (required when attaching)
+            create: True to create the block, False to attach to an existing one
+        """
+        self.slots = slots
+        self.max_frame_bytes = max_frame_bytes
+        self.owner = create
+
+        header_bytes = slots * self.HEADER_FIELDS * 8
+        size = header_bytes + slots * max_frame_bytes
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        if not create:
+            # Only the creator may free the block; keep this process's
+            # resource tracker from unlinking it when the process exits
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+
+        self.header = np.ndarray((slots, self.HEADER_FIELDS), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((slots, max_frame_bytes), dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self.header[:] = 0
+        self.sequence = 0
+
+    @classmethod
+    def attach(cls, name, slots, max_frame_bytes):
+        """Attach to a bus created by another process."""
+        return cls(slots=slots, max_frame_bytes=max_frame_bytes, name=name, create=False)
+
+    def publish(self, frame):
+        """Copy a frame into the next slot.
+
+        Returns:
+            The frame's sequence number (starting at 1), or None if the frame
+            is too large for a slot
+        """
+        if frame.nbytes > self.max_frame_bytes:
+            return None
+
+        self.sequence += 1
+        slot = (self.sequence - 1) % self.slots
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        # Invalidate first so readers never trust a half-written slot
+        self.header[slot, 0] = 0
+        self.data[slot, :frame.nbytes].reshape(frame.shape)[...] = frame
+        self.header[slot, 1:] = (height, width, channels)
+        self.header[slot, 0] = self.sequence
+        return self.sequence
+
+    def read(self, sequence):
+        """Return a read-only view of a published frame, or None if it is gone."""
+        slot = (sequence - 1) % self.slots
+        if self.header[slot, 0] != sequence:
+            return None
+
+        height, width, channels = (int(v) for v in self.header[slot, 1:])
+        size = height * width * channels
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        view = self.data[slot, :size].reshape(shape)
+        view.flags.writeable = False
+        return view
+
+    def is_current(self, sequence):
+        """Check that a frame's slot hasn't been reused since it was read."""
+        return self.header[(sequence - 1) % self.slots, 0] == sequence
+
+    def describe(self):
+        """Return the arguments other processes need to attach."""
+        return {"name": self.name, "slots": self.slots, "max_frame_bytes": self.max_frame_bytes}
+
+    def close(self):
+        """Detach from the shared memory, and free it if this process created it."""
+        # Drop our views first; SharedMemory refuses to close while they exist
+        self.header = None
+        self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A reader still holds a view; the mapping goes away with it
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
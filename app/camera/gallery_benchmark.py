@@ -0,0 +1,118 @@
+import sys
+import time
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from app.camera.utils.quantized_gallery import INDEX_TYPES, build_index, rerank
+
+# Per-dimension spread of synthetic encodings. Two random 128-d vectors are
+# about spread * sqrt(2 * 128) apart, so this puts strangers ~0.9 apart
+ENCODING_SPREAD = 0.9 / np.sqrt(2 * 128)
+
+def synthetic_gallery(size, seed=0):
+    """Return random encodings spread like real ones (strangers ~0.9 apart)."""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, ENCODING_SPREAD, (size, 128)).astype(np.float32)
+
+def make_queries(encodings, count, seed=1):
+    """Return query encodings: half noisy copies of gallery rows, half strangers.
+
+    Returns:
+        (queries, expected row or -1 for strangers)
+    """
+    rng = np.random.default_rng(seed)
+    known = count // 2
+    rows = rng.choice(len(encodings), known, replace=len(encodings) < known)
+    # Noise of ~0.35 distance, typical of the same person in another photo
+    queries = np.asarray(encodings[rows], dtype=np.float32) + rng.normal(0, 0.03, (known, 128)).astype(np.float32)
+    strangers = rng.normal(0, ENCODING_SPREAD, (count - known, 128)).astype(np.float32)
+    return np.concatenate([queries, strangers]), np.concatenate([rows, np.full(count - known, -1)])
+
+def exact_matches(encodings, queries):
+    """Best row and distance per query with face_recognition's float64 face_distance."""
+    import face_recognition
+
+    known = np.asarray(encodings, dtype=np.float64)
+    rows, distances = [], []
+    for query in queries:
+        face_distances = face_recognition.face_distance(known, query.astype(np.float64))
+        best = int(np.argmin(face_distances))
+        rows.append(best)
+        distances.append(face_distances[best])
+    return np.array(rows), np.array(distances)
+
+def benchmark(encodings, queries, kinds, candidates, tolerance=0.6):
+    """Time and score each gallery representation against exact float64 matching.
+
+    Queries are matched one at a time, as cameras do per detected face.
+
+    Returns:
+        List of result dicts, exact float32 matching first
+    """
+    reference_rows, reference_distances = exact_matches(encodings, queries)
+    reference_match = reference_distances <= tolerance
+
+    results = []
+    for kind in [None] + list(kinds):
+        started = time.perf_counter()
+        index = build_index(encodings, kind)
+        build_seconds = time.perf_counter() - started
+
+        latencies, rows, distances = [], [], []
+        for query in queries:
+            started = time.perf_counter()
+            row, distance = rerank(index, encodings, query[None, :], candidates)
+            latencies.append(time.perf_counter() - started)
+            rows.append(row[0])
+            distances.append(distance[0])
+        rows, distances = np.array(rows), np.array(distances)
+        matched = distances <= tolerance
+        latencies = np.array(latencies) * 1000
+
+        results.append({
+            "kind": kind or "float32",
+            "memory_mb": (index.nbytes if index is not None else len(encodings) * 128 * 4) / 1e6,
+            "build_seconds": build_seconds,
+            "latency_ms": float(latencies.mean()),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+            # Same closest member as float64 face_distance
+            "top1_agreement": float(np.mean(rows == reference_rows)),
+            # Same answer a camera would give: the same member, or Unknown for both
+            "decision_agreement": float(np.mean((matched == reference_match) & (~matched | (rows == reference_rows)))),
+            "max_distance_error": float(np.max(np.abs(distances - reference_distances))),
+        })
+    return results
+
+@click.command('benchmark-gallery')
+@click.option('--size', type=int, default=100000, help='Synthetic gallery size (ignored with --real).')
+@click.option('--real', is_flag=True, help='Use the enrolled gallery instead of synthetic encodings.')
+@click.option('--queries', 'query_count', type=int, default=200, help='Faces to look up.')
+@click.option('--kinds', default=','.join(INDEX_TYPES), help='Comma-separated representations to compare.')
+@click.option('--rerank', 'candidates', type=int, default=None, help='Candidates re-ranked exactly (default: GALLERY_RERANK).')
+@with_appcontext
+def benchmark_gallery_command(size, real, query_count, kinds, candidates):
+    """Compare memory, latency and accuracy of the gallery representations."""
+    from app.database.gallery import load_gallery
+
+    if real:
+        encodings = load_gallery()[0]
+        if len(encodings) == 0:
+            raise click.ClickException('No members have face encodings.')
+    else:
+        encodings = synthetic_gallery(size)
+    kinds = [kind.strip() for kind in kinds.split(',') if kind.strip()]
+    candidates = candidates or current_app.config['GALLERY_RERANK']
+    queries, _ = make_queries(encodings, query_count)
+
+    # What the gallery used to cost: a list of separate float64 arrays
+    list_mb = len(encodings) * sys.getsizeof(np.zeros(128)) / 1e6
+    click.echo(f'{len(encodings)} faces, {len(queries)} queries, top {candidates} re-ranked; '
+               f'float64 list would use {list_mb:.0f} MB.')
+    click.echo(f'{"kind":<8} {"MB":>8} {"build s":>8} {"ms/face":>8} {"p95 ms":>8} '
+               f'{"top-1":>7} {"decision":>9} {"max err":>8}')
+    for result in benchmark(encodings, queries, kinds, candidates):
+        click.echo(f'{result["kind"]:<8} {result["memory_mb"]:>8.1f} {result["build_seconds"]:>8.2f} '
+                   f'{result["latency_ms"]:>8.2f} {result["latency_p95_ms"]:>8.2f} '
+                   f'{result["top1_agreement"]:>7.1%} {result["decision_agreement"]:>9.1%} '
+                   f'{result["max_distance_error"]:>8.4f}')
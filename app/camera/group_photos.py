@@ -0,0 +1,193 @@
+import base64
+import multiprocessing
+import os
+import threading
+import cv2
+import face_recognition
+import numpy as np
+from app.camera.recognition_workers import match_encodings
+
+# Tiles are detected independently; faces smaller than the overlap lie
+# wholly inside at least one tile
+TILE_SIZE = 1024
+TILE_OVERLAP = 256
+
+# Smallest face (pixels) the HOG detector finds without upsampling. Photos
+# split into tiles also get a downscaled whole-image pass, scaled so faces
+# too big for the tile overlap are still at least this size
+DETECTOR_MIN_FACE = 80
+
+# Faces per encoding task; small batches keep all workers busy
+ENCODE_BATCH = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker():
+    # Parallelism comes from the processes; keep OpenCV single-threaded in each
+    cv2.setNumThreads(1)
+
+def get_pool(workers=None):
+    """Return the shared process pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('spawn')
+            _pool = context.Pool(workers or os.cpu_count() or 1, initializer=_init_worker)
+        return _pool
+
+def _detect_tile(task):
+    """Find faces in one tile (runs in a worker process).
+
+    Returns:
+        List of (top, right, bottom, left) in full-image coordinates
+    """
+    tile, top, left, upsample, scale = task
+    rgb = cv2.cvtColor(tile, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb, number_of_times_to_upsample=upsample, model="hog")
+    return [(int(t / scale) + top, int(r / scale) + left, int(b / scale) + top, int(l / scale) + left)
+            for (t, r, b, l) in locations]
+
+def _encode_faces(crops):
+    """Encode a batch of face crops (runs in a worker process).
+
+    Args:
+        crops: List of (BGR crop, face location within the crop)
+
+    Returns:
+        List of 128-d float32 encodings (None where encoding failed)
+    """
+    encodings = []
+    for crop, location in crops:
+        rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        found = face_recognition.face_encodings(rgb, known_face_locations=[location])
+        encodings.append(np.asarray(found[0], dtype=np.float32) if found else None)
+    return encodings
+
+def _tiles(image, upsample):
+    """Split an image into overlapping tiles, plus a downscaled copy of the whole image.
+
+    Faces larger than TILE_OVERLAP can be cut by every tile they touch; the
+    whole-image pass finds those instead.
+    """
+    height, width = image.shape[:2]
+    step = TILE_SIZE - TILE_OVERLAP
+    for top in range(0, max(1, height - TILE_OVERLAP), step):
+        for left in range(0, max(1, width - TILE_OVERLAP), step):
+            tile = np.ascontiguousarray(image[top:top + TILE_SIZE, left:left + TILE_SIZE])
+            yield tile, top, left, upsample, 1.0
+
+    if max(height, width) > TILE_SIZE:
+        scale = min(1.0, max(TILE_SIZE / max(height, width), DETECTOR_MIN_FACE / TILE_OVERLAP))
+        whole = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        yield whole, 0, 0, 0, scale
+
+def _merge_boxes(locations, overlap=0.5):
+    """Drop duplicate detections of the same face from overlapping tiles.
+
+    A box is a duplicate when most of the smaller box lies inside a larger
+    one; the larger box (usually the one not cut by a tile edge) is kept.
+    """
+    boxes = sorted(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True)
+    kept = []
+    for top, right, bottom, left in boxes:
+        area = max(1, (bottom - top) * (right - left))
+        duplicate = False
+        for k_top, k_right, k_bottom, k_left in kept:
+            inter_height = min(bottom, k_bottom) - max(top, k_top)
+            inter_width = min(right, k_right) - max(left, k_left)
+            if inter_height > 0 and inter_width > 0 and inter_height * inter_width / area > overlap:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((top, right, bottom, left))
+    return kept
+
+def _face_crop(image, location, margin=0.3):
+    """Cut a face out with some context, returning the crop and the face's box within it."""
+    top, right, bottom, left = location
+    pad = int(max(bottom - top, right - left) * margin)
+    crop_top, crop_left = max(0, top - pad), max(0, left - pad)
+    crop_bottom = min(image.shape[0], bottom + pad)
+    crop_right = min(image.shape[1], right + pad)
+    crop = np.ascontiguousarray(image[crop_top:crop_bottom, crop_left:crop_right])
+    return crop, (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+
+def _thumbnail(crop, size=96):
+    """Return a small JPEG of a face as a data URI for the review page."""
+    scale = size / max(crop.shape[:2])
+    if scale < 1:
+        crop = cv2.resize(crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))),
+                          interpolation=cv2.INTER_AREA)
+    ret, jpeg = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    if not ret:
+        return None
+    return 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode('ascii')
+
+def recognize_group_photos(images, gallery, threshold=0.6, upsample=None, workers=None):
+    """Find and identify every face in a set of group photos.
+
+    Detection runs per tile and encoding per batch of face crops, both
+    spread over the process pool; all encodings are then matched against
+    the gallery in a single vectorized pass.
+
+    Args:
+        images: List of (name, BGR image)
+        gallery: (known encodings, names, member IDs)
+        threshold: Maximum face distance for a match
+        upsample: Detector upsampling (default: 1 for photos under 4 MP, where
+                  faces are small, otherwise 0)
+        workers: Pool size when the pool is first created
+
+    Returns:
+        List of face dicts (photo, box, member_id, distance, thumbnail), in
+        photo order and top-to-bottom, left-to-right within each photo
+    """
+    pool = get_pool(workers)
+
+    # Detect: all tiles of all photos in one parallel pass
+    tasks, owners = [], []
+    for photo_index, (_, image) in enumerate(images):
+        photo_upsample = upsample
+        if photo_upsample is None:
+            photo_upsample = 1 if image.shape[0] * image.shape[1] < 4_000_000 else 0
+        for task in _tiles(image, photo_upsample):
+            tasks.append(task)
+            owners.append(photo_index)
+
+    locations_by_photo = [[] for _ in images]
+    for photo_index, locations in zip(owners, pool.imap(_detect_tile, tasks)):
+        locations_by_photo[photo_index].extend(locations)
+
+    # Encode: crops of every face, in small batches
+    faces, crops = [], []
+    for photo_index, (name, image) in enumerate(images):
+        boxes = sorted(_merge_boxes(locations_by_photo[photo_index]), key=lambda box: (box[0] // 50, box[3]))
+        for box in boxes:
+            crop, crop_location = _face_crop(image, box)
+            crops.append((crop, crop_location))
+            faces.append({"photo": name, "box": box, "thumbnail": _thumbnail(crop)})
+
+    batches = [crops[i:i + ENCODE_BATCH] for i in range(0, len(crops), ENCODE_BATCH)]
+    encodings = [encoding for batch in pool.imap(_encode_faces, batches) for encoding in batch]
+
+    # Match: one vectorized pass over all faces that could be encoded
+    encoded = [i for i, encoding in enumerate(encodings) if encoding is not None]
+    matrix = np.stack([encodings[i] for i in encoded]) if encoded else np.empty((0, 128), dtype=np.float32)
+    member_ids, distances = match_encodings(matrix, gallery, threshold, return_distances=True)
+
+    for face in faces:
+        face.update({"member_id": None, "distance": None})
+    for i, member_id, distance in zip(encoded, member_ids, distances):
+        faces[i]["member_id"] = member_id
+        faces[i]["distance"] = distance
+    return faces
+
+def decode_upload(data):
+    """Decode uploaded image bytes without touching the disk.
+
+    Returns:
+        BGR image, or None if the data isn't an image
+    """
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
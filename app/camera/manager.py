@@ -0,0 +1,176 @@
+import threading
+from flask import current_app
+from app.camera.camera import Camera
+from app.camera.scheduler import RecognitionScheduler
+from app.camera.recognition_workers import RecognitionWorkerPool
+from app.camera.utils.face_gallery import FaceGallery
+from app.camera.utils.attendance_writer import AttendanceWriter
+
+class CameraManager:
+    """Runs several cameras at once, addressable by camera ID.
+    
+    All cameras share one FaceGallery, one AttendanceWriter and one
+    RecognitionScheduler, while each keeps its own FaceProcessor state
+    (tracked faces, results, statistics). With RECOGNITION_WORKERS set,
+    detection and encoding run in a shared pool of worker processes.
+    """
+    
+    def __init__(self):
+        self.cameras = {}  # {camera_id: Camera}
+        self.lock = threading.RLock()
+        self.gallery = None  # Loaded on first start, inside an app context
+        self.attendance_writer = AttendanceWriter()
+        self.scheduler = None  # Created on first start from the app config
+        self.worker_pool = None  # Only created when RECOGNITION_WORKERS > 0
+        self.default_id = None  # Camera used when a request doesn't name one
+    
+    def _shared_gallery(self):
+        """Return the shared gallery, loading it on first use."""
+        if self.gallery is None:
+            self.gallery = FaceGallery()
+            self.gallery.reload()
+            self.refresh_roster()
+        return self.gallery
+    
+    def _shared_scheduler(self):
+        """Return the shared scheduler, creating it from the app config on first use."""
+        if self.scheduler is None:
+            self.scheduler = RecognitionScheduler(
+                slots=current_app.config.get('RECOGNITION_SLOTS'),
+                threads=current_app.config.get('RECOGNITION_THREADS')
+            )
+        return self.scheduler
+    
+    def _shared_worker_pool(self):
+        """Return the shared worker pool, or None if recognition runs in-process."""
+        workers = current_app.config.get('RECOGNITION_WORKERS') or 0
+        if self.worker_pool is None and workers > 0:
+            # Workers load known faces from the gallery snapshot the parent keeps current
+            self._shared_gallery()
+            self.worker_pool = RecognitionWorkerPool(
+                workers=workers,
+                gallery_dir=current_app.config['GALLERY_SNAPSHOT_DIR']
+            ).start()
+        return self.worker_pool
+    
+    def start(self, camera_id, recognition_enabled=False):
+        """Start a camera, or return it if it is already running.
+        
+        Args:
+            camera_id: OpenCV device index
+            recognition_enabled: Whether a newly started camera runs recognition
+            
+        Returns:
+            The running Camera
+        """
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            if camera is None:
+                scheduler = self._shared_scheduler()
+                weights = current_app.config.get('CAMERA_WEIGHTS') or {}
+                scheduler.register(camera_id, weights.get(camera_id, 1.0))
+                
+                camera = Camera(
+                    camera_id=camera_id,
+                    recognition_enabled=recognition_enabled,
+                    gallery=self._shared_gallery(),
+                    attendance_writer=self.attendance_writer,
+                    scheduler=scheduler,
+                    worker_pool=self._shared_worker_pool(),
+                    passthrough=current_app.config.get('CAMERA_MJPEG_PASSTHROUGH', False),
+                    source=(current_app.config.get('CAMERA_SOURCES') or {}).get(camera_id)
+                )
+                camera.start()
+                self.cameras[camera_id] = camera
+            self.default_id = camera_id
+            return camera
+    
+    def get(self, camera_id=None):
+        """Return a running camera, or None.
+        
+        Args:
+            camera_id: Camera ID (default: the most recently started camera)
+        """
+        with self.lock:
+            if camera_id is None:
+                camera_id = self.default_id
+            return self.cameras.get(camera_id)
+    
+    def stop(self, camera_id=None):
+        """Stop a camera.
+        
+        Args:
+            camera_id: Camera ID (default: the most recently started camera)
+            
+        Returns:
+            bool: True if a camera was stopped
+        """
+        with self.lock:
+            if camera_id is None:
+                camera_id = self.default_id
+            camera = self.cameras.pop(camera_id, None)
+            if camera_id == self.default_id:
+                # Fall back to any other running camera
+                self.default_id = next(iter(self.cameras), None)
+        
+        if camera is None:
+            return False
+        camera.stop()
+        if self.scheduler is not None:
+            self.scheduler.unregister(camera_id)
+        return True
+    
+    def stop_all(self):
+        """Stop every running camera."""
+        with self.lock:
+            cameras = list(self.cameras.values())
+            self.cameras = {}
+            self.default_id = None
+        for camera in cameras:
+            camera.stop()
+            if self.scheduler is not None:
+                self.scheduler.unregister(camera.camera_id)
+        if self.worker_pool is not None:
+            self.worker_pool.stop()
+            self.worker_pool = None
+    
+    def camera_ids(self):
+        """Return the IDs of all running cameras."""
+        with self.lock:
+            return list(self.cameras.keys())
+    
+    def reload_gallery(self):
+        """Reload the shared gallery after members change."""
+        if self.gallery is not None:
+            self.gallery.reload()
+    
+    def update_gallery_member(self, member_id, name, encoding):
+        """Add or replace one member's face in the shared gallery."""
+        if self.gallery is not None:
+            self.gallery.upsert(member_id, name, encoding)
+    
+    def refresh_roster(self):
+        """Match the active meeting's expected attendees first.
+        
+        Called when a meeting starts, ends or is deleted and when its roster changes.
+        """
+        from app.database.meetings import get_active_meeting, get_expected_attendees
+        
+        if self.gallery is None:
+            return
+        meeting = get_active_meeting()
+        member_ids = []
+        if meeting is not None:
+            member_ids, _ = get_expected_attendees(meeting['id'], history=current_app.config['ROSTER_HISTORY_MEETINGS'],
+                                                   min_attended=current_app.config['ROSTER_MIN_ATTENDED'])
+        self.gallery.set_roster(member_ids, current_app.config['ROSTER_MATCH_TOLERANCE'])
+    
+    def get_stats(self):
+        """Return per-camera statistics and the scheduler's global budget."""
+        with self.lock:
+            cameras = dict(self.cameras)
+        return {
+            "cameras": {camera_id: camera.get_stats() for camera_id, camera in cameras.items()},
+            "scheduler": self.scheduler.get_stats() if self.scheduler is not None else None,
+            "workers": self.worker_pool.get_stats() if self.worker_pool is not None else None
+        }
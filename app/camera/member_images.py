@@ -0,0 +1,169 @@
+import hashlib
+import multiprocessing
+import os
+import click
+import cv2
+import numpy as np
+from flask import current_app, g, url_for
+from flask.cli import with_appcontext
+
+# Sizes generated for every member photo: longest side in pixels, and
+# whether the image is cropped to a centred square first
+DERIVATIVE_SIZES = {
+    'avatar': (320, True),   # Member list cards (220px tall, with headroom for high-DPI screens)
+    'card': (600, False),    # Member page, welcome card
+    'full': (1600, False),   # Anything needing detail, instead of the raw upload
+}
+
+DERIVATIVE_QUALITY = 85
+
+# Subfolder of UPLOAD_FOLDER holding derivatives; names carry a content hash
+DERIVED_DIR = 'derived'
+
+def make_derivatives(data, image_path, upload_folder):
+    """Write the sized versions of a photo.
+
+    Needs no app context, so bulk imports can run it in worker processes.
+    File names include a hash of their contents, so a changed photo always
+    gets new URLs and old ones can be cached forever.
+
+    Args:
+        data: Encoded image bytes
+        image_path: The photo's file name in the upload folder
+        upload_folder: UPLOAD_FOLDER
+
+    Returns:
+        {size name: path relative to the upload folder}, or None if the data
+        isn't an image
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    directory = os.path.join(upload_folder, DERIVED_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+
+    variants = {}
+    for size, (max_side, square) in DERIVATIVE_SIZES.items():
+        source = image
+        if square:
+            height, width = source.shape[:2]
+            side = min(height, width)
+            top, left = (height - side) // 2, (width - side) // 2
+            source = source[top:top + side, left:left + side]
+
+        scale = max_side / max(source.shape[:2])
+        if scale < 1:
+            source = cv2.resize(source, (max(1, round(source.shape[1] * scale)), max(1, round(source.shape[0] * scale))),
+                                interpolation=cv2.INTER_AREA)
+
+        ret, jpeg = cv2.imencode('.jpg', source, [cv2.IMWRITE_JPEG_QUALITY, DERIVATIVE_QUALITY])
+        if not ret:
+            continue
+        jpeg = jpeg.tobytes()
+        digest = hashlib.sha1(jpeg).hexdigest()[:12]
+        filename = f"{stem}-{size}-{digest}.jpg"
+        path = os.path.join(directory, filename)
+
+        # Same name means same bytes, so an existing file never needs rewriting
+        if not os.path.exists(path):
+            with open(path + '.tmp', 'wb') as f:
+                f.write(jpeg)
+            os.replace(path + '.tmp', path)
+        variants[size] = f"{DERIVED_DIR}/{filename}"
+
+    return variants
+
+def generate_member_derivatives(image_path, data=None):
+    """Create and record the derivatives of a member photo.
+
+    Args:
+        image_path: The photo's file name in the upload folder
+        data: The photo's bytes (read from the upload folder if omitted)
+
+    Returns:
+        {size name: path}, or None if the photo couldn't be read
+    """
+    from app.database.members import save_image_variants
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if data is None:
+        try:
+            with open(os.path.join(upload_folder, image_path), 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            print(f"Error reading member image {image_path}: {e}")
+            return None
+
+    variants = make_derivatives(data, image_path, upload_folder)
+    if variants:
+        save_image_variants([(image_path, variants)])
+    return variants
+
+def member_image_url(image_path, size='full'):
+    """Return the URL of a member photo in the given size.
+
+    Falls back to the original upload when no derivative exists yet.
+    Used from templates; variants are read once per request.
+    """
+    from app.database.members import get_image_variants
+
+    if not image_path:
+        return None
+
+    if 'image_variants' not in g:
+        g.image_variants = get_image_variants()
+    variant = g.image_variants.get(image_path, {}).get(size)
+    if variant:
+        return url_for('members.image', filename=variant)
+    return url_for('static', filename='member_images/' + image_path)
+
+def _init_worker():
+    # Each process already gets its own core; don't let OpenCV oversubscribe them
+    cv2.setNumThreads(1)
+
+def _derive(task):
+    """Create one photo's derivatives (runs in a worker process)."""
+    image_path, upload_folder = task
+    try:
+        with open(os.path.join(upload_folder, image_path), 'rb') as f:
+            return image_path, make_derivatives(f.read(), image_path, upload_folder)
+    except OSError as e:
+        print(f"Error reading member image {image_path}: {e}")
+        return image_path, None
+
+@click.command('generate-image-derivatives')
+@click.option('--all', 'regenerate', is_flag=True, help='Regenerate photos that already have derivatives.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@with_appcontext
+def generate_image_derivatives_command(regenerate, workers):
+    """Create avatar, card and full-size versions of member photos."""
+    from app.database import get_db
+    from app.database.members import get_image_variants, save_image_variants
+
+    existing = {} if regenerate else get_image_variants()
+    rows = get_db().execute('SELECT DISTINCT image_path FROM members WHERE image_path IS NOT NULL').fetchall()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    tasks = [(row['image_path'], upload_folder) for row in rows
+             if set(existing.get(row['image_path'], {})) != set(DERIVATIVE_SIZES)]
+    if not tasks:
+        click.echo('Every member photo already has derivatives.')
+        return
+
+    created, failed, batch = 0, 0, []
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(min(workers or os.cpu_count() or 1, len(tasks)), initializer=_init_worker) as pool:
+        for image_path, variants in pool.imap_unordered(_derive, tasks, chunksize=4):
+            if variants:
+                batch.append((image_path, variants))
+                created += 1
+            else:
+                failed += 1
+            if len(batch) >= 100:
+                save_image_variants(batch)
+                batch = []
+    if batch:
+        save_image_variants(batch)
+
+    click.echo(f'Created derivatives for {created} photos ({failed} unreadable).')
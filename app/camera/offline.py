@@ -0,0 +1,254 @@
+import json
+import multiprocessing
+import os
+import time
+from datetime import timedelta
+import click
+import cv2
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from app.camera.recognition_workers import match_encodings
+
+# Gallery loaded once per worker process by _init_worker
+_worker_gallery = None
+
+def _init_worker(gallery_dir):
+    global _worker_gallery
+    from app.database.gallery import read_snapshot_files
+
+    # Each process already gets its own core; don't let OpenCV oversubscribe them
+    cv2.setNumThreads(1)
+    snapshot = read_snapshot_files(gallery_dir)
+    _worker_gallery = snapshot[:3] if snapshot is not None else None
+
+def _process_chunk(task):
+    """Recognize faces in one chunk of the video (runs in a worker process).
+
+    Returns:
+        dict with the chunk index, frames analysed and
+        {member_id: [first_seen, last_seen, hits]} with times in seconds
+    """
+    from app.camera.utils.face_processor import detect_faces
+
+    capture = cv2.VideoCapture(task["path"])
+    capture.set(cv2.CAP_PROP_POS_FRAMES, task["start"])
+
+    sightings = {}
+    buffers = {}
+    frame = None
+    analysed = 0
+    for index in range(task["start"], task["end"]):
+        # Skip unsampled frames without converting them to images
+        if (index - task["start"]) % task["sample_every"]:
+            if not capture.grab():
+                break
+            continue
+
+        success, frame = capture.read(image=frame) if frame is not None else capture.read()
+        if not success:
+            break
+
+        _, face_encodings, _ = detect_faces(frame, buffers)
+        encodings = np.asarray([e for e in face_encodings if e is not None], dtype=np.float32).reshape(-1, 128)
+        seconds = index / task["fps"]
+        for member_id in match_encodings(encodings, _worker_gallery, task["threshold"]):
+            if member_id is None:
+                continue
+            sighting = sightings.setdefault(str(member_id), [seconds, seconds, 0])
+            sighting[1] = seconds
+            sighting[2] += 1
+        analysed += 1
+
+    capture.release()
+    return {"index": task["index"], "frames": analysed, "sightings": sightings}
+
+def merge_sightings(chunk_results, min_hits=2):
+    """Combine per-chunk sightings into one entry per member.
+
+    Args:
+        chunk_results: Iterable of _process_chunk results
+        min_hits: Sampled frames a member must be recognized in to count as
+                  present, which filters out one-off false matches
+
+    Returns:
+        {member_id: {"first_seen", "last_seen", "hits"}} with times in seconds
+    """
+    merged = {}
+    for result in chunk_results:
+        for member_id, (first_seen, last_seen, hits) in result["sightings"].items():
+            entry = merged.setdefault(int(member_id), {"first_seen": first_seen, "last_seen": last_seen, "hits": 0})
+            entry["first_seen"] = min(entry["first_seen"], first_seen)
+            entry["last_seen"] = max(entry["last_seen"], last_seen)
+            entry["hits"] += hits
+
+    return {member_id: entry for member_id, entry in merged.items() if entry["hits"] >= min_hits}
+
+def _load_checkpoint(path, settings):
+    """Return completed chunk results from a checkpoint made with the same settings."""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if checkpoint.get("settings") != settings:
+        print("Checkpoint was made with different settings or a different video; starting over")
+        return {}
+    return {int(index): result for index, result in checkpoint.get("chunks", {}).items()}
+
+def _save_checkpoint(path, settings, completed):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({"settings": settings, "chunks": completed}, f)
+    os.replace(temp_path, path)
+
+def process_video(path, workers=None, chunk_seconds=60.0, sample_fps=2.0, threshold=0.6,
+                  checkpoint_path=None, resume=False, progress=print):
+    """Recognize members in a recorded video using a pool of processes.
+
+    The video is split into time chunks, each decoded and analysed by its
+    own process straight from the file (no real-time replay). Completed
+    chunks are written to the checkpoint, so an interrupted run can resume.
+    Must be called inside an app context; known faces come from the gallery
+    snapshot.
+
+    Args:
+        path: Video file
+        workers: Number of processes (default: CPU count)
+        chunk_seconds: Length of video handed to a process at a time
+        sample_fps: Frames per second of video to analyse
+        threshold: Maximum face distance for a match
+        checkpoint_path: JSON file recording finished chunks (None = no checkpoint)
+        resume: Skip chunks already in the checkpoint
+        progress: Callable receiving progress messages
+
+    Returns:
+        (chunk results, statistics dict)
+    """
+    from app.database.gallery import load_gallery, get_gallery_version
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video file {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    if frame_count <= 0:
+        raise RuntimeError(f"Could not read the frame count of {path}")
+
+    # Make sure the snapshot the workers read matches the database
+    load_gallery()
+
+    chunk_frames = max(1, int(chunk_seconds * fps))
+    sample_every = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+    settings = {
+        "video": os.path.abspath(path),
+        "size": os.path.getsize(path),
+        "mtime": os.path.getmtime(path),
+        "chunk_frames": chunk_frames,
+        "sample_every": sample_every,
+        "threshold": threshold,
+        "gallery_version": get_gallery_version(),
+    }
+
+    completed = _load_checkpoint(checkpoint_path, settings) if checkpoint_path and resume else {}
+
+    tasks = []
+    for index, start in enumerate(range(0, frame_count, chunk_frames)):
+        if index in completed:
+            continue
+        tasks.append({
+            "index": index,
+            "path": path,
+            "start": start,
+            "end": min(start + chunk_frames, frame_count),
+            "fps": fps,
+            "sample_every": sample_every,
+            "threshold": threshold,
+        })
+    total_chunks = len(tasks) + len(completed)
+    if completed:
+        progress(f"Resuming: {len(completed)} of {total_chunks} chunks already done")
+
+    started = time.time()
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(min(workers, len(tasks)), initializer=_init_worker,
+                          initargs=(current_app.config['GALLERY_SNAPSHOT_DIR'],)) as pool:
+            for done, result in enumerate(pool.imap_unordered(_process_chunk, tasks), start=1):
+                completed[result["index"]] = result
+                if checkpoint_path:
+                    _save_checkpoint(checkpoint_path, settings, completed)
+
+                elapsed = time.time() - started
+                remaining = elapsed / done * (len(tasks) - done)
+                progress(f"Chunk {result['index'] + 1}/{total_chunks} done "
+                         f"({len(completed)}/{total_chunks}, {elapsed:.0f}s elapsed, ~{remaining:.0f}s left)")
+
+    results = [completed[index] for index in sorted(completed)]
+    stats = {
+        "chunks": total_chunks,
+        "frames_analysed": sum(result["frames"] for result in results),
+        "video_seconds": frame_count / fps,
+        "elapsed_seconds": time.time() - started,
+    }
+    return results, stats
+
+@click.command('process-video')
+@click.argument('video', type=click.Path(exists=True, dir_okay=False))
+@click.option('--meeting', 'meeting_id', type=int, required=True, help='Meeting to record attendance for.')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--chunk-seconds', type=float, default=60.0, help='Seconds of video per work unit.')
+@click.option('--sample-fps', type=float, default=2.0, help='Frames per second of video to analyse.')
+@click.option('--min-hits', type=int, default=2, help='Sampled frames a member must be recognized in.')
+@click.option('--threshold', type=float, default=0.6, help='Maximum face distance for a match.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='Checkpoint file (default: next to the video).')
+@click.option('--resume', is_flag=True, help='Continue from the checkpoint.')
+@click.option('--replace', is_flag=True, help="Replace the meeting's existing attendance.")
+@click.option('--dry-run', is_flag=True, help='Report who was seen without writing attendance.')
+@with_appcontext
+def process_video_command(video, meeting_id, workers, chunk_seconds, sample_fps, min_hits, threshold,
+                          checkpoint, resume, replace, dry_run):
+    """Compute attendance for a meeting from a recorded video."""
+    from app.database.meetings import get_meeting
+    from app.database.members import get_member
+    from app.database.attendance import record_attendance_batch
+
+    meeting = get_meeting(meeting_id)
+    if meeting is None:
+        raise click.ClickException(f'Meeting {meeting_id} not found.')
+
+    checkpoint = checkpoint or video + '.attendance-checkpoint.json'
+    try:
+        results, stats = process_video(
+            video, workers=workers, chunk_seconds=chunk_seconds, sample_fps=sample_fps,
+            threshold=threshold, checkpoint_path=checkpoint, resume=resume, progress=click.echo
+        )
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    present = merge_sightings(results, min_hits=min_hits)
+    click.echo(f'Analysed {stats["frames_analysed"]} frames from {stats["video_seconds"]:.0f}s of video '
+               f'in {stats["elapsed_seconds"]:.0f}s; {len(present)} members seen.')
+
+    # Timestamp attendance with when each member first appeared in the recording
+    entries = {}
+    for member_id, entry in sorted(present.items(), key=lambda item: item[1]["first_seen"]):
+        member = get_member(member_id)
+        name = member['name'] if member else f'#{member_id}'
+        click.echo(f'  {name}: first seen at {entry["first_seen"]:.0f}s ({entry["hits"]} frames)')
+        entries[member_id] = meeting['start_time'] + timedelta(seconds=entry["first_seen"])
+
+    if dry_run:
+        click.echo('Dry run; no attendance written.')
+        return
+
+    recorded = record_attendance_batch(meeting_id, entries, replace=replace)
+    click.echo(f'Recorded attendance for {recorded} members at "{meeting["title"]}".')
+
+    # The run is complete; a later run should start fresh
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
@@ -0,0 +1,267 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import numpy as np
+from app.camera.frame_bus import FrameBus
+
+def _worker_main(task_queue, result_queue, gallery_dir, threshold):
+    """Recognition worker process: detect, encode and match frames from frame buses.
+
+    Tasks are (camera_id, bus description, sequence) tuples; None stops the worker.
+    Results are small dicts of boxes, member IDs and float32 encodings.
+    """
+    # Imported here so the parent doesn't pay for them twice and spawn stays clean
+    from app.camera.utils.face_processor import detect_faces
+    from app.database.gallery import read_snapshot_files
+
+    buses = {}  # {camera_id: FrameBus}
+    buffers = {}
+    gallery = None
+    gallery_mtime = None
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        camera_id, bus_info, sequence = task
+        result = {"camera_id": camera_id, "sequence": sequence, "dropped": True, "worker": os.getpid()}
+        started = time.time()
+
+        try:
+            bus = buses.get(camera_id)
+            if bus is None or bus.name != bus_info["name"]:
+                # The camera replaced its bus (e.g. for larger frames); drop the old mapping
+                if bus is not None:
+                    bus.close()
+                bus = buses[camera_id] = FrameBus.attach(**bus_info)
+
+            # Pick up a new gallery snapshot when the parent rewrites it
+            try:
+                mtime = os.path.getmtime(os.path.join(gallery_dir, 'index.json'))
+            except OSError:
+                mtime = None
+            if mtime != gallery_mtime:
+                snapshot = read_snapshot_files(gallery_dir)
+                gallery = snapshot[:3] if snapshot is not None else None
+                gallery_mtime = mtime
+
+            frame = bus.read(sequence)
+            if frame is not None:
+                face_locations, face_encodings, qualities = detect_faces(frame, buffers)
+
+                # Results for a slot that was overwritten mid-detection are meaningless
+                if bus.is_current(sequence):
+                    # Only faces that passed the quality gate were encoded and get matched
+                    encoded = [encoding is not None for encoding in face_encodings]
+                    encodings = np.asarray([e for e in face_encodings if e is not None],
+                                           dtype=np.float32).reshape(-1, 128)
+                    matched, matched_distances = match_encodings(encodings, gallery, threshold, return_distances=True)
+                    matched, matched_distances = iter(matched), iter(matched_distances)
+                    result.update({
+                        "dropped": False,
+                        "locations": [tuple(int(v) for v in loc) for loc in face_locations],
+                        "encodings": encodings.tobytes(),
+                        "encoded": encoded,
+                        "qualities": [(float(score), parts) for score, parts in qualities],
+                        "member_ids": [next(matched) if ok else None for ok in encoded],
+                        "distances": [next(matched_distances) if ok else None for ok in encoded],
+                    })
+        except Exception as e:
+            result["error"] = str(e)
+
+        result["elapsed"] = time.time() - started
+        result_queue.put(result)
+
+    for bus in buses.values():
+        bus.close()
+
+def match_encodings(encodings, gallery, threshold, return_distances=False):
+    """Match every encoding against the gallery in one vectorized pass.
+
+    Args:
+        encodings: float32 array of shape (n, 128)
+        gallery: (known encodings, names, member IDs), or None
+        threshold: Maximum face distance for a match
+        return_distances: Also return each face's distance to its closest member
+
+    Returns:
+        List of member IDs (None where nothing is within the threshold), and
+        with return_distances a list of distances (None without a gallery)
+    """
+    if gallery is None or len(encodings) == 0 or len(gallery[0]) == 0:
+        unmatched = [None] * len(encodings)
+        return (unmatched, list(unmatched)) if return_distances else unmatched
+
+    known, _, member_ids = gallery
+    # ||a - b||^2 = ||a||^2 + ||b||^2 - 2ab, for all pairs at once
+    known = np.asarray(known, dtype=np.float32)
+    distances = (np.sum(encodings ** 2, axis=1)[:, None]
+                 + np.sum(known ** 2, axis=1)[None, :]
+                 - 2.0 * encodings @ known.T)
+    distances = np.sqrt(np.maximum(distances, 0.0))
+
+    best = np.argmin(distances, axis=1)
+    matches = [
+        member_ids[b] if distances[i, b] <= threshold else None
+        for i, b in enumerate(best)
+    ]
+    if return_distances:
+        return matches, [float(distances[i, b]) for i, b in enumerate(best)]
+    return matches
+
+class RecognitionWorkerPool:
+    """Runs face detection and encoding in separate processes.
+
+    Cameras publish frames to their FrameBus and submit the sequence number;
+    a worker reads the frame from shared memory, and the result comes back
+    to the camera's callback on a collector thread in this process. At most
+    one frame per worker is in flight, so a busy pool drops frames rather
+    than queueing stale ones.
+
+    Workers that die are restarted, and frames whose result hasn't come back
+    within result_timeout stop counting as in flight, so a crashed worker
+    or a lost result never blocks the pool.
+    """
+
+    def __init__(self, workers=2, gallery_dir=None, threshold=0.6, result_timeout=10.0):
+        """Create a worker pool.
+
+        Args:
+            workers: Number of worker processes
+            gallery_dir: Gallery snapshot directory the workers load known faces from
+            threshold: Maximum face distance for a match (face_recognition's default tolerance)
+            result_timeout: Seconds after which a frame's result is given up on
+        """
+        self.workers = max(1, workers)
+        self.gallery_dir = gallery_dir
+        self.threshold = threshold
+        self.result_timeout = result_timeout
+
+        context = multiprocessing.get_context('spawn')
+        self.context = context
+        self.task_queue = context.Queue()
+        self.result_queue = context.Queue()
+        self.processes = []
+
+        self.lock = threading.Lock()
+        self.pending = {}  # {(camera_id, sequence): submitted at}
+        self.restarts = 0
+        self.callbacks = {}  # {camera_id: callable(result)}
+        self.collector = None
+        self.stopped = False
+
+    def _spawn(self):
+        process = self.context.Process(
+            target=_worker_main,
+            args=(self.task_queue, self.result_queue, self.gallery_dir, self.threshold),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self):
+        """Start the worker processes and the result collector thread."""
+        for _ in range(self.workers):
+            self.processes.append(self._spawn())
+
+        self.stopped = False
+        self.collector = threading.Thread(target=self._collect_results, daemon=True)
+        self.collector.start()
+        return self
+
+    def register(self, camera_id, callback):
+        """Deliver results for a camera to callback(result)."""
+        with self.lock:
+            self.callbacks[camera_id] = callback
+
+    def unregister(self, camera_id):
+        with self.lock:
+            self.callbacks.pop(camera_id, None)
+
+    @property
+    def in_flight(self):
+        return len(self.pending)
+
+    def has_capacity(self):
+        """True if a worker is free to take another frame."""
+        with self.lock:
+            return len(self.pending) < self.workers
+
+    def submit(self, camera_id, bus, sequence):
+        """Hand a published frame to the workers.
+
+        Returns:
+            bool: False if every worker is busy (the frame is skipped)
+        """
+        with self.lock:
+            if len(self.pending) >= self.workers:
+                return False
+            self.pending[(camera_id, sequence)] = time.time()
+        self.task_queue.put((camera_id, bus.describe(), sequence))
+        return True
+
+    def cancel(self, camera_id, sequence):
+        """Stop counting a frame as in flight (its result is ignored if it still arrives)."""
+        with self.lock:
+            self.pending.pop((camera_id, sequence), None)
+
+    def _check_workers(self):
+        """Restart dead workers and give up on results that are overdue."""
+        for index, process in enumerate(self.processes):
+            if not process.is_alive() and not self.stopped:
+                print(f"Recognition worker {process.pid} exited with code {process.exitcode}; restarting")
+                self.processes[index] = self._spawn()
+                self.restarts += 1
+
+        now = time.time()
+        with self.lock:
+            for key, submitted_at in list(self.pending.items()):
+                if now - submitted_at > self.result_timeout:
+                    del self.pending[key]
+
+    def _collect_results(self):
+        """Route worker results to camera callbacks."""
+        while not self.stopped:
+            self._check_workers()
+            try:
+                result = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            with self.lock:
+                self.pending.pop((result["camera_id"], result["sequence"]), None)
+                callback = self.callbacks.get(result["camera_id"])
+
+            if result.get("encodings") is not None:
+                result["encodings"] = np.frombuffer(result["encodings"], dtype=np.float32).reshape(-1, 128)
+
+            if callback is not None:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"Error handling recognition result: {e}")
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "alive": sum(1 for p in self.processes if p.is_alive()),
+                "in_flight": len(self.pending),
+                "restarts": self.restarts,
+            }
+
+    def stop(self):
+        """Stop the workers and the collector thread."""
+        self.stopped = True
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.collector:
+            self.collector.join(timeout=1.0)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import click
+import cv2
+from flask import current_app
+from flask.cli import with_appcontext
+from app.camera.enrollment import MAX_DETECTION_SIDE
+
+def _init_worker():
+    # Each process already gets its own core; don't let OpenCV oversubscribe them
+    cv2.setNumThreads(1)
+
+def _reencode(task):
+    """Encode one member's stored photo (runs in a worker process).
+
+    Returns:
+        (member_id, image_path, encoding or None, status, message)
+    """
+    from app.camera.enrollment import extract_face_encoding
+
+    member_id, image_path, filepath, max_side = task
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        encoding = extract_face_encoding(data, max_side=max_side)
+    except (OSError, ValueError) as e:
+        return member_id, image_path, None, "failed", str(e)
+    except Exception as e:
+        return member_id, image_path, None, "failed", f"Encoding error: {e}"
+
+    if encoding is None:
+        return member_id, image_path, None, "no_face", "No face detected in the photo."
+    return member_id, image_path, encoding, "done", None
+
+def encoding_settings(max_side=MAX_DETECTION_SIDE):
+    """Return the settings that determine encodings, and a run ID derived from them.
+
+    A run interrupted with the same settings resumes; changed settings start
+    a new run.
+    """
+    import face_recognition
+
+    settings = {
+        "max_side": max_side,
+        "face_recognition": getattr(face_recognition, '__version__', None),
+    }
+    run_id = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    return settings, run_id
+
+def reencode_gallery(workers=None, batch_size=50, restart=False, max_side=MAX_DETECTION_SIDE, progress=print):
+    """Re-encode every member's stored photo and swap the results in at the end.
+
+    Results are written to the staging table in batches, which also records
+    progress: a run stopped part way resumes where it left off. Members keep
+    their current encodings (and cameras keep recognizing them) until the
+    whole run is swapped in with a single transaction. Must be called inside
+    an app context.
+
+    Args:
+        workers: Number of processes (default: CPU count)
+        batch_size: Results per staging transaction
+        restart: Discard staged results of an earlier run instead of resuming
+        max_side: Longest side photos are scaled to before detection
+        progress: Callable receiving progress messages
+
+    Returns:
+        dict with the run ID, {status: count} and the number of members updated
+    """
+    from app.database import get_db
+    from app.database.gallery import (
+        ensure_staging_table, seed_staged_members, get_pending_members, stage_encodings,
+        get_staged_summary, swap_staged_encodings, clear_staged_encodings,
+        write_gallery_snapshot
+    )
+
+    settings, run_id = encoding_settings(max_side)
+    ensure_staging_table()
+    db = get_db()
+    if restart:
+        clear_staged_encodings()
+    else:
+        # Results of runs with other settings can never be swapped in
+        with db:
+            db.execute('DELETE FROM staged_encodings WHERE run_id != ?', (run_id,))
+
+    # Records each member's current encoding, so photos replaced mid-run are detected
+    done, _ = seed_staged_members(run_id)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    tasks = [
+        (member_id, image_path, os.path.join(upload_folder, image_path), max_side)
+        for member_id, image_path in get_pending_members(run_id)
+    ]
+    if done:
+        progress(f"Resuming run {run_id}: {done} of {done + len(tasks)} members already encoded")
+
+    started = time.time()
+    if tasks:
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(min(workers or os.cpu_count() or 1, len(tasks)), initializer=_init_worker) as pool:
+            batch = []
+            for count, result in enumerate(pool.imap_unordered(_reencode, tasks, chunksize=4), start=1):
+                batch.append(result)
+                if len(batch) >= batch_size or count == len(tasks):
+                    stage_encodings(run_id, batch)
+                    batch = []
+                    elapsed = time.time() - started
+                    progress(f"Encoded {count}/{len(tasks)} photos "
+                             f"({elapsed:.0f}s elapsed, ~{elapsed / count * (len(tasks) - count):.0f}s left)")
+
+    summary = get_staged_summary(run_id)
+    updated = swap_staged_encodings(run_id)
+
+    # Rebuild the snapshot now so workers and cameras don't each decode the new gallery
+    try:
+        write_gallery_snapshot()
+    except OSError as e:
+        print(f"Error writing gallery snapshot: {e}")
+    _reload_camera_gallery()
+
+    return {"run_id": run_id, "settings": settings, "statuses": summary, "updated": updated}
+
+def _reload_camera_gallery():
+    from app.camera.routes import get_camera_manager
+
+    try:
+        get_camera_manager().reload_gallery()
+    except RuntimeError as e:
+        print(f"Error reloading camera gallery: {e}")
+
+# Re-encoding started from the admin page; only one runs at a time
+reencode_job = {"status": "idle", "progress": None, "result": None, "error": None}
+_reencode_lock = threading.Lock()
+
+def start_reencode_job(app, restart=False):
+    """Run reencode_gallery on a background thread.
+
+    Returns:
+        bool: False if a run is already in progress
+    """
+    with _reencode_lock:
+        if reencode_job["status"] == "running":
+            return False
+        reencode_job.update(status="running", progress="Starting", result=None, error=None)
+
+    def run():
+        try:
+            with app.app_context():
+                result = reencode_gallery(
+                    workers=app.config.get('IMPORT_WORKERS'), restart=restart,
+                    progress=lambda message: reencode_job.update(progress=message)
+                )
+            reencode_job.update(status="done", result=result)
+        except Exception as e:
+            # Staged results are kept, so starting again resumes from here
+            print(f"Error re-encoding gallery: {e}")
+            reencode_job.update(status="failed", error=str(e))
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+@click.command('reencode-gallery')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--batch-size', type=int, default=50, help='Results per checkpoint transaction.')
+@click.option('--restart', is_flag=True, help='Discard progress of an interrupted run.')
+@with_appcontext
+def reencode_gallery_command(workers, batch_size, restart):
+    """Re-encode every member's face from their stored photo."""
+    result = reencode_gallery(workers=workers, batch_size=batch_size, restart=restart, progress=click.echo)
+    statuses = ', '.join(f'{count} {status}' for status, count in sorted(result["statuses"].items()))
+    click.echo(f'Run {result["run_id"]}: {statuses or "no photos"}; updated {result["updated"]} members.')
@@ -1,19 +1,51 @@
-from flask import Blueprint, render_template, Response, request, jsonify, current_app
-from app.camera.camera import Camera, list_available_cameras
-from app.database.members import create_member, get_member_by_name, update_member, get_member
-from app.database.attendance import record_attendance
+from flask import Blueprint, render_template, Response, request, jsonify, current_app, stream_with_context
+from app.camera.camera import list_available_cameras
+from app.camera.manager import CameraManager
+from app.camera.daemon import DaemonClient
+from app.camera.member_images import member_image_url
+from app.camera.duplicates import DuplicateFaceError
+from app.camera.utils.stream_encoder import parse_stream_profile
+from app.database.members import get_member_by_name, update_member, get_member
 from app.database.meetings import get_active_meeting
-import os
+import json
 import traceback
 import time
-from datetime import datetime
-import cv2
-import face_recognition
 
 bp = Blueprint('camera', __name__, url_prefix='/camera')
 
-# Store active camera
-active_camera = None
+# Cameras running in this process, addressed by the `id` request argument.
+# Unused when CAMERA_DAEMON_SOCKET points at a camera daemon.
+local_camera_manager = CameraManager()
+daemon_clients = {}  # {socket path: DaemonClient}
+
+def get_camera_manager():
+    """Return the camera manager for this app.
+    
+    With CAMERA_DAEMON_SOCKET set, cameras live in the camera daemon and
+    are reached through a DaemonClient, so any number of web workers can
+    share them. Otherwise they run inside this process.
+    """
+    socket_path = current_app.config.get('CAMERA_DAEMON_SOCKET')
+    if not socket_path:
+        return local_camera_manager
+    
+    client = daemon_clients.get(socket_path)
+    if client is None:
+        client = daemon_clients[socket_path] = DaemonClient(socket_path)
+    return client
+
+def get_camera():
+    """Return the camera addressed by the request, or None.
+    
+    The camera ID is read from the `id` query argument, or from an `id`
+    field in a JSON body. Without one, the most recently started camera is used.
+    """
+    camera_id = request.args.get('id', default=None, type=int)
+    if camera_id is None and request.is_json:
+        data = request.get_json(silent=True) or {}
+        if isinstance(data.get('id'), int):
+            camera_id = data['id']
+    return get_camera_manager().get(camera_id)
 
 @bp.route('/')
 def index():
@@ -24,48 +56,50 @@ def index():
 
 @bp.route('/stream')
 def stream():
-    """Video streaming route."""
-    global active_camera
+    """Video streaming route.
+    
+    Query arguments:
+        id: Camera ID
+        show_faces: Draw face boxes into the frames
+        profile: Stream tier from STREAM_PROFILES (e.g. 320p for remote viewers)
+        height, quality, fps: Override individual settings of the profile
+        passthrough: Forward the camera's MJPEG bytes without re-encoding
+                     (ignores height and quality; not used with show_faces)
+    """
     camera_id = request.args.get('id', default=0, type=int)
     show_faces = request.args.get('show_faces', default='false', type=str).lower() == 'true'
+    passthrough = request.args.get('passthrough', default='false', type=str).lower() == 'true'
+    profile = parse_stream_profile(request.args, current_app.config['STREAM_PROFILES'])
+    if profile is None:
+        return "Unknown stream profile", 400
     
-    # Initialize camera if not active or different camera selected
-    if active_camera is None or active_camera.camera_id != camera_id:
-        if active_camera:
-            active_camera.stop()
-        active_camera = Camera(camera_id=camera_id, recognition_enabled=False)
+    # Start the camera if it isn't running yet; other cameras keep running
+    camera_manager = get_camera_manager()
+    camera = camera_manager.get(camera_id)
+    if camera is None:
         try:
-            active_camera.start()
+            camera = camera_manager.start(camera_id)
         except RuntimeError:
             return "Camera not available", 404
     
-    return Response(generate_frames(active_camera, show_faces),
+    return Response(generate_frames(camera, show_faces, profile, passthrough, camera_manager),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @bp.route('/stop', methods=['POST'])
 def stop_camera():
-    """Stop the active camera."""
-    global active_camera
-    if active_camera:
-        active_camera.stop()
-        active_camera = None
+    """Stop a camera (the one given by `id`, or the most recently started)."""
+    camera = get_camera()
+    if camera and get_camera_manager().stop(camera.camera_id):
         return jsonify({"success": True})
     return jsonify({"success": False, "error": "No active camera"})
 
 @bp.route('/start', methods=['POST'])
 def start_camera():
-    """Start a camera with the given ID."""
-    global active_camera
+    """Start a camera with the given ID alongside any running cameras."""
     camera_id = request.json.get('id', 0)
     
-    # Stop current camera if active
-    if active_camera:
-        active_camera.stop()
-    
-    # Start new camera
     try:
-        active_camera = Camera(camera_id=camera_id, recognition_enabled=False)
-        active_camera.start()
+        get_camera_manager().start(camera_id)
         return jsonify({"success": True})
     except RuntimeError as e:
         return jsonify({"success": False, "error": str(e)})
@@ -73,28 +107,28 @@ def start_camera():
 @bp.route('/recognition/toggle', methods=['POST'])
 def toggle_recognition():
     """Toggle face recognition."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"error": "No active camera"}), 400
     
     enabled = request.json.get('enabled', None)
     if enabled is not None:
         enabled = bool(enabled)
     
-    result = active_camera.toggle_recognition(enabled)
+    result = camera.toggle_recognition(enabled)
     return jsonify({"recognition_enabled": result})
 
 @bp.route('/recognition/result')
 def recognition_result():
     """Get the latest recognition result."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"error": "No active camera"}), 400
     
-    if not active_camera.recognition_enabled:
+    if not camera.recognition_enabled:
         return jsonify({"error": "Face recognition is not enabled"}), 400
     
-    result = active_camera.get_recognition_result()
+    result = camera.get_recognition_result()
     if result is None:
         return jsonify({"error": "No recognition results available"}), 404
     
@@ -113,6 +147,31 @@ def recognition_result():
     
     return jsonify(result)
 
+@bp.route('/overlay')
+def overlay():
+    """Get face boxes and labels of the last processed frame."""
+    camera = get_camera()
+    if camera is None:
+        return jsonify({"error": "No active camera"}), 400
+    
+    return jsonify({"overlay": camera.get_overlay()})
+
+@bp.route('/overlays')
+def overlays():
+    """Stream face boxes and labels as server-sent events.
+    
+    Lets the camera page draw overlays on the raw stream instead of
+    requesting a second, annotated stream that has to be drawn and encoded
+    on the server. One event is sent per processed frame.
+    """
+    camera = get_camera()
+    if camera is None:
+        return jsonify({"error": "No active camera"}), 400
+    
+    return Response(stream_with_context(generate_overlays(camera)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Helper function to record attendance for newly enrolled members
 def record_new_member_attendance(member_id):
     """Record attendance for a newly enrolled member if there's an active meeting."""
@@ -120,8 +179,7 @@ def record_new_member_attendance(member_id):
     attendance_recorded = False
     if active_meeting:
         try:
-            record_attendance(member_id, active_meeting['id'])
-            attendance_recorded = True
+            attendance_recorded = get_camera_manager().attendance_writer.record([member_id], active_meeting['id']) > 0
         except Exception as e:
             print(f"Error recording attendance for new member: {e}")
     return attendance_recorded
@@ -129,8 +187,8 @@ def record_new_member_attendance(member_id):
 @bp.route('/recognition/enroll', methods=['POST'])
 def enroll_face():
     """Enroll a new face for recognition."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"error": "No active camera"}), 400
     
     # Get all required data for member creation
@@ -143,6 +201,7 @@ def enroll_face():
     age = data.get('age', None)
     bio = data.get('bio', None)
     face_index = data.get('face_index')  # This could be an ID now
+    allow_duplicate = bool(data.get('allow_duplicate'))
     
     if not name:
         return jsonify({"error": "Name is required"}), 400
@@ -153,62 +212,21 @@ def enroll_face():
         return jsonify({"error": f"A member named '{name}' already exists. Please use a different name."}), 400
     
     try:
-        # Get face data from the face processor
-        face_processor = active_camera.face_processor
-        
-        # Look for the specified face ID in the unknown faces
-        face_image = None
-        face_encoding = None
-        
-        for face in face_processor.persistent_faces["unknown"]:
-            if face["id"] == face_index:
-                face_image = face["image"]
-                face_encoding = face["encoding"]
-                break
-                
-        # If we couldn't find the face, return an error
-        if face_image is None:
-            return jsonify({"error": "Face not found. The face may have been removed or the system restarted."}), 404
-            
-        if face_encoding is None:
-            return jsonify({"error": "Face encoding not available. Please ensure the face is in view."}), 400
-        
-        # Generate a unique filename using timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{name.replace(' ', '_').lower()}_{timestamp}.jpg"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        
-        # Save the image
-        cv2.imwrite(filepath, face_image)
-        
-        # Save to database and get member ID
-        member_id = create_member(name, major, age, bio, face_encoding, filename)
-        
-        # Reload faces from the database to include the new member
-        face_processor.load_known_faces_from_db()
-        
-        # Add to persistent known faces - this will make them appear in recognized members list
-        # since they're obviously present in the current session
-        face_processor.persistent_faces["known"][name] = {
-            "image": face_image,
-            "in_view": True,
-            "last_seen": time.time(),
-            "member_id": member_id,
-            "encoding": face_encoding
-        }
-        
-        # Remove from unknown faces
-        face_processor.persistent_faces["unknown"] = [
-            face for face in face_processor.persistent_faces["unknown"] 
-            if face["id"] != face_index
-        ]
+        # The camera creates the member from its tracked face and starts recognizing them
+        try:
+            member_id = camera.enroll_unknown_face(face_index, name, major, age, bio,
+                                                   allow_duplicate=allow_duplicate)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except DuplicateFaceError as e:
+            # The page asks whether to enroll anyway and resends with allow_duplicate
+            return jsonify({"error": str(e), "duplicate": True, "matches": e.matches}), 409
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Record attendance for the newly enrolled member
         attendance_recorded = record_new_member_attendance(member_id)
         
-        # Force an immediate update of the recognition result
-        active_camera.process_this_frame = True
-        
         return jsonify({
             "success": True, 
             "message": f"Enrolled {name} successfully" + (" and recorded attendance" if attendance_recorded else ""), 
@@ -229,34 +247,44 @@ def camera_list():
     # Use the optimized camera detection with reasonable max index (10)
     cameras = list_available_cameras(max_cameras=10)
     
+    # Configured recordings and synthetic sources are listed like devices
+    cameras += sorted(camera_id for camera_id in current_app.config.get('CAMERA_SOURCES', {}) if camera_id not in cameras)
+    
     elapsed = time.time() - start_time
     print(f"Camera list scan completed in {elapsed:.2f} seconds. Found {len(cameras)} cameras.")
     
     return jsonify({"cameras": cameras, "scan_time": f"{elapsed:.2f} seconds"})
 
+@bp.route('/stats')
+def camera_stats():
+    """Get capture and recognition statistics for every running camera."""
+    return jsonify(get_camera_manager().get_stats())
+
 @bp.route('/info')
 def camera_info():
     """Get info about the currently active camera."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"error": "No active camera"})
     
-    return jsonify(active_camera.get_camera_properties())
+    return jsonify(camera.get_camera_properties())
 
 @bp.route('/status')
 def camera_status():
     """Check if camera is active."""
-    global active_camera
-    return jsonify({"active": active_camera is not None})
+    return jsonify({
+        "active": get_camera() is not None,
+        "cameras": get_camera_manager().camera_ids()
+    })
     
 @bp.route('/face_thumbnail/<thumbnail_id>')
 def face_thumbnail(thumbnail_id):
     """Get a thumbnail of a specific face by its ID."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return "No active camera", 404
     
-    thumbnail = active_camera.get_face_thumbnail(thumbnail_id)
+    thumbnail = camera.get_face_thumbnail(thumbnail_id)
     if thumbnail:
         response = Response(thumbnail, mimetype='image/jpeg')
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
@@ -277,7 +305,8 @@ def member_info(member_id):
                 "age": member['age'],
                 "bio": member['bio'],
                 "meeting_count": member['meeting_count'],
-                "image_path": member['image_path']
+                "image_path": member['image_path'],
+                "image_url": member_image_url(member['image_path'], 'card')
             })
         else:
             return jsonify({"error": "Member not found"}), 404
@@ -288,9 +317,9 @@ def member_info(member_id):
 @bp.route('/member/update', methods=['POST'])
 def update_member_info():
     """Update an existing member's information."""
-    global active_camera
+    camera = get_camera()
     
-    if active_camera is None:
+    if camera is None:
         return jsonify({"error": "No active camera"}), 400
     
     # Get all required data for member update
@@ -321,23 +350,10 @@ def update_member_info():
             return jsonify({"error": "Member not found or could not be updated"}), 404
         
         # Reload faces from database to refresh the data
-        active_camera.face_processor.load_known_faces_from_db()
+        get_camera_manager().reload_gallery()
         
         # Also need to update any persistent faces if present
-        face_processor = active_camera.face_processor
-        
-        # Find any known faces with this member ID
-        old_name = None
-        for face_name in list(face_processor.persistent_faces["known"].keys()):
-            face_data = face_processor.persistent_faces["known"][face_name]
-            if face_data.get("member_id") == member_id:
-                old_name = face_name
-                break
-                
-        # If found and name changed, update the entry
-        if old_name and old_name != name:
-            face_data = face_processor.persistent_faces["known"].pop(old_name)
-            face_processor.persistent_faces["known"][name] = face_data
+        camera.rename_known_face(member_id, name)
         
         return jsonify({
             "success": True,
@@ -352,20 +368,20 @@ def update_member_info():
 @bp.route('/reset', methods=['POST'])
 def reset_camera():
     """Reset the camera recognition state."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"success": False, "error": "No active camera"}), 400
     
     # Reset recognition state
-    active_camera.reset_recognition_state()
+    camera.reset_recognition_state()
     
     return jsonify({"success": True, "message": "Camera recognition state reset"})
 
 @bp.route('/record_all_attendance', methods=['POST'])
 def record_all_attendance():
     """Record attendance for all members in the recognized members list."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"success": False, "error": "No active camera"}), 400
     
     # Get active meeting
@@ -375,7 +391,7 @@ def record_all_attendance():
     
     try:
         # Record attendance for all recognized faces
-        recorded_count = active_camera.face_processor.record_attendance(active_meeting['id'])
+        recorded_count = camera.record_attendance(active_meeting['id'])
         
         return jsonify({
             "success": True, 
@@ -389,26 +405,13 @@ def record_all_attendance():
 @bp.route('/remove_unknown_face/<face_id>', methods=['POST'])
 def remove_unknown_face(face_id):
     """Remove an unknown face from the persistent faces list."""
-    global active_camera
-    if active_camera is None:
+    camera = get_camera()
+    if camera is None:
         return jsonify({"error": "No active camera"}), 400
     
     try:
-        # Get the face processor
-        face_processor = active_camera.face_processor
-        
-        # Check if the face exists before removing
-        before_count = len(face_processor.persistent_faces["unknown"])
-        
         # Filter out the face with the given ID
-        face_processor.persistent_faces["unknown"] = [
-            face for face in face_processor.persistent_faces["unknown"] 
-            if face["id"] != face_id
-        ]
-        
-        after_count = len(face_processor.persistent_faces["unknown"])
-        
-        if before_count == after_count:
+        if not camera.remove_unknown_face(face_id):
             return jsonify({"success": False, "message": "Face not found"}), 404
         
         return jsonify({
@@ -419,15 +422,64 @@ def remove_unknown_face(face_id):
         print(f"Error removing unknown face: {e}")
         return jsonify({"error": f"Failed to remove face: {str(e)}"}), 500
 
-def generate_frames(camera, show_faces=False):
-    """Generate frames from the camera for streaming."""
+def generate_overlays(camera, interval=0.05, keepalive=15.0):
+    """Generate server-sent events with the camera's latest overlay."""
+    last_timestamp = None
+    last_sent = time.time()
+    try:
+        while True:
+            overlay = camera.get_overlay()
+            timestamp = overlay["timestamp"] if overlay else None
+            if timestamp != last_timestamp:
+                last_timestamp = timestamp
+                last_sent = time.time()
+                yield f"data: {json.dumps(overlay)}\n\n"
+            elif time.time() - last_sent > keepalive:
+                # Comment line keeps proxies from closing an idle connection
+                last_sent = time.time()
+                yield ": keepalive\n\n"
+            time.sleep(interval)
+    except Exception as e:
+        print(f"Error in generate_overlays: {e}")
+
+def generate_frames(camera, show_faces=False, profile=None, passthrough=False, camera_manager=None):
+    """Generate frames from the camera for streaming.
+    
+    Each frame is sent once, at no more than the profile's frame rate. With
+    a camera_manager, the stream ends once the camera has been stopped.
+    """
+    frame_interval = 1.0 / profile.fps if profile is not None and profile.fps else 0.0
+    next_frame_time = 0.0
+    last_sequence = None
+    last_check = time.time()
     try:
         while True:
-            frame = camera.get_frame(show_faces=show_faces)
+            delay = next_frame_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            
+            # Stop once the camera has been stopped through the web UI
+            if camera_manager is not None and time.time() - last_check > 1.0:
+                last_check = time.time()
+                if camera_manager.get(camera.camera_id) is None:
+                    return
+            
+            frame, sequence = camera.get_frame_with_sequence(show_faces, profile, passthrough)
             if frame is None:
+                # Camera still warming up (or stopped); don't spin on it
+                time.sleep(0.01)
                 continue
+            if sequence is not None and sequence == last_sequence:
+                # No new frame since the last one we sent
+                time.sleep(0.005)
+                continue
+            last_sequence = sequence
+            next_frame_time = time.time() + frame_interval
+            
+            # The sequence number lets clients match frames to /camera/overlays events
+            sequence_header = f'X-Frame-Sequence: {sequence}\r\n'.encode() if sequence is not None else b''
             yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                   b'Content-Type: image/jpeg\r\n' + sequence_header + b'\r\n' + frame + b'\r\n')
     except Exception as e:
         print(f"Error in generate_frames: {e}")
         # Don't stop the camera here, as it's now managed by the routes
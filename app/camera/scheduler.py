@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import cv2
+
+class RecognitionScheduler:
+    """Shares a fixed number of recognition slots fairly between cameras.
+
+    Each camera accumulates "virtual time" as it uses recognition: the time
+    spent processing divided by its effective weight (configured weight
+    times an activity factor). When a slot is free it goes to the waiting
+    camera with the least virtual time, so a busy entrance camera gets more
+    frames processed than an empty side room while neither is starved.
+
+    Cameras never block waiting for a slot: try_acquire returns False and
+    the capture loop simply keeps streaming and asks again on its next frame.
+    """
+
+    # Activity multipliers applied to a camera's configured weight
+    IDLE_FACTOR = 0.25    # No motion and no faces in view
+    MOTION_FACTOR = 1.0   # Something moved since the last frame
+    FACES_FACTOR = 2.0    # Faces were in view on the last processed frame
+
+    # A camera that hasn't asked for a slot this recently is no longer waiting
+    PENDING_TIMEOUT = 0.5
+
+    # Waiting longer than this for a slot is reported as starvation
+    STARVATION_MS = 5000
+
+    def __init__(self, slots=None, threads=None):
+        """Create a scheduler.
+
+        Args:
+            slots: Maximum number of frames processed at the same time
+                   (default: half the CPU cores, at least 1)
+            threads: Total OpenCV thread budget shared by all slots
+                     (default: number of CPU cores)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.slots = slots or max(1, cpu_count // 2)
+        self.threads = threads or cpu_count
+
+        # Keep OpenCV's own thread pool within the global budget
+        cv2.setNumThreads(max(1, self.threads // self.slots))
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.held = {}  # {camera_id: slots granted and not yet released}
+        self.cameras = {}  # {camera_id: state dict}
+
+    def register(self, camera_id, weight=1.0):
+        """Add a camera to the schedule.
+
+        New cameras start at the lowest virtual time among existing cameras,
+        so they neither jump the queue nor wait for others to catch up.
+        """
+        with self.lock:
+            start_vtime = min((c["vtime"] for c in self.cameras.values()), default=0.0)
+            self.cameras[camera_id] = {
+                "weight": max(float(weight), 0.01),
+                "activity": self.MOTION_FACTOR,
+                "vtime": start_vtime,
+                "waiting_since": None,
+                "last_request": 0.0,
+                "granted": 0,
+                "denied": 0,
+                "processing_ms": 0.0,
+                "wait_ms": 0.0,
+                "max_wait_ms": 0.0,
+            }
+
+    def unregister(self, camera_id):
+        """Remove a camera from the schedule.
+
+        Slots it still holds stay taken until it releases them.
+        """
+        with self.lock:
+            self.cameras.pop(camera_id, None)
+
+    def set_weight(self, camera_id, weight):
+        """Change a camera's configured weight."""
+        with self.lock:
+            if camera_id in self.cameras:
+                self.cameras[camera_id]["weight"] = max(float(weight), 0.01)
+
+    def update_activity(self, camera_id, motion=False, faces_present=False):
+        """Report what a camera currently sees.
+
+        Args:
+            camera_id: Camera ID
+            motion: True if the scene changed since the previous frame
+            faces_present: True if faces were in view on the last processed frame
+        """
+        if faces_present:
+            activity = self.FACES_FACTOR
+        elif motion:
+            activity = self.MOTION_FACTOR
+        else:
+            activity = self.IDLE_FACTOR
+
+        with self.lock:
+            if camera_id in self.cameras:
+                self.cameras[camera_id]["activity"] = activity
+
+    def try_acquire(self, camera_id):
+        """Ask for a recognition slot without blocking.
+
+        Returns:
+            bool: True if the camera may process a frame now; it must then
+            call release() when done
+        """
+        now = time.time()
+        with self.lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return True  # Unscheduled cameras are not throttled
+
+            state["last_request"] = now
+            if state["waiting_since"] is None:
+                state["waiting_since"] = now
+
+            if self.active >= self.slots or not self._is_next(camera_id, now):
+                state["denied"] += 1
+                return False
+
+            wait_ms = (now - state["waiting_since"]) * 1000
+            state["wait_ms"] = wait_ms
+            state["max_wait_ms"] = max(state["max_wait_ms"], wait_ms)
+            state["waiting_since"] = None
+            state["granted"] += 1
+            self.active += 1
+            self.held[camera_id] = self.held.get(camera_id, 0) + 1
+            return True
+
+    def release(self, camera_id, elapsed):
+        """Return a slot and charge the camera for the time it used.
+
+        Releasing without holding a slot (e.g. a frame processed while the
+        camera was unscheduled) only charges the time.
+
+        Args:
+            camera_id: Camera ID
+            elapsed: Seconds spent processing the frame
+        """
+        with self.lock:
+            held = self.held.get(camera_id, 0)
+            if held:
+                self.active -= 1
+                if held == 1:
+                    del self.held[camera_id]
+                else:
+                    self.held[camera_id] = held - 1
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return
+
+            state["vtime"] += elapsed / (state["weight"] * state["activity"])
+
+            elapsed_ms = elapsed * 1000
+            if state["processing_ms"] == 0:
+                state["processing_ms"] = elapsed_ms
+            else:
+                state["processing_ms"] = 0.9 * state["processing_ms"] + 0.1 * elapsed_ms
+
+    def _is_next(self, camera_id, now):
+        """Check whether camera_id has the lowest virtual time among waiting cameras."""
+        vtime = self.cameras[camera_id]["vtime"]
+        for other_id, other in self.cameras.items():
+            if other_id == camera_id or other["waiting_since"] is None:
+                continue
+            if now - other["last_request"] > self.PENDING_TIMEOUT:
+                continue
+            if other["vtime"] < vtime:
+                return False
+        return True
+
+    def get_camera_stats(self, camera_id):
+        """Return scheduling statistics for one camera, or None."""
+        now = time.time()
+        with self.lock:
+            state = self.cameras.get(camera_id)
+            if state is None:
+                return None
+            waiting_ms = (now - state["waiting_since"]) * 1000 if state["waiting_since"] else 0.0
+            requests = state["granted"] + state["denied"]
+            return {
+                "weight": state["weight"],
+                "activity": state["activity"],
+                "granted": state["granted"],
+                "denied": state["denied"],
+                "grant_ratio": state["granted"] / requests if requests else 0.0,
+                "avg_processing_ms": state["processing_ms"],
+                "last_wait_ms": state["wait_ms"],
+                "max_wait_ms": state["max_wait_ms"],
+                "current_wait_ms": waiting_ms,
+                "starved": waiting_ms > self.STARVATION_MS,
+            }
+
+    def get_stats(self):
+        """Return the global budget and per-camera statistics."""
+        with self.lock:
+            camera_ids = list(self.cameras.keys())
+            active = self.active
+        return {
+            "slots": self.slots,
+            "threads": self.threads,
+            "active": active,
+            "cameras": {camera_id: self.get_camera_stats(camera_id) for camera_id in camera_ids},
+        }
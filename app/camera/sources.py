@@ -0,0 +1,318 @@
+import glob
+import os
+import time
+from urllib.parse import parse_qsl
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class FrameSource:
+    """Base class for frame sources that stand in for a camera.
+
+    Implements the parts of the cv2.VideoCapture interface that Camera uses
+    (isOpened, read, get, set, release), so recordings and generated frames
+    run through the same capture, recognition and streaming code.
+
+    Pacing is either "realtime" (frames are delivered at the source's frame
+    rate, like a camera) or "fast" (as fast as they can be produced, for
+    benchmarks). With loop=True the source restarts at its first frame when
+    it runs out, producing the same frames in the same order every time.
+    """
+
+    def __init__(self, fps=15.0, pacing='realtime', loop=True):
+        if pacing not in ('realtime', 'fast'):
+            raise ValueError(f"Unknown pacing: {pacing}")
+        self.fps = fps
+        self.pacing = pacing
+        self.loop = loop
+        self.opened = True
+        self.finished = False  # True once a non-looping source ran out of frames
+        self.frame_index = 0
+        self.width = 0
+        self.height = 0
+        self.frame_count = 0
+        self.next_frame_time = None
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self, image=None):
+        """Return the next frame like VideoCapture.read().
+
+        Args:
+            image: Optional buffer to fill, reused when its shape matches
+
+        Returns:
+            (success, frame)
+        """
+        if not self.opened or self.finished:
+            return False, None
+
+        self._wait_for_next_frame()
+        frame = self._next_frame(image)
+        if frame is None and self.loop and self.frame_index > 0:
+            self._rewind()
+            self.frame_index = 0
+            frame = self._next_frame(image)
+
+        if frame is None:
+            self.finished = True
+            return False, None
+
+        self.frame_index += 1
+        return True, frame
+
+    def _wait_for_next_frame(self):
+        if self.pacing != 'realtime' or not self.fps:
+            return
+
+        now = time.monotonic()
+        if self.next_frame_time is None or now - self.next_frame_time > 1.0:
+            # First frame, or we fell far behind: don't try to catch up in a burst
+            self.next_frame_time = now
+        elif self.next_frame_time > now:
+            time.sleep(self.next_frame_time - now)
+        self.next_frame_time += 1.0 / self.fps
+
+    def _next_frame(self, image):
+        """Return the frame at self.frame_index, or None when out of frames."""
+        raise NotImplementedError
+
+    def _rewind(self):
+        """Go back to the first frame."""
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps or 0)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.opened = False
+
+    def describe(self):
+        """Return a short description for camera properties and logs."""
+        return {"type": type(self).__name__, "pacing": self.pacing, "loop": self.loop, "fps": self.fps}
+
+class VideoFileSource(FrameSource):
+    """Frames from a recorded video file."""
+
+    def __init__(self, path, pacing='realtime', loop=True, fps=None):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open video file {path}")
+
+        # Play at the recorded frame rate unless told otherwise
+        file_fps = self.capture.get(cv2.CAP_PROP_FPS)
+        super().__init__(fps=fps or file_fps or 15.0, pacing=pacing, loop=loop)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _next_frame(self, image):
+        if image is not None:
+            success, frame = self.capture.read(image=image)
+        else:
+            success, frame = self.capture.read()
+        return frame if success else None
+
+    def _rewind(self):
+        # Reopening is more reliable than seeking for many codecs
+        self.capture.release()
+        self.capture = cv2.VideoCapture(self.path)
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+    def describe(self):
+        info = super().describe()
+        info["path"] = self.path
+        return info
+
+class ImageSequenceSource(FrameSource):
+    """Frames from a directory of images, in file name order."""
+
+    def __init__(self, directory, pacing='realtime', loop=True, fps=10.0):
+        super().__init__(fps=fps, pacing=pacing, loop=loop)
+        self.directory = directory
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(directory, '*'))
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            raise RuntimeError(f"No images found in {directory}")
+
+        self.frame_count = len(self.paths)
+        first = cv2.imread(self.paths[0])
+        if first is not None:
+            self.height, self.width = first.shape[:2]
+
+    def _next_frame(self, image):
+        while self.frame_index < len(self.paths):
+            frame = cv2.imread(self.paths[self.frame_index])
+            if frame is not None:
+                return frame
+            # Skip unreadable files, keeping the frame numbering stable
+            print(f"Skipping unreadable image {self.paths[self.frame_index]}")
+            self.frame_index += 1
+        return None
+
+    def describe(self):
+        info = super().describe()
+        info["directory"] = self.directory
+        return info
+
+class SyntheticSource(FrameSource):
+    """Generated frames: moving shapes, a frame counter and optional faces.
+
+    Frames depend only on the seed and frame index, so a run can be
+    reproduced exactly. Face images (e.g. member photos) are pasted in and
+    drift across the frame, exercising detection and recognition too.
+    """
+
+    def __init__(self, width=640, height=480, fps=15.0, pacing='realtime', loop=True,
+                 frames=300, seed=0, faces=None):
+        """Create a synthetic source.
+
+        Args:
+            width, height: Frame size
+            fps: Frame rate for realtime pacing
+            pacing: "realtime" or "fast"
+            loop: Restart after `frames` frames instead of ending
+            frames: Length of one loop
+            seed: Seed for shape colours, positions and speeds
+            faces: Optional directory of face images to paste into the frames
+        """
+        super().__init__(fps=fps, pacing=pacing, loop=loop)
+        self.width = width
+        self.height = height
+        self.frame_count = frames
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        self.shapes = [
+            {
+                "color": tuple(int(c) for c in rng.integers(0, 255, 3)),
+                "size": int(rng.integers(20, max(21, min(width, height) // 6))),
+                "start": rng.uniform(0, 1, 2),
+                "velocity": rng.uniform(-0.01, 0.01, 2),
+            }
+            for _ in range(5)
+        ]
+
+        self.faces = []
+        if faces:
+            for path in sorted(glob.glob(os.path.join(faces, '*'))):
+                face = cv2.imread(path) if path.lower().endswith(IMAGE_EXTENSIONS) else None
+                if face is None:
+                    continue
+                # Faces take up about a third of the frame height, like someone near the camera
+                scale = (height / 3) / face.shape[0]
+                face = cv2.resize(face, (max(1, int(face.shape[1] * scale)), max(1, int(face.shape[0] * scale))))
+                if face.shape[0] < height and face.shape[1] < width:
+                    self.faces.append({
+                        "image": face,
+                        "start": rng.uniform(0, 1, 2),
+                        "velocity": rng.uniform(-0.004, 0.004, 2),
+                    })
+
+        # Background is drawn once and copied into each frame
+        gradient = np.linspace(40, 200, width, dtype=np.uint8)
+        self.background = np.repeat(np.repeat(gradient[None, :, None], height, axis=0), 3, axis=2)
+
+    def _next_frame(self, image):
+        if self.frame_index >= self.frame_count:
+            return None
+
+        if image is None or image.shape != self.background.shape:
+            image = np.empty_like(self.background)
+        np.copyto(image, self.background)
+
+        t = self.frame_index
+        for shape in self.shapes:
+            x, y = self._bounce(shape["start"] + shape["velocity"] * t)
+            size = shape["size"]
+            center = (int(x * (self.width - size)) + size // 2, int(y * (self.height - size)) + size // 2)
+            cv2.circle(image, center, size // 2, shape["color"], cv2.FILLED)
+
+        for face in self.faces:
+            face_image = face["image"]
+            face_height, face_width = face_image.shape[:2]
+            x, y = self._bounce(face["start"] + face["velocity"] * t)
+            left = int(x * (self.width - face_width))
+            top = int(y * (self.height - face_height))
+            image[top:top + face_height, left:left + face_width] = face_image
+
+        cv2.putText(image, f"frame {t}", (10, self.height - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return image
+
+    @staticmethod
+    def _bounce(position):
+        """Fold a position into [0, 1] so objects bounce off the frame edges."""
+        position = np.mod(position, 2.0)
+        return np.where(position > 1.0, 2.0 - position, position)
+
+    def describe(self):
+        info = super().describe()
+        info.update({"width": self.width, "height": self.height, "frames": self.frame_count,
+                     "seed": self.seed, "faces": len(self.faces)})
+        return info
+
+def open_source(spec):
+    """Open a camera device or frame source.
+
+    Args:
+        spec: A device index (int or digit string), or a source string:
+              "video:<path>", "images:<directory>" or "synthetic:", each
+              optionally followed by "?pacing=fast&loop=0&fps=10" style options
+              (synthetic also takes width, height, frames, seed and faces)
+
+    Returns:
+        cv2.VideoCapture or FrameSource
+
+    Raises:
+        ValueError: If the spec isn't understood
+        RuntimeError: If the file or directory can't be read
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return cv2.VideoCapture(int(spec))
+
+    kind, _, rest = spec.partition(':')
+    target, _, query = rest.partition('?')
+    options = dict(parse_qsl(query))
+
+    pacing = options.get('pacing', 'realtime')
+    loop = options.get('loop', '1').lower() not in ('0', 'false', 'no')
+    fps = float(options['fps']) if options.get('fps') else None
+
+    if kind == 'video':
+        return VideoFileSource(target, pacing=pacing, loop=loop, fps=fps)
+    if kind == 'images':
+        return ImageSequenceSource(target, pacing=pacing, loop=loop, fps=fps or 10.0)
+    if kind == 'synthetic':
+        return SyntheticSource(
+            width=int(options.get('width', 640)),
+            height=int(options.get('height', 480)),
+            fps=fps or 15.0,
+            pacing=pacing,
+            loop=loop,
+            frames=int(options.get('frames', 300)),
+            seed=int(options.get('seed', 0)),
+            faces=options.get('faces')
+        )
+
+    raise ValueError(f"Unknown camera source: {spec}")
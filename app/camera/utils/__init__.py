@@ -5,7 +5,10 @@ from app.camera.utils.camera_utils import (
     list_available_cameras,
     create_blank_frame,
     try_camera_resolutions,
-    set_camera_mjpeg
+    set_camera_mjpeg,
+    enable_raw_mjpeg,
+    measure_motion
 )
 
 from app.camera.utils.face_processor import FaceProcessor
+from app.camera.utils.stream_encoder import StreamProfile, StreamEncoder
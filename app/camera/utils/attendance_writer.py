@@ -0,0 +1,37 @@
+import threading
+from flask import current_app
+from app.database.attendance import record_attendance
+
+class AttendanceWriter:
+    """Records attendance on behalf of every camera.
+    
+    record_attendance checks for an existing row before inserting, so two
+    cameras seeing the same member at once could both insert. Writes are
+    serialized through one lock to keep that check meaningful.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+    
+    def record(self, member_ids, meeting_id=None):
+        """Record attendance for a group of members.
+        
+        Args:
+            member_ids: Iterable of member IDs
+            meeting_id: Optional meeting ID (default: current active meeting)
+            
+        Returns:
+            Number of members for whom attendance was recorded
+        """
+        recorded_count = 0
+        
+        with self.lock, current_app.app_context():
+            for member_id in member_ids:
+                try:
+                    if record_attendance(member_id, meeting_id):
+                        recorded_count += 1
+                        print(f"Recorded attendance for member ID: {member_id}")
+                except Exception as e:
+                    print(f"Error recording attendance: {e}")
+        
+        return recorded_count
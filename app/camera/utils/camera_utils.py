@@ -149,3 +149,51 @@ def set_camera_mjpeg(camera):
         print("Set camera format to MJPG")
     except Exception as e:
         print(f"Failed to set camera format: {e}")
+
+
+def enable_raw_mjpeg(camera):
+    """Try to make the camera return its MJPEG bytes instead of decoded frames.
+    
+    Works with backends that honour CAP_PROP_FORMAT = -1 (e.g. V4L2). Falls
+    back to decoded frames if the probe read doesn't return a JPEG.
+    
+    Args:
+        camera: OpenCV VideoCapture object already set to MJPG
+        
+    Returns:
+        bool: True if read() now returns JPEG bytes
+    """
+    try:
+        if not camera.set(cv2.CAP_PROP_FORMAT, -1):
+            return False
+        
+        success, raw = camera.read()
+        if success and raw is not None and raw.ndim <= 2 and raw.size > 2 \
+                and raw.flat[0] == 0xFF and raw.flat[1] == 0xD8:
+            print("Camera delivers raw MJPEG; passthrough streaming enabled")
+            return True
+        
+        camera.set(cv2.CAP_PROP_FORMAT, cv2.CV_8UC3)
+    except Exception as e:
+        print(f"Failed to enable raw MJPEG: {e}")
+    return False
+
+
+def measure_motion(frame, previous=None, size=(64, 36)):
+    """Estimate how much a scene changed using a tiny grayscale thumbnail.
+    
+    Args:
+        frame: OpenCV BGR frame
+        previous: Thumbnail returned by the previous call, if any
+        size: Thumbnail size; small enough that the check costs almost nothing
+        
+    Returns:
+        (score, thumbnail) where score is the mean absolute pixel change (0-255)
+    """
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    
+    if previous is None or previous.shape != small.shape:
+        return 0.0, small
+    
+    return float(cv2.absdiff(small, previous).mean()), small
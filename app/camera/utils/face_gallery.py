@@ -0,0 +1,225 @@
+import os
+import threading
+import cv2
+import numpy as np
+from flask import current_app
+from app.database.gallery import load_gallery, write_gallery_snapshot, get_gallery_version
+from app.database.members import get_member, get_image_variant
+from app.camera.utils.quantized_gallery import build_index, rerank
+
+class FaceGallery:
+    """Known face encodings shared by every FaceProcessor in the process.
+    
+    Reloads swap the encodings, names and IDs in one step under a lock, so
+    cameras matching on other threads always see a consistent gallery.
+    
+    With GALLERY_QUANTIZATION set, a compact index (see quantized_gallery)
+    picks match candidates and only those rows of the memory-mapped
+    snapshot are compared exactly.
+    
+    A roster of expected attendees (see set_roster) forms a small first
+    stage that is searched before the full gallery.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.encodings = np.empty((0, 128), dtype=np.float32)  # One row per known face
+        self.index = None  # Quantized copy of encodings, or None to compare every row
+        self.rerank_candidates = 16
+        self.roster_ids = None  # Member IDs expected at the active meeting, or None
+        self.roster = None  # (encodings, names, member_ids) of the roster members in the gallery
+        self.roster_tolerance = 0.5
+        self.names = []
+        self.member_ids = []
+        self.names_by_id = {}
+        self.member_images = {}  # Member images loaded on first use: {member_id: image or None}
+        self.version = 0  # Incremented on every reload
+        self.loaded_version = None  # Database gallery version of the last reload
+    
+    def reload(self):
+        """Load known faces from the snapshot or database.
+        
+        Returns:
+            bool: True if the gallery was loaded
+        """
+        try:
+            # Read before the data, so a change in between makes the version look stale, not current
+            loaded_version = get_gallery_version()
+            encodings, names, member_ids = load_gallery()
+        except Exception as e:
+            print(f"Error loading faces from database: {e}")
+            return False
+        
+        self.rerank_candidates = current_app.config.get('GALLERY_RERANK', 16)
+        index = None
+        try:
+            index = build_index(encodings, current_app.config.get('GALLERY_QUANTIZATION'))
+        except ValueError as e:
+            print(f"Error building gallery index: {e}")
+        
+        with self.lock:
+            self.encodings = encodings
+            self.loaded_version = loaded_version
+            self.index = index
+            self.names = names
+            self.member_ids = member_ids
+            self.names_by_id = dict(zip(member_ids, names))
+            self.roster = self._build_roster()
+            # Clear cached images so changed photos are picked up
+            self.member_images = {}
+            self.version += 1
+        return True
+    
+    def upsert(self, member_id, name, encoding):
+        """Add or replace one member's face without reloading the whole gallery.
+        
+        The arrays are copied rather than changed in place, so a camera
+        still matching against the previous snapshot is unaffected. The
+        on-disk snapshot is rewritten for recognition worker processes,
+        stamped with the version of the last reload: this gallery may miss
+        other changes since then, so load_gallery treats it as stale and
+        rebuilds from the database rather than trusting it.
+        
+        Args:
+            member_id: Member ID
+            name: Member name
+            encoding: 128-d face encoding
+        """
+        row = np.asarray(encoding, dtype=np.float32).reshape(1, 128)
+        with self.lock:
+            member_ids = list(self.member_ids)
+            names = list(self.names)
+            if member_id in member_ids:
+                index = member_ids.index(member_id)
+                encodings = np.array(self.encodings, dtype=np.float32)
+                encodings[index] = row
+                names[index] = name
+            else:
+                index = len(member_ids)
+                encodings = np.concatenate([np.asarray(self.encodings, dtype=np.float32), row])
+                member_ids.append(member_id)
+                names.append(name)
+            
+            # Encoded with the existing quantizer; the next reload retrains it
+            if self.index is not None:
+                self.index = self.index.updated(index, row)
+            self.encodings = encodings
+            self.names = names
+            self.member_ids = member_ids
+            self.names_by_id = dict(zip(member_ids, names))
+            if self.roster_ids is not None and member_id in self.roster_ids:
+                self.roster = self._build_roster()
+            self.member_images.pop(member_id, None)
+            self.version += 1
+        
+        if self.loaded_version is None:
+            return
+        try:
+            write_gallery_snapshot(encodings, names, member_ids, version=self.loaded_version)
+        except OSError as e:
+            print(f"Error writing gallery snapshot: {e}")
+    
+    def set_roster(self, member_ids, tolerance=0.5):
+        """Set the members searched first, before the full gallery.
+        
+        Args:
+            member_ids: Expected attendees (empty or None to search only the full gallery)
+            tolerance: Largest roster distance accepted without checking the full gallery
+        """
+        with self.lock:
+            self.roster_ids = set(member_ids) if member_ids else None
+            self.roster_tolerance = tolerance
+            self.roster = self._build_roster()
+    
+    def _build_roster(self):
+        """Copy the roster members' rows out of the gallery (called with the lock held)."""
+        if not self.roster_ids:
+            return None
+        rows = [row for row, member_id in enumerate(self.member_ids) if member_id in self.roster_ids]
+        if not rows:
+            return None
+        return (
+            np.asarray(self.encodings[rows], dtype=np.float32),
+            [self.names[row] for row in rows],
+            [self.member_ids[row] for row in rows]
+        )
+    
+    def snapshot(self):
+        """Return (encodings, names, member_ids) from the same reload."""
+        with self.lock:
+            return self.encodings, self.names, self.member_ids
+    
+    def match(self, face_encodings, tolerance=0.6):
+        """Find the closest known member for each face encoding.
+        
+        Args:
+            face_encodings: Face encodings to look up
+            tolerance: Largest distance that still counts as a match
+                (0.6 is face_recognition.compare_faces' default)
+            
+        Returns:
+            List of (name, member_id, distance), with ("Unknown", None, distance)
+            where nobody is close enough
+        """
+        with self.lock:
+            encodings, names, member_ids, index = self.encodings, self.names, self.member_ids, self.index
+        return self._match_rows(encodings, names, member_ids, index, face_encodings, tolerance)
+    
+    def match_roster(self, face_encodings):
+        """Like match, but only against the roster and with the roster tolerance.
+        
+        Returns:
+            List of (name, member_id, distance), or None if there is no roster
+        """
+        with self.lock:
+            roster, tolerance = self.roster, self.roster_tolerance
+        if roster is None:
+            return None
+        encodings, names, member_ids = roster
+        return self._match_rows(encodings, names, member_ids, None, face_encodings, tolerance)
+    
+    def _match_rows(self, encodings, names, member_ids, index, face_encodings, tolerance):
+        if len(face_encodings) == 0:
+            return []
+        if len(encodings) == 0:
+            return [("Unknown", None, None)] * len(face_encodings)
+        
+        rows, distances = rerank(index, encodings, face_encodings, self.rerank_candidates)
+        results = []
+        for row, distance in zip(rows, distances):
+            if distance <= tolerance:
+                results.append((names[row], member_ids[row], float(distance)))
+            else:
+                results.append(("Unknown", None, float(distance)))
+        return results
+    
+    def name_for(self, member_id):
+        """Return the name of a member in the gallery, or None."""
+        return self.names_by_id.get(member_id)
+    
+    def get_member_image(self, member_id):
+        """Return a member's profile image, reading it from disk on first use.
+        
+        Args:
+            member_id: Member ID
+            
+        Returns:
+            OpenCV image or None if the member has no usable image
+        """
+        if member_id in self.member_images:
+            return self.member_images[member_id]
+        
+        image = None
+        try:
+            member = get_member(member_id)
+            if member and member['image_path']:
+                # The card-sized copy is plenty for thumbnails and far cheaper to decode
+                filename = get_image_variant(member['image_path'], 'card') or member['image_path']
+                image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                if os.path.exists(image_path):
+                    image = cv2.imread(image_path)
+        except Exception as img_error:
+            print(f"Error loading image for member {member_id}: {img_error}")
+        
+        self.member_images[member_id] = image
+        return image
@@ -2,27 +2,87 @@ import cv2
 import time
 import face_recognition
 import numpy as np
-from app.database.members import get_all_face_encodings
-from app.database.members import get_member
-from app.database.attendance import record_attendance
-from flask import current_app
-import os
+from app.camera.utils.face_gallery import FaceGallery
+from app.camera.utils.attendance_writer import AttendanceWriter
+from app.camera.utils.frame_buffer import FrameRing, copy_into
+from app.camera.utils.face_tracker import FaceTracker
+from app.camera.utils.face_quality import QUALITY_THRESHOLD, face_quality, weakest_part
+
+# Frames are downscaled by this factor before detection
+# Using 0.5 scale instead of 0.25 to capture more detail for distance recognition
+DETECTION_SCALE = 0.5
+
+# Stop drawing annotated frames once no client has asked for one for this long
+ANNOTATION_IDLE_SECONDS = 2.0
+
+# Label of faces whose identity hasn't been confirmed yet
+PENDING_NAME = "Identifying"
+
+def detect_faces(frame, buffers=None, min_quality=QUALITY_THRESHOLD):
+    """Find and encode faces in a frame.
+    
+    This is the expensive half of recognition. It only depends on the frame,
+    so it can run in a recognition worker process as well as in FaceProcessor.
+    Faces are scored with face_quality first and only those reaching
+    min_quality are encoded; tiny, blurred, badly lit or turned faces would
+    only produce bad matches.
+    
+    Args:
+        frame: OpenCV BGR frame (may be read-only)
+        buffers: Optional dict reused between calls for the downscaled images
+        min_quality: Quality score a face needs to be encoded
+        
+    Returns:
+        (face_locations, face_encodings, qualities) with locations in downscaled
+        coordinates, encodings None for faces that weren't encoded and
+        qualities a (score, part scores) tuple per face
+    """
+    if buffers is None:
+        buffers = {}
+    
+    # Resize frame for face recognition - increased scale for better distance detection
+    height, width = frame.shape[:2]
+    small_size = (int(width * DETECTION_SCALE), int(height * DETECTION_SCALE))
+    small = buffers.get("small")
+    if small is None or small.shape[:2] != (small_size[1], small_size[0]):
+        small = None
+        buffers["rgb"] = None
+    small = buffers["small"] = cv2.resize(frame, small_size, dst=small)
+    
+    # Convert from BGR (OpenCV) to RGB (face_recognition)
+    rgb_small_frame = buffers["rgb"] = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=buffers.get("rgb"))
+    
+    # Find faces in the current frame - using CNN model for better distance recognition
+    # CNN is more accurate but slower, but worth it for improved detection
+    model = "cnn" if cv2.cuda.getCudaEnabledDeviceCount() > 0 else "hog"
+    face_locations = face_recognition.face_locations(rgb_small_frame, model=model)
+    
+    # Only encode faces worth matching; encoding is the costly step
+    qualities = [face_quality(rgb_small_frame, location, min_quality) for location in face_locations]
+    encode = [location for location, (score, _) in zip(face_locations, qualities) if score >= min_quality]
+    encoded = iter(face_recognition.face_encodings(rgb_small_frame, encode) if encode else [])
+    face_encodings = [next(encoded) if score >= min_quality else None for score, _ in qualities]
+    return face_locations, face_encodings, qualities
 
 class FaceProcessor:
     """Handles face detection, recognition, and tracking functionalities."""
     
-    def __init__(self):
+    def __init__(self, gallery=None, attendance_writer=None):
+        """Create a face processor.
+        
+        Args:
+            gallery: Shared FaceGallery (a private one is created and loaded if omitted)
+            attendance_writer: Shared AttendanceWriter (a private one is created if omitted)
+        """
         # Face recognition settings
         self.face_locations = []
         self.face_encodings = []
         self.face_names = []
         self.face_thumbnails = []
         
-        # Known face encodings and names
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_ids = []
-        self.known_face_images = {}  # Store member images from database: {member_id: image}
+        # Known face encodings and names, possibly shared with other cameras
+        self.gallery = gallery if gallery is not None else FaceGallery()
+        self.attendance_writer = attendance_writer if attendance_writer is not None else AttendanceWriter()
         
         # Face similarity threshold (lower = more strict matching, higher = more permissive)
         # Increasing to 0.7 to improve distance recognition
@@ -35,52 +95,68 @@ class FaceProcessor:
         }
         self.unknown_face_counter = 0
         
+        # Faces followed across frames; only confirmed identities reach persistent_faces
+        self.tracker = FaceTracker()
+        
         # Latest recognition result
         self.last_recognition_result = None
         
-        # Load faces from database
-        self.load_known_faces_from_db()
+        # Reused buffers: annotated frames for streaming and the downscaled detection input
+        self.annotation_ring = FrameRing(size=3)
+        self.detection_buffers = {}
+        
+        # Face boxes and labels of the last processed frame, for clients that draw their own overlays.
+        # Annotated frames are only drawn while a client has asked for them recently.
+        self.overlay = None
+        self.annotations_requested_at = 0.0
+        
+        # Per-camera recognition statistics
+        self.stats = {
+            "frames_processed": 0,
+            "faces_detected": 0,
+            "faces_recognized": 0,
+            # Two-stage matching: faces matched within the meeting roster, and
+            # faces that fell back to the full gallery (and were matched there)
+            "roster_hits": 0,
+            "roster_misses": 0,
+            "roster_fallback_matches": 0,
+            # Per-track voting: gallery matches run, and matches skipped for confirmed tracks
+            "matches_run": 0,
+            "matches_skipped": 0,
+            "tracks_confirmed": 0,
+            # Quality gate: faces encoded, faces not worth encoding, and
+            # {weakest quality part: count} of the rejected ones
+            "faces_encoded": 0,
+            "faces_skipped_quality": 0,
+            "quality_rejections": {},
+        }
+        
+        # Load faces from database unless a shared gallery was handed in
+        if gallery is None:
+            self.load_known_faces_from_db()
+    
+    @property
+    def known_face_matrix(self):
+        """Matrix of known face encodings, one row per face."""
+        return self.gallery.encodings
+    
+    @property
+    def known_face_encodings(self):
+        return self.gallery.encodings
+    
+    @property
+    def known_face_names(self):
+        return self.gallery.names
+    
+    @property
+    def known_face_ids(self):
+        return self.gallery.member_ids
     
     def load_known_faces_from_db(self):
-        """Load known face encodings, names and member images from the database."""
-        try:
-            # Get face encodings and member data
-            encodings, names, member_ids = get_all_face_encodings()
-            self.known_face_encodings = encodings
-            self.known_face_names = names
-            self.known_face_ids = member_ids
-            
-            # We're keeping persistent_faces["known"] empty until faces are actually seen by the camera
-            # This ensures only faces seen during this session appear in the UI
-            
-            # Clear existing images dictionary
-            self.known_face_images = {}
-            
-            # Load images for all members for display purposes
-            for i, member_id in enumerate(member_ids):
-                if member_id is None:
-                    continue
-                
-                try:
-                    # Get member details including image path
-                    member = get_member(member_id)
-                    if member and member['image_path']:
-                        # Construct the full image path
-                        image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], member['image_path'])
-                        
-                        # Load the image if it exists
-                        if os.path.exists(image_path):
-                            image = cv2.imread(image_path)
-                            if image is not None:
-                                # Store the image for this member
-                                self.known_face_images[member_id] = image
-                except Exception as img_error:
-                    print(f"Error loading image for member {member_id}: {img_error}")
-                    
-            return True
-        except Exception as e:
-            print(f"Error loading faces from database: {e}")
-            return False
+        """Reload known face encodings and names into the shared gallery."""
+        # We're keeping persistent_faces["known"] empty until faces are actually seen by the camera
+        # This ensures only faces seen during this session appear in the UI
+        return self.gallery.reload()
     
     def reset_state(self):
         """Reset all recognition state."""
@@ -93,6 +169,7 @@ class FaceProcessor:
         
         # Reset counters and state
         self.unknown_face_counter = 0
+        self.tracker.reset()
         self.face_locations = []
         self.face_encodings = []
         self.face_names = []
@@ -103,6 +180,7 @@ class FaceProcessor:
         
         # Clear recognition result
         self.last_recognition_result = None
+        self.overlay = None
     
     def _match_unknown_face(self, face_encoding):
         """Match a face encoding against existing unknown faces.
@@ -162,18 +240,58 @@ class FaceProcessor:
             if face["in_view"] or (current_time - face["last_seen"] < max_age_seconds)
         ]
     
-    def process_frame(self, frame):
+    def process_frame(self, frame, sequence=None):
         """Process a frame for face recognition.
         
+        The frame may be a read-only view; it is never modified. Boxes are
+        drawn into a reused buffer from annotation_ring (only while clients
+        want annotated frames), and thumbnails are only copied out of the
+        frame when they are kept.
+        
         Args:
             frame: OpenCV image frame
+            sequence: Capture sequence number of the frame, reported with the overlay
             
         Returns:
-            processed_frame: Frame with face boxes drawn
+            processed_frame: Frame with face boxes drawn (valid until the ring reuses it),
+                             or the input frame when annotations aren't wanted
             recognized_ids: List of recognized member IDs
         """
+        try:
+            face_locations, face_encodings, qualities = detect_faces(frame, self.detection_buffers)
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            self._clear_frame_state()
+            return frame, []
+        
+        return self.apply_detections(frame, face_locations, face_encodings, sequence=sequence, qualities=qualities)
+    
+    def apply_detections(self, frame, face_locations, face_encodings, member_ids=None, sequence=None,
+                         distances=None, qualities=None):
+        """Match, track and draw faces found by detect_faces.
+        
+        Detection may have run in this process or in a recognition worker
+        process; either way the locations are in detection (half-size) coordinates.
+        
+        Args:
+            frame: The full-size frame the faces were detected in
+            face_locations: List of (top, right, bottom, left) tuples
+            face_encodings: List of 128-d face encodings (None for faces not encoded)
+            member_ids: Optional per-face member IDs already matched by a worker
+                        (None entries are unknown faces); matched here if omitted
+            sequence: Capture sequence number of the frame, reported with the overlay
+            distances: Optional per-face distances to the closest member, with member_ids
+            qualities: Optional per-face (score, part scores) from detect_faces
+            
+        Returns:
+            processed_frame: Frame with face boxes drawn (valid until the ring reuses it)
+            recognized_ids: List of recognized member IDs
+        """
+        annotation_slot = None
         try:
             # Reset current frame data
+            self.face_locations = face_locations
+            self.face_encodings = face_encodings
             self.face_names = []
             self.face_thumbnails = []
             recognized_ids = []
@@ -185,24 +303,11 @@ class FaceProcessor:
             for unknown_face in self.persistent_faces["unknown"]:
                 unknown_face["in_view"] = False
             
-            # Resize frame for face recognition - increased scale for better distance detection
-            # Using 0.5 scale instead of 0.25 to capture more detail for distance recognition
-            small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-            
-            # Convert from BGR (OpenCV) to RGB (face_recognition)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            # Find faces in the current frame - using CNN model for better distance recognition
-            # CNN is more accurate but slower, but worth it for improved detection
-            model = "cnn" if cv2.cuda.getCudaEnabledDeviceCount() > 0 else "hog"
-            self.face_locations = face_recognition.face_locations(rgb_small_frame, model=model)
-            self.face_encodings = face_recognition.face_encodings(rgb_small_frame, self.face_locations)
-            
             # Create thumbnails of each face
             current_thumbnails = []
             for (top, right, bottom, left) in self.face_locations:
-                # Scale back up face location since we resized by 1/2 now (changed from 1/4)
-                scale = 2.0
+                # Scale back up face location since the frame was downscaled for detection
+                scale = 1.0 / DETECTION_SCALE
                 top_scaled = int(top * scale)
                 right_scaled = int(right * scale)
                 bottom_scaled = int(bottom * scale)
@@ -215,7 +320,7 @@ class FaceProcessor:
                 bottom_scaled = min(frame.shape[0], bottom_scaled + padding)
                 right_scaled = min(frame.shape[1], right_scaled + padding)
                 
-                # Extract the face image
+                # Extract the face image (a view into the frame; copied only if it is kept)
                 face_image = frame[top_scaled:bottom_scaled, left_scaled:right_scaled]
                 
                 # Save the thumbnail
@@ -224,68 +329,113 @@ class FaceProcessor:
                 else:
                     current_thumbnails.append(None)  # Placeholder for invalid thumbnails
             
-            # Compare against known faces
-            if len(self.known_face_encodings) > 0:
-                for face_encoding in self.face_encodings:
-                    # Get valid encodings
-                    valid_encodings, valid_names, valid_ids = self._get_valid_encodings()
-                    
-                    # Default to Unknown
-                    name = "Unknown"
-                    member_id = None
-                    
-                    # Only proceed if we have valid encodings
-                    if valid_encodings:
-                        matches = face_recognition.compare_faces(valid_encodings, face_encoding)
-                        face_distances = face_recognition.face_distance(valid_encodings, face_encoding)
-                        
-                        if len(face_distances) > 0:
-                            best_match_index = np.argmin(face_distances)
-                            if matches[best_match_index]:
-                                name = valid_names[best_match_index]
-                                # Record member ID for attendance
-                                member_id = valid_ids[best_match_index]
-                                if member_id is not None:
-                                    recognized_ids.append(member_id)
-                    
-                    self.face_names.append(name)
-                    
-                    # Update persistent face tracking
-                    face_idx = len(self.face_names) - 1
-                    thumbnail = current_thumbnails[face_idx] if face_idx < len(current_thumbnails) else None
-                    
-                    if thumbnail is not None:
-                        self._update_persistent_faces(name, member_id, face_encoding, thumbnail)
-            else:
-                # If no known faces, mark all as unknown
-                self.face_names = ["Unknown"] * len(self.face_locations)
+            # Identities are voted on per track; a confirmed track skips gallery
+            # matching until its face changes, and pending faces aren't reported
+            current_time = time.time()
+            tracks = self.tracker.assign(self.face_locations, current_time)
+            gallery_version = self.gallery.version
+            overlay_tracks = []
+            for face_index, (track, face_encoding) in enumerate(zip(tracks, self.face_encodings)):
+                was_confirmed = track.confirmed
+                quality = qualities[face_index][0] if qualities is not None else 0.0
+                if face_encoding is None:
+                    # Rejected by the quality gate; the track keeps its identity but gets no vote
+                    self.stats["faces_skipped_quality"] += 1
+                    if qualities is not None:
+                        reason = weakest_part(qualities[face_index][1])
+                        self.stats["quality_rejections"][reason] = self.stats["quality_rejections"].get(reason, 0) + 1
+                elif member_ids is not None:
+                    # Identity was already matched by a worker process
+                    member_id = member_ids[face_index]
+                    if member_id is not None and self.gallery.name_for(member_id) is None:
+                        member_id = None
+                    distance = distances[face_index] if distances is not None else None
+                    self.tracker.vote(track, member_id, distance, face_encoding, gallery_version)
+                elif self.tracker.needs_match(track, face_encoding, gallery_version):
+                    self.stats["matches_run"] += 1
+                    _, member_id, distance = self._match_known_face(face_encoding)
+                    self.tracker.vote(track, member_id, distance, face_encoding, gallery_version)
+                else:
+                    self.stats["matches_skipped"] += 1
+                
+                if track.confirmed and not was_confirmed:
+                    self.stats["tracks_confirmed"] += 1
+                
+                name = PENDING_NAME
+                if track.confirmed:
+                    name = self.gallery.name_for(track.member_id) if track.member_id is not None else "Unknown"
+                    if name is None:
+                        # The member was removed since the track was confirmed
+                        track.reset()
+                        name = PENDING_NAME
+                self.face_names.append(name)
+                overlay_tracks.append(track)
+                if not track.confirmed:
+                    continue
                 
-                # Process unknown faces
-                for i, thumbnail in enumerate(current_thumbnails):
-                    if thumbnail is not None and i < len(self.face_encodings):
-                        self._process_unknown_face(self.face_encodings[i], thumbnail)
+                if track.member_id is not None:
+                    # Record member ID for attendance
+                    recognized_ids.append(track.member_id)
+                
+                # Update persistent face tracking (unknown faces are told apart by encoding)
+                thumbnail = current_thumbnails[face_index] if face_index < len(current_thumbnails) else None
+                if thumbnail is not None and (face_encoding is not None or track.member_id is not None):
+                    self._update_persistent_faces(name, track.member_id, face_encoding, thumbnail, quality)
             
-            # Update recognition result timestamp
-            current_time = time.time()
+            # Update per-camera statistics
+            self.stats["frames_processed"] += 1
+            self.stats["faces_detected"] += len(self.face_locations)
+            self.stats["faces_encoded"] += sum(1 for encoding in self.face_encodings if encoding is not None)
+            self.stats["faces_recognized"] += len(recognized_ids)
             
-            # Create the processed frame with drawn boxes
-            processed_frame = frame.copy()
+            # Publish boxes in full-frame coordinates for client-side overlays
+            overlay_faces = []
+            for (top, right, bottom, left), name, track in zip(self.face_locations, self.face_names, overlay_tracks):
+                # Scale back up face locations since the frame we detected in was downscaled
+                overlay_faces.append({
+                    "top": int(top / DETECTION_SCALE),
+                    "right": int(right / DETECTION_SCALE),
+                    "bottom": int(bottom / DETECTION_SCALE),
+                    "left": int(left / DETECTION_SCALE),
+                    "name": name,
+                    "track_id": track.id,
+                    "confirmed": track.confirmed,
+                    "confidence": round(track.confidence, 3)
+                })
+            self.overlay = {
+                "sequence": sequence,
+                "timestamp": current_time,
+                "width": frame.shape[1],
+                "height": frame.shape[0],
+                "faces": overlay_faces
+            }
             
-            # Draw the results on the processed frame
-            for (top, right, bottom, left), name in zip(self.face_locations, self.face_names):
-                # Scale back up face locations since the frame we detected in was 1/2 size (changed from 1/4)
-                top *= 2
-                right *= 2
-                bottom *= 2
-                left *= 2
+            processed_frame = frame
+            annotations_wanted = self.annotations_wanted(current_time)
+            if annotations_wanted:
+                # Draw into a reused annotation buffer instead of a fresh copy
+                annotation_slot, buffer = self.annotation_ring.acquire_write()
+            if annotation_slot is not None:
+                processed_frame = copy_into(buffer, frame)
                 
-                # Draw a box around the face
-                cv2.rectangle(processed_frame, (left, top), (right, bottom), (0, 0, 255), 2)
+                # Draw the results on the processed frame
+                for face in overlay_faces:
+                    top, right, bottom, left = face["top"], face["right"], face["bottom"], face["left"]
+                    
+                    # Draw a box around the face
+                    cv2.rectangle(processed_frame, (left, top), (right, bottom), (0, 0, 255), 2)
+                    
+                    # Draw a label with a name below the face
+                    cv2.rectangle(processed_frame, (left, bottom - 35), (right, bottom), (0, 0, 255), cv2.FILLED)
+                    font = cv2.FONT_HERSHEY_DUPLEX
+                    cv2.putText(processed_frame, face["name"], (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
                 
-                # Draw a label with a name below the face
-                cv2.rectangle(processed_frame, (left, bottom - 35), (right, bottom), (0, 0, 255), cv2.FILLED)
-                font = cv2.FONT_HERSHEY_DUPLEX
-                cv2.putText(processed_frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
+                self.annotation_ring.publish(annotation_slot, processed_frame)
+                annotation_slot = None
+            elif not annotations_wanted:
+                # Nobody is watching annotated frames; don't serve a stale one later
+                self.annotation_ring.clear()
+            # (If slow streams hold every annotation buffer, they keep the last annotated frame)
             
             # Update recognition result with all faces data
             self._update_recognition_result(current_time)
@@ -294,53 +444,71 @@ class FaceProcessor:
             
         except Exception as e:
             print(f"Error processing frame: {e}")
-            # Clear arrays on error
-            self.face_locations = []
-            self.face_encodings = []
-            self.face_names = []
-            self.face_thumbnails = []
-            return frame.copy(), []
+            self._clear_frame_state()
+            if annotation_slot is not None:
+                self.annotation_ring.abandon(annotation_slot)
+            return frame, []
+    
+    def request_annotations(self):
+        """Note that a client is streaming frames with boxes drawn in."""
+        self.annotations_requested_at = time.time()
+    
+    def annotations_wanted(self, now=None):
+        """True if annotated frames were requested within ANNOTATION_IDLE_SECONDS."""
+        now = now if now is not None else time.time()
+        return now - self.annotations_requested_at < ANNOTATION_IDLE_SECONDS
+    
+    def _clear_frame_state(self):
+        """Clear per-frame detection data after an error."""
+        self.face_locations = []
+        self.face_encodings = []
+        self.face_names = []
+        self.face_thumbnails = []
+    
+    def _match_known_face(self, face_encoding):
+        """Match a face encoding against the gallery.
+        
+        Returns:
+            (name, member_id, distance), with ("Unknown", None, distance) if
+            nobody matches; distance is None for an empty gallery
+        """
+        # Stage 1: the active meeting's expected attendees, if a roster is set
+        roster_result = self.gallery.match_roster([face_encoding])
+        if roster_result is not None:
+            name, member_id, distance = roster_result[0]
+            if member_id is not None:
+                self.stats["roster_hits"] += 1
+                return name, member_id, distance
+            self.stats["roster_misses"] += 1
+        
+        # Stage 2: the full gallery, exact or quantized-then-reranked depending on GALLERY_QUANTIZATION
+        name, member_id, distance = self.gallery.match([face_encoding])[0]
+        if roster_result is not None and member_id is not None:
+            self.stats["roster_fallback_matches"] += 1
+        return name, member_id, distance
     
     def _get_valid_encodings(self):
         """Get valid face encodings, names, and IDs.
         
+        Encodings are decoded once into known_face_matrix when the gallery
+        loads, so this no longer does any per-frame conversion.
+        
         Returns:
-            valid_encodings: List of valid face encodings
+            valid_encodings: Matrix of known face encodings, one row per face
             valid_names: List of corresponding names
             valid_ids: List of corresponding member IDs
         """
-        valid_encodings = []
-        valid_names = []
-        valid_ids = []
-        
-        for i, known_encoding in enumerate(self.known_face_encodings):
-            try:
-                # Convert any bytes to numpy arrays if needed
-                if isinstance(known_encoding, bytes):
-                    from app.database import convert_array
-                    known_encoding = convert_array(known_encoding)
-                
-                # Verify it's a valid numpy array with the right shape
-                if (isinstance(known_encoding, np.ndarray) and 
-                    known_encoding.dtype == np.float64 and
-                    len(known_encoding.shape) == 1):
-                    valid_encodings.append(known_encoding)
-                    valid_names.append(self.known_face_names[i])
-                    valid_ids.append(self.known_face_ids[i] if i < len(self.known_face_ids) else None)
-            except Exception as enc_error:
-                print(f"Error with encoding {i}: {enc_error}")
-                continue
-        
-        return valid_encodings, valid_names, valid_ids
+        return self.gallery.snapshot()
     
-    def _update_persistent_faces(self, name, member_id, face_encoding, thumbnail):
+    def _update_persistent_faces(self, name, member_id, face_encoding, thumbnail, quality=0.0):
         """Update persistent face tracking data.
         
         Args:
             name: Name of the person
             member_id: Member ID or None for unknown
-            face_encoding: Face encoding
+            face_encoding: Face encoding (None if the face wasn't encoded)
             thumbnail: Face thumbnail image
+            quality: Quality score of the face, used to keep the best thumbnail
         """
         current_time = time.time()
         
@@ -348,31 +516,35 @@ class FaceProcessor:
             # Update or create known face entry
             if name not in self.persistent_faces["known"]:
                 self.persistent_faces["known"][name] = {
-                    "image": thumbnail,
+                    "image": thumbnail.copy(),
                     "in_view": True,
                     "last_seen": current_time,
                     "member_id": member_id,
-                    "encoding": face_encoding
+                    "encoding": face_encoding,
+                    "quality": quality
                 }
             else:
                 # Person already known, update tracking
                 self.persistent_faces["known"][name]["in_view"] = True
                 self.persistent_faces["known"][name]["last_seen"] = current_time
-                self.persistent_faces["known"][name]["encoding"] = face_encoding
+                if face_encoding is not None:
+                    self.persistent_faces["known"][name]["encoding"] = face_encoding
                 
-                # Only update thumbnail if it's significantly better quality
-                if thumbnail.size > self.persistent_faces["known"][name]["image"].size * 1.2:
-                    self.persistent_faces["known"][name]["image"] = thumbnail
+                # Keep the best-scoring thumbnail
+                if quality > self.persistent_faces["known"][name].get("quality", 0.0):
+                    self.persistent_faces["known"][name]["image"] = thumbnail.copy()
+                    self.persistent_faces["known"][name]["quality"] = quality
         else:
             # Handle unknown face - check if it matches existing unknown faces
-            self._process_unknown_face(face_encoding, thumbnail)
+            self._process_unknown_face(face_encoding, thumbnail, quality)
     
-    def _process_unknown_face(self, face_encoding, thumbnail):
+    def _process_unknown_face(self, face_encoding, thumbnail, quality=0.0):
         """Process an unknown face.
         
         Args:
             face_encoding: Face encoding
             thumbnail: Face thumbnail image
+            quality: Quality score of the face, used to keep the best thumbnail
         """
         current_time = time.time()
         
@@ -384,9 +556,10 @@ class FaceProcessor:
             matched_face["in_view"] = True
             matched_face["last_seen"] = current_time
             matched_face["encoding"] = face_encoding
-            # Only update if better quality
-            if thumbnail.size > matched_face["image"].size * 1.2:
-                matched_face["image"] = thumbnail
+            # Keep the best-scoring thumbnail
+            if quality > matched_face.get("quality", 0.0):
+                matched_face["image"] = thumbnail.copy()
+                matched_face["quality"] = quality
         else:
             # Create new unknown face
             self.unknown_face_counter += 1
@@ -396,10 +569,11 @@ class FaceProcessor:
             if face_encoding is not None:
                 new_unknown = {
                     "id": unknown_id,
-                    "image": thumbnail,
+                    "image": thumbnail.copy(),
                     "in_view": True,
                     "last_seen": current_time,
-                    "encoding": face_encoding
+                    "encoding": face_encoding,
+                    "quality": quality
                 }
                 print(f"Added new unknown face {unknown_id}")
                 self.persistent_faces["unknown"].append(new_unknown)
@@ -463,9 +637,10 @@ class FaceProcessor:
                 if name_id == thumbnail_id or name == thumbnail_id:
                     # For known faces, use the database image if available
                     member_id = data.get("member_id")
-                    if member_id and member_id in self.known_face_images:
+                    member_image = self.gallery.get_member_image(member_id) if member_id else None
+                    if member_image is not None:
                         # Use member image from database
-                        ret, jpeg = cv2.imencode('.jpg', self.known_face_images[member_id])
+                        ret, jpeg = cv2.imencode('.jpg', member_image)
                         if ret:
                             return jpeg.tobytes()
                     
@@ -516,14 +691,6 @@ class FaceProcessor:
         
         # Only try to record attendance if there are recognized members
         if all_recognized_ids:
-            with current_app.app_context():
-                for member_id in all_recognized_ids:
-                    try:
-                        success = record_attendance(member_id, meeting_id)
-                        if success:
-                            recorded_count += 1
-                            print(f"Recorded attendance for member ID: {member_id}")
-                    except Exception as e:
-                        print(f"Error recording attendance: {e}")
-        
-        return recorded_count
+            recorded_count = self.attendance_writer.record(all_recognized_ids, meeting_id)
+        
+        return recorded_count
\ No newline at end of file
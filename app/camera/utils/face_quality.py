@@ -0,0 +1,92 @@
+import cv2
+import face_recognition
+import numpy as np
+
+# Faces scoring below this aren't encoded (0 = unusable, 1 = ideal)
+QUALITY_THRESHOLD = 0.45
+
+# Face box height (detection pixels) below which a face is useless, and
+# at which size stops mattering
+MIN_FACE_SIZE = 24
+GOOD_FACE_SIZE = 64
+
+# Variance of the Laplacian of a sharp face crop; lower means motion blur or defocus
+SHARP_LAPLACIAN_VARIANCE = 120.0
+
+# Mean brightness range that is fine, and the extremes at which a face is unusable
+GOOD_BRIGHTNESS = (60, 190)
+BRIGHTNESS_LIMITS = (15, 245)
+
+# Nose offset from the eyes' midpoint, relative to eye distance, of a face in profile
+PROFILE_NOSE_OFFSET = 0.6
+
+def _ramp(value, low, high):
+    """0 at low, 1 at high, linear in between."""
+    return float(np.clip((value - low) / (high - low), 0.0, 1.0))
+
+def _brightness_score(mean):
+    if mean < GOOD_BRIGHTNESS[0]:
+        return _ramp(mean, BRIGHTNESS_LIMITS[0], GOOD_BRIGHTNESS[0])
+    if mean > GOOD_BRIGHTNESS[1]:
+        return _ramp(-mean, -BRIGHTNESS_LIMITS[1], -GOOD_BRIGHTNESS[1])
+    return 1.0
+
+def _pose_score(landmarks):
+    """Score how frontal a face is from the small (5-point) landmark model."""
+    try:
+        left_eye = np.mean(landmarks["left_eye"], axis=0)
+        right_eye = np.mean(landmarks["right_eye"], axis=0)
+        nose = np.mean(landmarks["nose_tip"], axis=0)
+    except (KeyError, ValueError):
+        return 0.0
+
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    if eye_distance < 1:
+        return 0.0
+    # A turned head moves the nose towards one eye
+    offset = abs(nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance
+    return 1.0 - _ramp(offset, 0.0, PROFILE_NOSE_OFFSET)
+
+def face_quality(rgb, location, threshold=QUALITY_THRESHOLD):
+    """Score how usable a detected face is for recognition.
+
+    Size, sharpness and brightness come from the crop itself; pose needs
+    landmarks, which are only located when the cheap scores leave the face
+    a chance of passing. The score is the geometric mean of the parts, so
+    one bad aspect is enough to reject a face.
+
+    Args:
+        rgb: RGB image the face was detected in
+        location: (top, right, bottom, left) box
+        threshold: Score a face needs to be encoded
+
+    Returns:
+        (score, {"size", "blur", "brightness", "pose": part scores})
+    """
+    top, right, bottom, left = location
+    top, left = max(0, top), max(0, left)
+    crop = rgb[top:bottom, left:right]
+    if crop.size == 0:
+        return 0.0, {"size": 0.0, "blur": 0.0, "brightness": 0.0, "pose": 0.0}
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    parts = {
+        "size": _ramp(bottom - top, MIN_FACE_SIZE, GOOD_FACE_SIZE),
+        "blur": min(1.0, cv2.Laplacian(gray, cv2.CV_32F).var() / SHARP_LAPLACIAN_VARIANCE),
+        "brightness": _brightness_score(float(gray.mean())),
+        "pose": 1.0,
+    }
+
+    # Even a perfectly frontal face can't lift this score over the threshold
+    best_case = float(np.prod(list(parts.values())) ** 0.25)
+    if best_case < threshold:
+        parts["pose"] = None  # Not measured
+        return best_case, parts
+
+    landmarks = face_recognition.face_landmarks(rgb, [location], model="small")
+    parts["pose"] = _pose_score(landmarks[0]) if landmarks else 0.0
+    return float(np.prod(list(parts.values())) ** 0.25), parts
+
+def weakest_part(parts):
+    """Return the name of the lowest-scoring quality part."""
+    return min((value, name) for name, value in parts.items() if value is not None)[1]
@@ -0,0 +1,166 @@
+import itertools
+import numpy as np
+
+# Consecutive matches agreeing on an identity before it is trusted
+CONFIRM_MATCHES = 3
+
+# A confirmed track is matched again once its encoding is this far (face
+# distance) from the one its identity was confirmed with
+DRIFT_THRESHOLD = 0.35
+
+# Smallest box overlap for a detection to continue a track
+MIN_IOU = 0.3
+
+# Tracks whose face hasn't been detected for this long are dropped
+MAX_TRACK_AGE_SECONDS = 2.0
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+class FaceTrack:
+    """One face followed across frames, with the votes on who it is."""
+
+    def __init__(self, track_id, location, now):
+        self.id = track_id
+        self.location = location
+        self.last_seen = now
+        self.candidate = None  # Member ID being voted on (None = unknown)
+        self.streak = 0  # Consecutive matches agreeing with the candidate
+        self.scores = {}  # {member ID or None: accumulated match margin}
+        self.confirmed = False
+        self.member_id = None  # Confirmed identity (None = confirmed unknown)
+        self.reference = None  # Encoding the identity was confirmed or last re-checked with
+        self.gallery_version = None  # Gallery the identity was decided against
+
+    @property
+    def confidence(self):
+        """Accumulated match margin of the confirmed (or leading) identity."""
+        return self.scores.get(self.member_id if self.confirmed else self.candidate, 0.0)
+
+    def reset(self):
+        """Forget the identity, e.g. after the member was removed from the gallery."""
+        self.candidate = None
+        self.streak = 0
+        self.scores = {}
+        self.confirmed = False
+        self.member_id = None
+        self.reference = None
+
+class FaceTracker:
+    """Follows faces across frames so identities are decided by several matches.
+
+    Detections are paired with tracks by box overlap. Each gallery match is
+    a vote; a track's identity is confirmed after CONFIRM_MATCHES consistent
+    votes. A confirmed track isn't matched again until its encoding drifts
+    from the confirmed one (or, for an unknown face, until the gallery
+    changes), so gallery matching scales with new arrivals rather than with
+    faces times frames.
+    """
+
+    def __init__(self, confirm_matches=CONFIRM_MATCHES, drift_threshold=DRIFT_THRESHOLD,
+                 min_iou=MIN_IOU, max_age=MAX_TRACK_AGE_SECONDS, tolerance=0.6):
+        """Create a tracker.
+
+        Args:
+            confirm_matches: Consistent matches needed to confirm an identity
+            drift_threshold: Encoding change that makes a confirmed track match again
+            min_iou: Smallest box overlap that continues a track
+            max_age: Seconds a track survives without its face being detected
+            tolerance: Match tolerance, used to turn distances into confidence
+        """
+        self.confirm_matches = max(1, confirm_matches)
+        self.drift_threshold = drift_threshold
+        self.min_iou = min_iou
+        self.max_age = max_age
+        self.tolerance = tolerance
+        self.tracks = []
+        self.ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+
+    def assign(self, face_locations, now):
+        """Return the track of each detected face, starting tracks for new faces.
+
+        Args:
+            face_locations: (top, right, bottom, left) boxes of this frame
+            now: Frame timestamp
+
+        Returns:
+            List of FaceTrack, one per location
+        """
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= self.max_age]
+
+        # Greedily pair the most-overlapping detection and track first
+        pairs = sorted(
+            ((box_iou(location, track.location), face_index, track_index)
+             for face_index, location in enumerate(face_locations)
+             for track_index, track in enumerate(self.tracks)),
+            reverse=True
+        )
+        assigned = [None] * len(face_locations)
+        used = set()
+        for overlap, face_index, track_index in pairs:
+            if overlap < self.min_iou:
+                break
+            if assigned[face_index] is None and track_index not in used:
+                assigned[face_index] = self.tracks[track_index]
+                used.add(track_index)
+
+        for face_index, location in enumerate(face_locations):
+            track = assigned[face_index]
+            if track is None:
+                track = assigned[face_index] = FaceTrack(next(self.ids), location, now)
+                self.tracks.append(track)
+            track.location = location
+            track.last_seen = now
+        return assigned
+
+    def needs_match(self, track, encoding, gallery_version):
+        """True if the track's identity has to be (re)checked against the gallery."""
+        if not track.confirmed:
+            return True
+        if track.member_id is None and gallery_version != track.gallery_version:
+            # The face may have just been enrolled
+            return True
+        distance = np.linalg.norm(np.asarray(encoding, dtype=np.float32) - track.reference)
+        return distance > self.drift_threshold
+
+    def vote(self, track, member_id, distance, encoding, gallery_version):
+        """Count one gallery match towards a track's identity.
+
+        Args:
+            track: FaceTrack the face belongs to
+            member_id: Matched member ID (None = unknown)
+            distance: Distance to the closest member, or None if unknown
+            encoding: The face's encoding
+            gallery_version: FaceGallery.version the match was made against
+        """
+        # Margin from the tolerance, on the side the match fell
+        if distance is None:
+            margin = self.tolerance
+        elif member_id is not None:
+            margin = max(0.0, self.tolerance - distance)
+        else:
+            margin = max(0.0, distance - self.tolerance)
+        track.scores[member_id] = track.scores.get(member_id, 0.0) + margin
+
+        if track.streak and member_id == track.candidate:
+            track.streak += 1
+        else:
+            track.candidate = member_id
+            track.streak = 1
+            if track.confirmed and member_id != track.member_id:
+                # The face changed identity (e.g. the box jumped to someone else)
+                track.confirmed = False
+
+        if track.streak >= self.confirm_matches:
+            track.confirmed = True
+            track.member_id = member_id
+        track.reference = np.asarray(encoding, dtype=np.float32)
+        track.gallery_version = gallery_version
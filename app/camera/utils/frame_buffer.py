@@ -0,0 +1,172 @@
+import threading
+import numpy as np
+
+class FrameRef:
+    """A reference-counted, read-only view of one frame in a FrameRing.
+
+    The slot behind it is not reused until release() is called, so the
+    view can be encoded or processed without copying. Use as a context
+    manager to release automatically.
+    """
+
+    def __init__(self, ring, index, array, sequence):
+        self.ring = ring
+        self.index = index
+        self.array = array
+        self.sequence = sequence
+        self._released = False
+
+    def release(self):
+        """Drop the reference; the slot may be overwritten afterwards."""
+        if not self._released:
+            self._released = True
+            self.ring._release(self.index)
+
+    def __enter__(self):
+        return self.array
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+class FrameRing:
+    """A small ring of reusable frame buffers with reference counting.
+
+    A single writer fills free slots in place (e.g. with
+    VideoCapture.read(image=...)) and publishes them; any number of readers
+    take read-only views of the latest published slot. A slot is never
+    handed to the writer while it is the latest frame or while readers hold
+    references to it, so in steady state no frame memory is allocated.
+
+    If slow readers hold every slot the ring grows, up to max_size slots;
+    past that the writer gets no slot and has to drop its frame. Extra slots
+    are freed again once their references are released.
+    """
+
+    def __init__(self, size=4, max_size=None):
+        self.size = size
+        self.max_size = max(size, max_size if max_size is not None else 2 * size)
+        self.lock = threading.Lock()
+        self.buffers = [None] * size     # Writable arrays owned by the ring
+        self.views = [None] * size       # Cached read-only views of the buffers
+        self.refcounts = [0] * size
+        self.writing = set()
+        self.latest = None               # Index of the latest published slot
+        self.sequence = 0                # Number of frames published so far
+
+    def acquire_write(self):
+        """Reserve a slot for the writer.
+
+        Returns:
+            (index, buffer) where buffer is the slot's array from an earlier
+            frame, or None if the slot hasn't been filled yet. Both are None
+            if readers hold every slot and the ring is at max_size.
+        """
+        with self.lock:
+            for index in range(len(self.buffers)):
+                if (index != self.latest and index not in self.writing
+                        and self.refcounts[index] == 0):
+                    self.writing.add(index)
+                    return index, self.buffers[index]
+
+            # Every slot is in use by slow readers: grow instead of overwriting,
+            # up to a limit so stuck readers can't make the ring grow forever
+            if len(self.buffers) >= self.max_size:
+                return None, None
+            self.buffers.append(None)
+            self.views.append(None)
+            self.refcounts.append(0)
+            index = len(self.buffers) - 1
+            self.writing.add(index)
+            return index, None
+
+    def publish(self, index, frame, sequence=None):
+        """Make a written slot the latest frame.
+
+        Args:
+            index: Slot returned by acquire_write
+            frame: The filled array; normally the slot's own buffer, but a new
+                   array is adopted if the writer had to allocate (e.g. the
+                   camera resolution changed)
+            sequence: Optional sequence number to use instead of counting
+                      publishes, e.g. the capture count when frames may be skipped
+
+        Returns:
+            The frame's sequence number
+        """
+        with self.lock:
+            if frame is not self.buffers[index]:
+                self.buffers[index] = frame
+                view = frame.view()
+                view.flags.writeable = False
+                self.views[index] = view
+            self.writing.discard(index)
+            self.latest = index
+            self.sequence = sequence if sequence is not None else self.sequence + 1
+            self._shrink()
+            return self.sequence
+
+    def abandon(self, index):
+        """Give back a slot reserved with acquire_write without publishing it.
+
+        None (no slot was available) is ignored.
+        """
+        if index is None:
+            return
+        with self.lock:
+            self.writing.discard(index)
+            self._shrink()
+
+    def acquire_latest(self):
+        """Take a reference to the latest published frame.
+
+        Returns:
+            FrameRef, or None if nothing has been published yet
+        """
+        with self.lock:
+            if self.latest is None:
+                return None
+            index = self.latest
+            self.refcounts[index] += 1
+            return FrameRef(self, index, self.views[index], self.sequence)
+
+    def _release(self, index):
+        with self.lock:
+            self.refcounts[index] -= 1
+            self._shrink()
+
+    def _shrink(self):
+        """Drop free slots past the initial size from the end of the ring.
+
+        Called with the lock held.
+        """
+        while len(self.buffers) > self.size:
+            index = len(self.buffers) - 1
+            if index == self.latest or index in self.writing or self.refcounts[index]:
+                break
+            self.buffers.pop()
+            self.views.pop()
+            self.refcounts.pop()
+
+    def latest_shape(self):
+        """Return the shape of the latest frame, or None."""
+        with self.lock:
+            if self.latest is None:
+                return None
+            return self.buffers[self.latest].shape
+
+    def clear(self):
+        """Forget the latest frame so readers fall back to a placeholder."""
+        with self.lock:
+            self.latest = None
+
+def copy_into(buffer, frame):
+    """Copy frame into buffer, reallocating only if the shape changed.
+
+    Returns:
+        The buffer holding the copy
+    """
+    if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+        buffer = np.empty_like(frame)
+    np.copyto(buffer, frame)
+    return buffer
@@ -0,0 +1,265 @@
+import copy
+import numpy as np
+
+# Rows compared at a time, bounding the temporary float32 arrays during search
+SEARCH_BLOCK = 65536
+
+class GalleryIndex:
+    """Compact copy of the gallery encodings for finding match candidates.
+
+    Indexes trade exactness for memory: they return the k closest rows by
+    approximate distance, which FaceGallery then re-ranks against the exact
+    float32 vectors (a memory-mapped snapshot, so only the candidate rows
+    are ever read).
+    """
+
+    kind = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        """Memory used by the index."""
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def search(self, queries, k):
+        """Return the k best candidates for each query.
+
+        Args:
+            queries: (q, 128) float32 encodings
+            k: Candidates per query
+
+        Returns:
+            (q, k) array of row indices, closest (approximately) first
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+        k = min(k, len(self))
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        # Keep a running top-k across blocks so memory doesn't grow with the gallery
+        for start in range(0, len(self), SEARCH_BLOCK):
+            scores = self._scores(queries, start, min(start + SEARCH_BLOCK, len(self)))
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            keep = np.argpartition(scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k else np.argsort(scores, axis=1)
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+
+        order = np.argsort(best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1)
+
+    def _scores(self, queries, start, end):
+        """Approximate squared distances (or anything ordered the same) for rows start:end."""
+        raise NotImplementedError
+
+    def _encode(self, rows):
+        """Return the codes for float32 rows."""
+        raise NotImplementedError
+
+    def updated(self, position, row):
+        """Return a copy with one row replaced (or appended at position == len).
+
+        Uses the existing quantizer, so the index isn't retrained.
+        """
+        new = copy.copy(self)
+        code = self._encode(np.asarray(row, dtype=np.float32).reshape(1, 128))
+        if position == len(self):
+            new.codes = np.concatenate([self.codes, code])
+        else:
+            new.codes = self.codes.copy()
+            new.codes[position] = code[0]
+        new._after_update()
+        return new
+
+    def _after_update(self):
+        pass
+
+class Float16Index(GalleryIndex):
+    """Encodings stored as float16: half the memory, near-exact distances."""
+
+    kind = 'float16'
+
+    def __init__(self, encodings):
+        self.codes = self._encode(encodings)
+
+    def _encode(self, rows):
+        return np.asarray(rows, dtype=np.float16)
+
+    def _scores(self, queries, start, end):
+        block = self.codes[start:end].astype(np.float32)
+        return (np.einsum('ij,ij->i', block, block)[None, :] - 2.0 * queries @ block.T)
+
+class ScalarQuantizedIndex(GalleryIndex):
+    """Each dimension quantized to 8 bits between its minimum and maximum (128 bytes per face)."""
+
+    kind = 'int8'
+
+    def __init__(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        self.minimum = encodings.min(axis=0) if len(encodings) else np.zeros(128, dtype=np.float32)
+        span = (encodings.max(axis=0) - self.minimum) if len(encodings) else np.ones(128, dtype=np.float32)
+        self.scale = np.where(span > 0, span / 255.0, 1.0).astype(np.float32)
+        self.codes = self._encode(encodings)
+        self._after_update()
+
+    def _encode(self, rows):
+        return np.clip(np.rint((rows - self.minimum) / self.scale), 0, 255).astype(np.uint8)
+
+    def _after_update(self):
+        # ||reconstructed row||^2, so search only needs one matrix product per block
+        norms = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SEARCH_BLOCK):
+            block = self.codes[start:start + SEARCH_BLOCK] * self.scale + self.minimum
+            norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        self.norms = norms
+
+    def _scores(self, queries, start, end):
+        # q.(min + scale*c) = q.min + (q*scale).c
+        weighted = queries * self.scale
+        offsets = queries @ self.minimum
+        dots = self.codes[start:end].astype(np.float32) @ weighted.T
+        return self.norms[None, start:end] - 2.0 * (dots.T + offsets[:, None])
+
+class ProductQuantizedIndex(GalleryIndex):
+    """Product quantization: each group of dimensions stored as the ID of its nearest centroid.
+
+    With 16 groups of 8 dimensions and 256 centroids per group, a face is
+    16 bytes. Distances are looked up per group from a table computed once
+    per query (asymmetric distance computation).
+    """
+
+    kind = 'pq'
+
+    def __init__(self, encodings, subspaces=16, centroids=256, iterations=15, sample=50000, seed=0):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        if 128 % subspaces:
+            raise ValueError("subspaces must divide 128")
+        self.subspaces = subspaces
+        self.width = 128 // subspaces
+
+        rng = np.random.default_rng(seed)
+        training = encodings
+        if len(training) > sample:
+            training = training[rng.choice(len(training), sample, replace=False)]
+        centroids = max(1, min(centroids, len(training)))
+
+        self.codebooks = np.stack([
+            self._kmeans(training[:, m * self.width:(m + 1) * self.width], centroids, iterations, rng)
+            for m in range(subspaces)
+        ]) if len(training) else np.zeros((subspaces, 1, self.width), dtype=np.float32)
+        self.codes = self._encode(encodings)
+
+    @staticmethod
+    def _kmeans(points, count, iterations, rng):
+        centers = points[rng.choice(len(points), count, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = ProductQuantizedIndex._nearest(points, centers)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, assignment, points)
+            counts = np.bincount(assignment, minlength=count)[:, None]
+            # Centroids that lost all their points keep their position
+            centers = np.where(counts > 0, sums / np.maximum(counts, 1), centers).astype(np.float32)
+        return centers
+
+    @staticmethod
+    def _nearest(points, centers):
+        distances = (np.einsum('ij,ij->i', centers, centers)[None, :] - 2.0 * points @ centers.T)
+        return np.argmin(distances, axis=1)
+
+    def _encode(self, rows):
+        codes = np.empty((len(rows), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            part = rows[:, m * self.width:(m + 1) * self.width]
+            for start in range(0, len(rows), SEARCH_BLOCK):
+                codes[start:start + SEARCH_BLOCK, m] = self._nearest(part[start:start + SEARCH_BLOCK], self.codebooks[m])
+        return codes
+
+    def _scores(self, queries, start, end):
+        codes = self.codes[start:end]
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for m in range(self.subspaces):
+            part = queries[:, m * self.width:(m + 1) * self.width]
+            # Squared distance from each query part to each centroid: (q, centroids)
+            table = (np.einsum('ij,ij->i', part, part)[:, None]
+                     + np.einsum('ij,ij->i', self.codebooks[m], self.codebooks[m])[None, :]
+                     - 2.0 * part @ self.codebooks[m].T)
+            scores += table[:, codes[:, m]]
+        return scores
+
+INDEX_TYPES = {
+    'float16': Float16Index,
+    'int8': ScalarQuantizedIndex,
+    'pq': ProductQuantizedIndex,
+}
+
+def build_index(encodings, kind):
+    """Build a compact index of the gallery encodings.
+
+    Args:
+        encodings: (n, 128) array
+        kind: "float16", "int8" or "pq" (None = no index)
+
+    Returns:
+        GalleryIndex, or None when kind is None
+
+    Raises:
+        ValueError: If the kind is unknown
+    """
+    if kind is None:
+        return None
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown gallery quantization: {kind}")
+    return INDEX_TYPES[kind](encodings)
+
+def rerank(index, encodings, queries, candidates):
+    """Pick each query's closest row among an index's candidates, by exact distance.
+
+    Args:
+        index: GalleryIndex the candidates came from (None = compare every row)
+        encodings: Exact (n, 128) vectors, typically memory-mapped
+        queries: (q, 128) float32 encodings
+        candidates: Candidates per query
+
+    Returns:
+        (best row per query, its exact distance), as arrays of length q
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+    if index is None:
+        return _nearest_rows(encodings, queries)
+    rows = index.search(queries, candidates)
+
+    best_rows = np.empty(len(queries), dtype=np.int64)
+    best_distances = np.empty(len(queries), dtype=np.float32)
+    for i, query in enumerate(queries):
+        # Sorted fancy indexing reads the candidate rows in file order
+        candidate_rows = np.sort(rows[i])
+        vectors = np.asarray(encodings[candidate_rows], dtype=np.float32)
+        distances = np.linalg.norm(vectors - query, axis=1)
+        best = int(np.argmin(distances))
+        best_rows[i] = candidate_rows[best]
+        best_distances[i] = distances[best]
+    return best_rows, best_distances
+
+def _nearest_rows(encodings, queries):
+    """Closest row of every query, comparing all rows a block at a time."""
+    best_rows = np.zeros(len(queries), dtype=np.int64)
+    best_scores = np.full(len(queries), np.inf, dtype=np.float32)
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+
+    # ||a - b||^2 = ||a||^2 + ||b||^2 - 2ab, over contiguous slices of the snapshot
+    for start in range(0, len(encodings), SEARCH_BLOCK):
+        block = np.asarray(encodings[start:start + SEARCH_BLOCK], dtype=np.float32)
+        scores = (query_norms[:, None] + np.einsum('ij,ij->i', block, block)[None, :]
+                  - 2.0 * queries @ block.T)
+        best = np.argmin(scores, axis=1)
+        block_best = scores[np.arange(len(queries)), best]
+        improved = block_best < best_scores
+        best_rows[improved] = start + best[improved]
+        best_scores[improved] = block_best[improved]
+
+    # The expanded form loses precision; report the distance to the winner directly
+    vectors = np.asarray(encodings[best_rows], dtype=np.float32)
+    return best_rows, np.linalg.norm(vectors - queries, axis=1).astype(np.float32)
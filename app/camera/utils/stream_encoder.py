@@ -0,0 +1,83 @@
+import threading
+from collections import namedtuple
+import cv2
+
+# Output settings for a stream: height in pixels (None = capture size),
+# JPEG quality (0-100) and maximum frames per second (None = unlimited)
+StreamProfile = namedtuple('StreamProfile', ['height', 'quality', 'fps'])
+
+FULL_PROFILE = StreamProfile(height=None, quality=95, fps=None)
+
+def parse_stream_profile(args, profiles, default='full'):
+    """Build a StreamProfile from request arguments.
+
+    A named profile (`profile=320p`) is the starting point; `height`,
+    `quality` and `fps` arguments override its individual settings.
+
+    Args:
+        args: Request arguments (e.g. request.args)
+        profiles: {name: {"height", "quality", "fps"}} from STREAM_PROFILES
+        default: Profile used when none is named
+
+    Returns:
+        StreamProfile, or None if the named profile doesn't exist
+    """
+    settings = profiles.get(args.get('profile', default))
+    if settings is None:
+        return None
+
+    height = args.get('height', default=settings.get('height'), type=int)
+    quality = args.get('quality', default=settings.get('quality', FULL_PROFILE.quality), type=int)
+    fps = args.get('fps', default=settings.get('fps'), type=float)
+
+    return StreamProfile(
+        height=max(16, height) if height else None,
+        quality=min(100, max(10, quality)),
+        fps=fps if fps and fps > 0 else None
+    )
+
+class StreamEncoder:
+    """Encodes frames for one stream profile, shared by every client using it.
+
+    The last encoded frame is cached by its sequence number, so however many
+    clients watch the same profile, each frame is resized and encoded once.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.lock = threading.Lock()
+        self.resized = None  # Reused resize buffer
+        self.key = None
+        self.jpeg = None
+        self.frames_encoded = 0
+
+    def encode(self, frame, key=None):
+        """Return the frame as JPEG bytes for this profile.
+
+        Args:
+            frame: OpenCV BGR frame
+            key: Identifies the frame (e.g. its sequence number); a frame with
+                 the same key as the last one is served from the cache
+
+        Returns:
+            JPEG bytes, or None if encoding failed
+        """
+        with self.lock:
+            if key is not None and key == self.key:
+                return self.jpeg
+
+            image = frame
+            height = self.profile.height
+            if height and height < frame.shape[0]:
+                width = max(1, round(frame.shape[1] * height / frame.shape[0]))
+                if self.resized is None or self.resized.shape[:2] != (height, width):
+                    self.resized = None
+                self.resized = cv2.resize(frame, (width, height), dst=self.resized,
+                                          interpolation=cv2.INTER_AREA)
+                image = self.resized
+
+            ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.profile.quality])
+            self.key = key
+            self.jpeg = jpeg.tobytes() if ret else None
+            self.frames_encoded += 1
+            return self.jpeg
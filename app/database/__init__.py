@@ -39,15 +39,63 @@ def init_db():
     # Create tables
     with current_app.open_resource('database/schema.sql') as f:
         db.executescript(f.read().decode('utf8'))
+    
+    # Recreate gallery version triggers and invalidate old snapshots
+    from app.database.gallery import bump_gallery_version
+    bump_gallery_version()
+
+# Face encodings are stored as a version byte followed by raw little-endian float32
+ENCODING_VERSION = b'\x01'
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_SIZE = 128
 
 # Define functions to convert between numpy arrays and binary data
 def adapt_array(arr):
     """Convert numpy array to binary for SQLite storage."""
-    return pickle.dumps(arr)
+    return ENCODING_VERSION + np.asarray(arr, dtype=ENCODING_DTYPE).tobytes()
 
 def convert_array(binary):
-    """Convert binary data back to numpy array."""
-    return pickle.loads(binary)
+    """Convert binary data back to numpy array.
+    
+    Current blobs are decoded with np.frombuffer, which returns a read-only
+    view of the bytes without copying. Rows written before the binary format
+    existed are pickles, which are never unpickled outside
+    `flask migrate-encodings` (loading a pickle can run arbitrary code);
+    they read as None until that command rewrites them.
+    """
+    if is_legacy_encoding(binary):
+        return None
+    return np.frombuffer(binary, dtype=ENCODING_DTYPE, offset=1)
+
+def is_legacy_encoding(binary):
+    """Return True if a stored encoding blob still uses the pickle format."""
+    return binary[:1] != ENCODING_VERSION
+
+def decode_encoding_matrix(blobs):
+    """Decode a list of encoding blobs into one contiguous float32 matrix.
+    
+    Args:
+        blobs: List of raw face_encoding column values
+        
+    Returns:
+        numpy array of shape (len(blobs), 128)
+        
+    Raises:
+        ValueError: If a blob is still in the legacy pickle format
+    """
+    row_size = 1 + ENCODING_SIZE * ENCODING_DTYPE.itemsize
+    
+    # Fast path: every blob is a current-format row, so decode them all in one copy
+    if all(len(b) == row_size and b[:1] == ENCODING_VERSION for b in blobs):
+        raw = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), row_size)
+        return np.ascontiguousarray(raw[:, 1:]).view(ENCODING_DTYPE)
+    
+    matrix = np.empty((len(blobs), ENCODING_SIZE), dtype=ENCODING_DTYPE)
+    for i, blob in enumerate(blobs):
+        if is_legacy_encoding(blob):
+            raise ValueError("Face encoding is in the old pickle format; run `flask migrate-encodings`")
+        matrix[i] = np.frombuffer(blob, dtype=ENCODING_DTYPE, offset=1)
+    return matrix
 
 @click.command('init-db')
 @with_appcontext
@@ -59,6 +107,34 @@ def init_db_command():
     init_db()
     click.echo('Initialized the database.')
 
+@click.command('migrate-encodings')
+@with_appcontext
+def migrate_encodings_command():
+    """Rewrite pickled face encodings in the binary float32 format."""
+    db = get_db()
+    
+    # CAST drops the declared type so the converter hands us the raw bytes
+    rows = db.execute(
+        'SELECT id, CAST(face_encoding AS BLOB) AS blob FROM members'
+        ' WHERE face_encoding IS NOT NULL'
+    ).fetchall()
+    
+    updates = []
+    failed = 0
+    for row in rows:
+        if not is_legacy_encoding(row['blob']):
+            continue
+        try:
+            updates.append((adapt_array(pickle.loads(row['blob'])), row['id']))
+        except Exception as e:
+            failed += 1
+            click.echo(f'Could not convert encoding for member {row["id"]}: {e}')
+    
+    with db:
+        db.executemany('UPDATE members SET face_encoding = ? WHERE id = ?', updates)
+    
+    click.echo(f'Migrated {len(updates)} face encodings ({len(rows) - len(updates) - failed} already current, {failed} failed).')
+
 def setup_db_adapters():
     """Register the adapters for numpy arrays."""
     sqlite3.register_adapter(np.ndarray, adapt_array)
@@ -70,6 +146,10 @@ def init_app(app):
     """Register database functions with the Flask app."""
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_encodings_command)
+    
+    from app.database.gallery import snapshot_gallery_command
+    app.cli.add_command(snapshot_gallery_command)
     
     # Register the adapters on app initialization
     setup_db_adapters()
\ No newline at end of file
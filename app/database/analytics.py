@@ -0,0 +1,162 @@
+from app.database import get_db
+from app.database.pivot import build_attendance_matrix
+from flask import current_app
+import threading
+import numpy as np
+
+# Arrival buckets in minutes relative to the meeting start time
+ARRIVAL_BINS = [-np.inf, 0, 5, 10, 15, 30, 60, np.inf]
+ARRIVAL_LABELS = ['Before start', '0-5 min', '5-10 min', '10-15 min', '15-30 min', '30-60 min', '60+ min']
+
+# Cached results: {database path: (signature, results)}
+_cache = {}
+_cache_lock = threading.Lock()
+
+def invalidate_cache():
+    """Drop cached analytics for the current database.
+
+    Called by every function that writes attendance, meetings or members.
+    """
+    with _cache_lock:
+        _cache.pop(current_app.config['DATABASE'], None)
+
+def get_attendance_analytics():
+    """Return attendance analytics, computing them only when data has changed.
+
+    Returns:
+        dict with keys:
+            members: {member_id: {"rate", "attended", "eligible", "current_streak", "longest_streak"}}
+            meetings: list of {"id", "title", "start_time", "attendees", "first_time", "returning"}
+                      in chronological order
+            arrivals: {"labels", "counts", "median_minutes"}
+    """
+    key = current_app.config['DATABASE']
+    signature = _data_signature()
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    results = compute_attendance_analytics()
+
+    with _cache_lock:
+        _cache[key] = (signature, results)
+    return results
+
+def get_member_analytics(member_id):
+    """Return the analytics entry for one member, or None if they have none."""
+    return get_attendance_analytics()['members'].get(member_id)
+
+def compute_attendance_analytics():
+    """Compute all analytics from scratch with vectorized numpy operations."""
+    matrix = build_attendance_matrix()
+    grid = matrix.to_dense()  # members x meetings, chronological columns
+    n_members, n_meetings = grid.shape
+
+    attended = grid.sum(axis=1)
+    has_attended = attended > 0
+
+    # Index of each member's first meeting (0 for members who never came)
+    first_index = np.argmax(grid, axis=1) if n_meetings else np.zeros(n_members, dtype=np.int64)
+
+    # Rate over the meetings held since a member's first appearance
+    eligible = np.where(has_attended, n_meetings - first_index, 0)
+    rate = np.divide(attended, eligible, out=np.zeros(n_members), where=eligible > 0)
+
+    current_streak, longest_streak = _streaks(grid)
+
+    members = {}
+    for i, member_id in enumerate(matrix.member_ids.tolist()):
+        members[member_id] = {
+            "rate": float(rate[i]),
+            "attended": int(attended[i]),
+            "eligible": int(eligible[i]),
+            "current_streak": int(current_streak[i]),
+            "longest_streak": int(longest_streak[i]),
+        }
+
+    # A member is a first-timer only in the column of their first attendance
+    per_meeting = grid.sum(axis=0)
+    first_time = np.bincount(first_index[has_attended], minlength=n_meetings)
+    returning = per_meeting - first_time
+
+    meetings = []
+    for j, meeting_id in enumerate(matrix.meeting_ids.tolist()):
+        meetings.append({
+            "id": meeting_id,
+            "title": matrix.meeting_titles[j],
+            "start_time": matrix.meeting_starts[j],
+            "attendees": int(per_meeting[j]),
+            "first_time": int(first_time[j]),
+            "returning": int(returning[j]),
+        })
+
+    return {
+        "members": members,
+        "meetings": meetings,
+        "arrivals": _arrival_distribution(),
+    }
+
+def _streaks(grid):
+    """Compute current and longest attendance streaks for every row at once.
+
+    Args:
+        grid: Boolean members x meetings array in chronological order
+
+    Returns:
+        (current_streak, longest_streak) integer arrays
+    """
+    n_members, n_meetings = grid.shape
+    longest = np.zeros(n_members, dtype=np.int64)
+    if n_meetings == 0:
+        return longest.copy(), longest
+
+    # Trailing run of ones: position of the first miss counting back from the latest meeting
+    reversed_grid = grid[:, ::-1]
+    current = np.where(reversed_grid.all(axis=1), n_meetings, np.argmin(reversed_grid, axis=1))
+
+    # Every run starts at a +1 edge and ends at a -1 edge of the zero-padded row
+    padded = np.zeros((n_members, n_meetings + 2), dtype=np.int8)
+    padded[:, 1:-1] = grid
+    edges = np.diff(padded, axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    np.maximum.at(longest, start_rows, end_cols - start_cols)
+
+    return current, longest
+
+def _arrival_distribution():
+    """Bucket check-in times relative to their meeting's start in one query."""
+    db = get_db()
+    cursor = db.cursor()
+    cursor.row_factory = None
+    minutes = np.array(
+        cursor.execute(
+            'SELECT (julianday(a.timestamp) - julianday(m.start_time)) * 1440.0'
+            ' FROM attendance a'
+            ' JOIN meetings m ON a.meeting_id = m.id'
+        ).fetchall(),
+        dtype=np.float64
+    ).ravel()
+    minutes = minutes[~np.isnan(minutes)]
+
+    counts, _ = np.histogram(minutes, bins=ARRIVAL_BINS)
+    return {
+        "labels": ARRIVAL_LABELS,
+        "counts": counts.tolist(),
+        "median_minutes": float(np.median(minutes)) if minutes.size else None,
+    }
+
+def _data_signature():
+    """Cheap fingerprint of the tables the analytics depend on.
+
+    Catches writes made by other processes that never called invalidate_cache.
+    """
+    db = get_db()
+    row = db.execute(
+        'SELECT (SELECT COUNT(*) FROM attendance), (SELECT MAX(id) FROM attendance),'
+        ' (SELECT COUNT(*) FROM meetings), (SELECT MAX(id) FROM meetings),'
+        ' (SELECT COUNT(*) FROM members), (SELECT MAX(id) FROM members)'
+    ).fetchone()
+    return tuple(row)
@@ -1,6 +1,7 @@
 from app.database import get_db
 from datetime import datetime
 from app.database.members import increment_meeting_count
+from app.database.analytics import invalidate_cache
 
 def record_attendance(member_id, meeting_id=None):
     """Record attendance for a member at a meeting."""
@@ -38,8 +39,56 @@ def record_attendance(member_id, meeting_id=None):
     increment_meeting_count(member_id)
     
     db.commit()
+    invalidate_cache()
     return True
 
+def record_attendance_batch(meeting_id, entries, replace=False):
+    """Record attendance for many members at once, in a single transaction.
+    
+    Args:
+        meeting_id: Meeting ID
+        entries: {member_id: timestamp} with the time each member was first seen
+        replace: Remove the meeting's existing attendance first (e.g. when
+                 recomputing it from a recording with a new roster)
+        
+    Returns:
+        Number of members recorded
+    """
+    db = get_db()
+    
+    with db:
+        if replace:
+            # Undo the meeting counts of the rows being replaced
+            db.execute(
+                'UPDATE members SET meeting_count = meeting_count - 1'
+                ' WHERE id IN (SELECT member_id FROM attendance WHERE meeting_id = ?)',
+                (meeting_id,)
+            )
+            db.execute('DELETE FROM attendance WHERE meeting_id = ?', (meeting_id,))
+        
+        existing = {
+            row['member_id'] for row in db.execute(
+                'SELECT member_id FROM attendance WHERE meeting_id = ?', (meeting_id,)
+            )
+        }
+        new_entries = [
+            (member_id, meeting_id, timestamp)
+            for member_id, timestamp in entries.items()
+            if member_id not in existing
+        ]
+        
+        db.executemany(
+            'INSERT INTO attendance (member_id, meeting_id, timestamp) VALUES (?, ?, ?)',
+            new_entries
+        )
+        db.executemany(
+            'UPDATE members SET meeting_count = meeting_count + 1 WHERE id = ?',
+            [(member_id,) for member_id, _, _ in new_entries]
+        )
+    
+    invalidate_cache()
+    return len(new_entries)
+
 def get_member_attendance(member_id):
     """Get all attendance records for a specific member."""
     db = get_db()
@@ -86,6 +135,50 @@ def delete_attendance(attendance_id):
         # Delete the record
         db.execute('DELETE FROM attendance WHERE id = ?', (attendance_id,))
         db.commit()
+        invalidate_cache()
         return True
     
-    return False
\ No newline at end of file
+    return False
+
+def iter_meeting_attendance(meeting_id):
+    """Yield attendance records for a meeting one row at a time.
+    
+    Same columns and ordering as get_meeting_attendance, but rows are read
+    straight off the cursor instead of being collected into a list, so
+    exports of any size run in constant memory.
+    """
+    db = get_db()
+    cursor = db.execute(
+        'SELECT a.id, m.id as member_id, m.name, m.major, m.age, a.timestamp'
+        ' FROM attendance a'
+        ' JOIN members m ON a.member_id = m.id'
+        ' WHERE a.meeting_id = ?'
+        ' ORDER BY a.timestamp',
+        (meeting_id,)
+    )
+    for row in cursor:
+        yield row
+
+def iter_attendance_between(start_date, end_date):
+    """Yield attendance records for all meetings started in a date range.
+    
+    Args:
+        start_date: First datetime of the range (inclusive)
+        end_date: Last datetime of the range (exclusive)
+        
+    Yields:
+        Rows with meeting and member columns, ordered by meeting then check-in time
+    """
+    db = get_db()
+    cursor = db.execute(
+        'SELECT mt.id as meeting_id, mt.title, mt.start_time,'
+        ' m.id as member_id, m.name, m.major, m.age, a.timestamp'
+        ' FROM attendance a'
+        ' JOIN meetings mt ON a.meeting_id = mt.id'
+        ' JOIN members m ON a.member_id = m.id'
+        ' WHERE mt.start_time >= ? AND mt.start_time < ?'
+        ' ORDER BY mt.start_time, mt.id, a.timestamp',
+        (start_date, end_date)
+    )
+    for row in cursor:
+        yield row
@@ -0,0 +1,342 @@
+import json
+import os
+import sqlite3
+import tempfile
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from app.database import get_db
+from app.database.members import load_encoding_matrix
+
+# Version counter bumped by triggers whenever a member's name or encoding changes,
+# so snapshots can tell they are stale without reading any encodings
+GALLERY_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS gallery_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO gallery_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS gallery_members_insert AFTER INSERT ON members
+WHEN NEW.face_encoding IS NOT NULL
+BEGIN
+    UPDATE gallery_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_members_update AFTER UPDATE OF name, face_encoding ON members
+WHEN OLD.name IS NOT NEW.name OR OLD.face_encoding IS NOT NEW.face_encoding
+BEGIN
+    UPDATE gallery_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS gallery_members_delete AFTER DELETE ON members
+WHEN OLD.face_encoding IS NOT NULL
+BEGIN
+    UPDATE gallery_version SET version = version + 1 WHERE id = 1;
+END;
+"""
+
+INDEX_FILE = 'index.json'
+
+# New encodings from a re-encoding run wait here until the whole run is swapped in;
+# rows double as the run's checkpoint. previous_encoding is the member's stored
+# encoding blob when the run started: a different one at swap time means the
+# member got a new photo during the run (often under the same file name)
+REENCODE_STAGING_SQL = """
+CREATE TABLE IF NOT EXISTS staged_encodings (
+    run_id TEXT NOT NULL,
+    member_id INTEGER NOT NULL,
+    image_path TEXT,
+    face_encoding array,
+    status TEXT NOT NULL,
+    message TEXT,
+    previous_encoding BLOB,
+    PRIMARY KEY (run_id, member_id)
+);
+"""
+
+def ensure_gallery_version():
+    """Create the gallery version table and triggers if they are missing."""
+    db = get_db()
+    db.executescript(GALLERY_VERSION_SQL)
+
+def bump_gallery_version():
+    """Invalidate every existing snapshot, e.g. after the members table is recreated."""
+    ensure_gallery_version()
+    db = get_db()
+    db.execute('UPDATE gallery_version SET version = version + 1 WHERE id = 1')
+    db.commit()
+
+def get_gallery_version():
+    """Return the current gallery data version."""
+    db = get_db()
+    try:
+        row = db.execute('SELECT version FROM gallery_version WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        # Databases created before snapshots existed
+        ensure_gallery_version()
+        row = db.execute('SELECT version FROM gallery_version WHERE id = 1').fetchone()
+    return row['version']
+
+def _snapshot_dir():
+    return current_app.config['GALLERY_SNAPSHOT_DIR']
+
+def _replace_file(path, write, mode='wb'):
+    """Write a file through a uniquely named temporary file, then swap it in.
+
+    Concurrent writers each get their own temporary file, so they never
+    write into each other's; the last os.replace wins.
+    """
+    f = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), prefix='.tmp-', delete=False)
+    try:
+        with f:
+            write(f)
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.remove(f.name)
+        except OSError:
+            pass
+        raise
+
+def write_gallery_snapshot(encodings=None, names=None, member_ids=None, version=None):
+    """Write the gallery to disk as an .npy matrix plus a JSON index.
+
+    The matrix file name carries the version, and the index is swapped in
+    with os.replace, so readers never see a half-written snapshot. Older
+    matrix files are removed; processes that still map them keep their pages.
+
+    Args:
+        encodings, names, member_ids: Gallery to write (loaded from the DB if omitted)
+        version: Gallery version the data was read at (current version if omitted)
+
+    Returns:
+        Path of the index file
+    """
+    if version is None:
+        version = get_gallery_version()
+    if encodings is None:
+        encodings, names, member_ids = load_encoding_matrix()
+
+    directory = _snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    matrix_name = f'encodings-{version}.npy'
+    matrix = np.ascontiguousarray(encodings, dtype=np.float32)
+    _replace_file(os.path.join(directory, matrix_name), lambda f: np.save(f, matrix))
+
+    index = {
+        "database": os.path.abspath(current_app.config['DATABASE']),
+        "version": version,
+        "matrix": matrix_name,
+        "member_ids": [int(m) for m in member_ids],
+        "names": list(names),
+    }
+    index_path = os.path.join(directory, INDEX_FILE)
+    _replace_file(index_path, lambda f: json.dump(index, f), mode='w')
+
+    # Clean up matrices from other versions, keeping the one the index now
+    # points at (another writer may have swapped in its own meanwhile).
+    # Other writers' temporary files are left alone.
+    keep = {matrix_name}
+    snapshot = read_snapshot_files(directory)
+    if snapshot is not None:
+        keep.add(snapshot[3]["matrix"])
+    for filename in os.listdir(directory):
+        if filename.startswith('encodings-') and filename.endswith('.npy') and filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+    return index_path
+
+def read_snapshot_files(directory):
+    """Memory-map whatever snapshot is in a directory, without checking the database.
+
+    Needs no app context, so recognition worker processes can use it.
+
+    Returns:
+        (encodings, names, member_ids, index) or None if there is no readable snapshot
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            index = json.load(f)
+        encodings = np.load(os.path.join(directory, index["matrix"]), mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if encodings.shape[0] != len(index.get("member_ids", [])):
+        return None
+
+    return encodings, index["names"], index["member_ids"], index
+
+def read_gallery_snapshot(version=None):
+    """Memory-map the gallery snapshot if it matches the database.
+
+    Args:
+        version: Expected gallery version (current version if omitted)
+
+    Returns:
+        (encodings, names, member_ids) with a read-only memory-mapped matrix,
+        or None if there is no usable snapshot
+    """
+    if version is None:
+        version = get_gallery_version()
+
+    snapshot = read_snapshot_files(_snapshot_dir())
+    if snapshot is None:
+        return None
+
+    encodings, names, member_ids, index = snapshot
+    if (index.get("version") != version or
+            index.get("database") != os.path.abspath(current_app.config['DATABASE'])):
+        return None
+
+    return encodings, names, member_ids
+
+def load_gallery():
+    """Load the face gallery, preferring the memory-mapped snapshot.
+
+    Falls back to decoding every row from the database when the snapshot is
+    missing or stale, and rewrites the snapshot from that result so the
+    next process starts instantly.
+
+    Returns:
+        (encodings, names, member_ids)
+    """
+    version = get_gallery_version()
+
+    snapshot = read_gallery_snapshot(version)
+    if snapshot is not None:
+        return snapshot
+
+    encodings, names, member_ids = load_encoding_matrix()
+    try:
+        write_gallery_snapshot(encodings, names, member_ids, version)
+    except OSError as e:
+        print(f"Error writing gallery snapshot: {e}")
+    return encodings, names, member_ids
+
+def ensure_staging_table():
+    """Create the re-encoding staging table if it is missing."""
+    db = get_db()
+    db.executescript(REENCODE_STAGING_SQL)
+    try:
+        # Tables created before previous_encoding existed
+        db.execute('ALTER TABLE staged_encodings ADD COLUMN previous_encoding BLOB')
+        db.commit()
+    except sqlite3.OperationalError:
+        pass
+
+def seed_staged_members(run_id):
+    """Add a pending row for every member with a photo that the run doesn't have yet.
+
+    Each row records the member's current encoding blob (copied in SQL, not
+    decoded). Members whose encoding changed since their row was added go
+    back to pending with the new blob, so a resumed run encodes their new
+    photo instead of keeping a result from the old one.
+
+    Returns:
+        (members already handled, members left to encode)
+    """
+    db = get_db()
+    with db:
+        db.execute(
+            'UPDATE staged_encodings SET status = \'pending\', face_encoding = NULL, message = NULL,'
+            '    previous_encoding = (SELECT m.face_encoding FROM members m WHERE m.id = staged_encodings.member_id)'
+            ' WHERE run_id = ? AND previous_encoding IS NOT'
+            '    (SELECT m.face_encoding FROM members m WHERE m.id = staged_encodings.member_id)',
+            (run_id,)
+        )
+        db.execute(
+            'INSERT OR IGNORE INTO staged_encodings (run_id, member_id, image_path, status, previous_encoding)'
+            ' SELECT ?, id, image_path, \'pending\', face_encoding FROM members WHERE image_path IS NOT NULL',
+            (run_id,)
+        )
+    row = db.execute(
+        'SELECT SUM(status != \'pending\') AS handled, SUM(status = \'pending\') AS pending'
+        ' FROM staged_encodings WHERE run_id = ?',
+        (run_id,)
+    ).fetchone()
+    return row['handled'] or 0, row['pending'] or 0
+
+def get_pending_members(run_id):
+    """Return (member_id, image_path) of the members a run still has to encode."""
+    db = get_db()
+    rows = db.execute(
+        'SELECT m.id, m.image_path FROM staged_encodings s JOIN members m ON m.id = s.member_id'
+        ' WHERE s.run_id = ? AND s.status = \'pending\' AND m.image_path IS NOT NULL'
+        ' ORDER BY m.id',
+        (run_id,)
+    ).fetchall()
+    return [(row['id'], row['image_path']) for row in rows]
+
+def stage_encodings(run_id, results):
+    """Store one batch of re-encoding results in a single transaction.
+
+    Args:
+        run_id: Re-encoding run
+        results: List of (member_id, image_path, encoding or None, status, message)
+    """
+    db = get_db()
+    with db:
+        db.executemany(
+            'UPDATE staged_encodings SET image_path = ?, face_encoding = ?, status = ?, message = ?'
+            ' WHERE run_id = ? AND member_id = ?',
+            [(image_path, encoding, status, message, run_id, member_id)
+             for member_id, image_path, encoding, status, message in results]
+        )
+
+def get_staged_summary(run_id):
+    """Return {status: count} for a re-encoding run."""
+    db = get_db()
+    rows = db.execute(
+        'SELECT status, COUNT(*) AS count FROM staged_encodings'
+        ' WHERE run_id = ? AND status != \'pending\' GROUP BY status',
+        (run_id,)
+    ).fetchall()
+    return {row['status']: row['count'] for row in rows}
+
+def swap_staged_encodings(run_id):
+    """Replace members' encodings with a run's results in one transaction.
+
+    Members whose encoding changed while the run was going (a new photo was
+    enrolled, even under the same file name) keep their current encoding,
+    as do members where no face was found. The staged rows are removed.
+
+    Returns:
+        Number of members updated
+    """
+    db = get_db()
+    with db:
+        cursor = db.execute(
+            'UPDATE members SET face_encoding = ('
+            '    SELECT s.face_encoding FROM staged_encodings s'
+            '    WHERE s.run_id = ? AND s.member_id = members.id'
+            ')'
+            ' WHERE id IN ('
+            '    SELECT s.member_id FROM staged_encodings s'
+            '    WHERE s.run_id = ? AND s.status = \'done\' AND s.previous_encoding IS members.face_encoding'
+            ')',
+            (run_id, run_id)
+        )
+        db.execute('DELETE FROM staged_encodings WHERE run_id = ?', (run_id,))
+    return cursor.rowcount
+
+def clear_staged_encodings(run_id=None):
+    """Drop staged results of one run, or of every run."""
+    db = get_db()
+    with db:
+        if run_id is None:
+            db.execute('DELETE FROM staged_encodings')
+        else:
+            db.execute('DELETE FROM staged_encodings WHERE run_id = ?', (run_id,))
+
+@click.command('snapshot-gallery')
+@with_appcontext
+def snapshot_gallery_command():
+    """Write the face gallery snapshot used for fast startup."""
+    path = write_gallery_snapshot()
+    click.echo(f'Wrote gallery snapshot to {path}.')
@@ -1,6 +1,22 @@
+import difflib
+import re
+import sqlite3
 from app.database import get_db
+from app.database.analytics import invalidate_cache
 from datetime import datetime
 
+# Explicit list of members expected at a meeting
+ROSTER_SQL = """
+CREATE TABLE IF NOT EXISTS meeting_roster (
+    meeting_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    PRIMARY KEY (meeting_id, member_id)
+);
+"""
+
+# Titles at least this similar (after normalize_title) count as the same series
+SIMILAR_TITLE_RATIO = 0.8
+
 def get_all_meetings():
     """Get all meetings from the database."""
     db = get_db()
@@ -44,6 +60,7 @@ def create_meeting(title, description=None):
         (title, description, start_time)
     )
     db.commit()
+    invalidate_cache()
     return cursor.lastrowid
 
 def end_meeting(meeting_id):
@@ -75,6 +92,7 @@ def update_meeting(meeting_id, title=None, description=None):
         (title, description, meeting_id)
     )
     db.commit()
+    invalidate_cache()
     return get_meeting(meeting_id)
 
 def delete_meeting(meeting_id):
@@ -82,5 +100,88 @@ def delete_meeting(meeting_id):
     db = get_db()
     db.execute('DELETE FROM meetings WHERE id = ?', (meeting_id,))
     db.commit()
+    invalidate_cache()
+
+# get_meeting_attendance moved to attendance.py
+
+def ensure_roster_table():
+    """Create the meeting roster table if it is missing."""
+    db = get_db()
+    db.executescript(ROSTER_SQL)
+
+def set_meeting_roster(meeting_id, member_ids):
+    """Replace a meeting's explicit roster (an empty list removes it)."""
+    ensure_roster_table()
+    db = get_db()
+    with db:
+        db.execute('DELETE FROM meeting_roster WHERE meeting_id = ?', (meeting_id,))
+        db.executemany(
+            'INSERT OR IGNORE INTO meeting_roster (meeting_id, member_id) VALUES (?, ?)',
+            [(meeting_id, member_id) for member_id in member_ids]
+        )
+
+def get_meeting_roster(meeting_id):
+    """Return the member IDs on a meeting's explicit roster."""
+    db = get_db()
+    try:
+        rows = db.execute(
+            'SELECT member_id FROM meeting_roster WHERE meeting_id = ? ORDER BY member_id', (meeting_id,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # No roster has been saved yet
+        return []
+    return [row['member_id'] for row in rows]
+
+def normalize_title(title):
+    """Reduce a meeting title to what stays the same across a series.
+    
+    "Robotics Club - Week 3 (10/14)" and "robotics club week 4" both become
+    "robotics club week".
+    """
+    title = re.sub(r'[\d\W_]+', ' ', (title or '').lower())
+    return ' '.join(title.split())
 
-# get_meeting_attendance moved to attendance.py
\ No newline at end of file
+def get_expected_attendees(meeting_id, history=10, min_attended=1, candidates=500):
+    """Return the members likely to attend a meeting.
+    
+    An explicit roster is used when the meeting has one. Otherwise the
+    members who attended recent meetings with a similar title are expected.
+    
+    Args:
+        meeting_id: Meeting ID
+        history: Number of similar past meetings to look at
+        min_attended: Attendances among those meetings needed to be expected
+        candidates: Most recent meetings compared by title
+        
+    Returns:
+        (member_ids, source) where source is "roster", "history" or None
+    """
+    roster = get_meeting_roster(meeting_id)
+    if roster:
+        return roster, "roster"
+    
+    meeting = get_meeting(meeting_id)
+    if meeting is None:
+        return [], None
+    
+    db = get_db()
+    key = normalize_title(meeting['title'])
+    past = db.execute(
+        'SELECT id, title FROM meetings WHERE id != ? AND start_time <= ?'
+        ' ORDER BY start_time DESC LIMIT ?',
+        (meeting_id, meeting['start_time'], candidates)
+    ).fetchall()
+    similar = [
+        row['id'] for row in past
+        if difflib.SequenceMatcher(None, key, normalize_title(row['title'])).ratio() >= SIMILAR_TITLE_RATIO
+    ][:history]
+    if not similar:
+        return [], None
+    
+    placeholders = ','.join('?' * len(similar))
+    rows = db.execute(
+        f'SELECT member_id FROM attendance WHERE meeting_id IN ({placeholders})'
+        ' GROUP BY member_id HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC',
+        similar + [min_attended]
+    ).fetchall()
+    return [row['member_id'] for row in rows], "history"
@@ -1,6 +1,18 @@
+import sqlite3
 from app.database import get_db
+from app.database.analytics import invalidate_cache
 import numpy as np
 
+# Sized versions of each member photo, keyed by the original's file name
+IMAGE_VARIANTS_SQL = """
+CREATE TABLE IF NOT EXISTS member_image_variants (
+    image_path TEXT PRIMARY KEY,
+    avatar TEXT,
+    card TEXT,
+    full TEXT
+);
+"""
+
 def get_all_members():
     """Get all members from the database."""
     db = get_db()
@@ -42,8 +54,35 @@ def create_member(name, major=None, age=None, bio=None, face_encoding=None, imag
         (name, major, age, bio, face_encoding, image_path)
     )
     db.commit()
+    invalidate_cache()
     return cursor.lastrowid
 
+def create_members_batch(members):
+    """Create many members in a single transaction.
+    
+    Args:
+        members: List of dicts with name and optionally major, age, bio,
+                 face_encoding and image_path
+        
+    Returns:
+        List of new member IDs, in the same order
+    """
+    db = get_db()
+    member_ids = []
+    
+    with db:
+        for member in members:
+            cursor = db.execute(
+                'INSERT INTO members (name, major, age, bio, face_encoding, image_path)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (member['name'], member.get('major'), member.get('age'), member.get('bio'),
+                 member.get('face_encoding'), member.get('image_path'))
+            )
+            member_ids.append(cursor.lastrowid)
+    
+    invalidate_cache()
+    return member_ids
+
 def update_member(member_id, name=None, major=None, age=None, bio=None, face_encoding=None, image_path=None):
     """Update a member's information."""
     db = get_db()
@@ -60,17 +99,11 @@ def update_member(member_id, name=None, major=None, age=None, bio=None, face_enc
     bio = bio if bio is not None else member['bio']
     image_path = image_path if image_path is not None else member['image_path']
     
-    # Get face encoding separately since it's a BLOB
-    if face_encoding is None:
-        face_encoding_db = db.execute(
-            'SELECT face_encoding FROM members WHERE id = ?',
-            (member_id,)
-        ).fetchone()
-        face_encoding = face_encoding_db['face_encoding'] if face_encoding_db else None
-    
+    # Keep the stored face encoding as-is unless a new one is given (an
+    # unmigrated legacy blob reads as None and mustn't be overwritten)
     db.execute(
         'UPDATE members'
-        ' SET name = ?, major = ?, age = ?, bio = ?, face_encoding = ?, image_path = ?'
+        ' SET name = ?, major = ?, age = ?, bio = ?, face_encoding = COALESCE(?, face_encoding), image_path = ?'
         ' WHERE id = ?',
         (name, major, age, bio, face_encoding, image_path, member_id)
     )
@@ -82,6 +115,7 @@ def delete_member(member_id):
     db = get_db()
     db.execute('DELETE FROM members WHERE id = ?', (member_id,))
     db.commit()
+    invalidate_cache()
 
 def increment_meeting_count(member_id):
     """Increment a member's meeting count."""
@@ -92,36 +126,100 @@ def increment_meeting_count(member_id):
     )
     db.commit()
 
-def get_all_face_encodings():
-    """Get all face encodings and names for recognition."""
-    from app.database import convert_array
-    import pickle
+def load_encoding_matrix():
+    """Load every stored face encoding into one contiguous matrix.
+    
+    Returns:
+        encodings: float32 numpy array of shape (n, 128)
+        names: List of member names, one per row
+        member_ids: List of member IDs, one per row
+    """
+    from app.database import decode_encoding_matrix
     
     db = get_db()
+    # CAST drops the declared type, so rows arrive as raw bytes instead of
+    # being decoded one at a time by the "array" converter
     faces = db.execute(
-        'SELECT id, name, face_encoding FROM members WHERE face_encoding IS NOT NULL'
+        'SELECT id, name, CAST(face_encoding AS BLOB) AS blob'
+        ' FROM members WHERE face_encoding IS NOT NULL'
+        ' ORDER BY id'
     ).fetchall()
     
-    encodings = []
-    names = []
-    member_ids = []
+    try:
+        encodings = decode_encoding_matrix([face['blob'] for face in faces])
+    except Exception as e:
+        # Fall back to decoding row by row so one bad blob doesn't hide the rest
+        print(f"Error decoding face encodings in bulk: {e}")
+        return _load_encodings_individually(faces)
+    
+    return encodings, [face['name'] for face in faces], [face['id'] for face in faces]
+
+def _load_encodings_individually(faces):
+    """Decode encodings one row at a time, skipping rows that fail."""
+    from app.database import decode_encoding_matrix
     
+    blobs, names, member_ids = [], [], []
     for face in faces:
         try:
-            # Get the face encoding and ensure it's a numpy array
-            encoding = face['face_encoding']
-            
-            # If it's already a numpy array, use it directly
-            # If it's stored as a binary blob, convert it
-            if isinstance(encoding, bytes):
-                encoding = convert_array(encoding)
-                
-            encodings.append(encoding)
-            names.append(face['name'])
-            member_ids.append(face['id'])
+            decode_encoding_matrix([face['blob']])
         except Exception as e:
             print(f"Error processing face encoding for {face['name']}: {e}")
-            # Skip this face if there's an error
             continue
+        blobs.append(face['blob'])
+        names.append(face['name'])
+        member_ids.append(face['id'])
     
-    return encodings, names, member_ids
\ No newline at end of file
+    return decode_encoding_matrix(blobs), names, member_ids
+
+def get_all_face_encodings():
+    """Get all face encodings and names for recognition."""
+    encodings, names, member_ids = load_encoding_matrix()
+    return list(encodings), names, member_ids
+
+def ensure_image_variants_table():
+    """Create the image variants table if it is missing."""
+    db = get_db()
+    db.executescript(IMAGE_VARIANTS_SQL)
+
+def save_image_variants(entries):
+    """Record the derivatives of one or more photos in a single transaction.
+    
+    Args:
+        entries: List of (image_path, {size name: derivative path})
+    """
+    ensure_image_variants_table()
+    db = get_db()
+    with db:
+        db.executemany(
+            'INSERT OR REPLACE INTO member_image_variants (image_path, avatar, card, full)'
+            ' VALUES (?, ?, ?, ?)',
+            [(image_path, variants.get('avatar'), variants.get('card'), variants.get('full'))
+             for image_path, variants in entries]
+        )
+
+def get_image_variants():
+    """Return {image_path: {size name: derivative path}} for every photo with derivatives."""
+    db = get_db()
+    try:
+        rows = db.execute('SELECT image_path, avatar, card, full FROM member_image_variants').fetchall()
+    except sqlite3.OperationalError:
+        # No derivatives have been generated yet
+        return {}
+    
+    return {
+        row['image_path']: {size: row[size] for size in ('avatar', 'card', 'full') if row[size]}
+        for row in rows
+    }
+
+def get_image_variant(image_path, size):
+    """Return the derivative path of one photo in one size, or None."""
+    if size not in ('avatar', 'card', 'full'):
+        raise ValueError(f"Unknown image size: {size}")
+    db = get_db()
+    try:
+        row = db.execute(
+            f'SELECT {size} FROM member_image_variants WHERE image_path = ?', (image_path,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[size] if row else None
@@ -0,0 +1,150 @@
+from app.database import get_db
+from io import BytesIO
+import numpy as np
+
+class AttendanceMatrix:
+    """Members x meetings attendance grid stored as a packed bitset.
+
+    Row i belongs to member_ids[i], bit j of that row to meeting_ids[j].
+    Bits are packed eight meetings per byte in np.packbits order, so a
+    2,000 member by 500 meeting grid takes about 125 KB.
+    """
+
+    def __init__(self, members, meetings, bits):
+        self.member_ids = np.array([m['id'] for m in members], dtype=np.int64)
+        self.member_names = [m['name'] for m in members]
+        self.member_majors = [m['major'] for m in members]
+        self.meeting_ids = np.array([m['id'] for m in meetings], dtype=np.int64)
+        self.meeting_titles = [m['title'] for m in meetings]
+        self.meeting_starts = [m['start_time'] for m in meetings]
+        self.bits = bits
+
+    @property
+    def shape(self):
+        """Return (member count, meeting count)."""
+        return len(self.member_ids), len(self.meeting_ids)
+
+    def row(self, index):
+        """Return one member's attendance as a 0/1 uint8 vector."""
+        return np.unpackbits(self.bits[index], count=self.shape[1])
+
+    def to_dense(self):
+        """Return the full grid as a boolean array."""
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
+
+    def iter_csv_rows(self):
+        """Yield the header and one row per member, unpacking a row at a time.
+
+        Yields:
+            Lists ready for csv.writer
+        """
+        header = ['Member ID', 'Name', 'Major']
+        for title, start in zip(self.meeting_titles, self.meeting_starts):
+            header.append(f"{title} ({start.strftime('%Y-%m-%d')})")
+        header.append('Total')
+        yield header
+
+        for i in range(self.shape[0]):
+            attended = self.row(i)
+            yield ([int(self.member_ids[i]), self.member_names[i], self.member_majors[i] or '']
+                   + attended.tolist() + [int(attended.sum())])
+
+    def to_npz(self):
+        """Serialize the grid to compressed .npz bytes.
+
+        The archive holds the packed bits plus the id, name and date
+        vectors needed to label them; use np.unpackbits(bits, axis=1,
+        count=len(meeting_ids)) to expand it.
+        """
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            bits=self.bits,
+            member_ids=self.member_ids,
+            member_names=np.array(self.member_names, dtype=str),
+            meeting_ids=self.meeting_ids,
+            meeting_titles=np.array(self.meeting_titles, dtype=str),
+            meeting_starts=np.array([s.isoformat() for s in self.meeting_starts], dtype=str),
+        )
+        return buffer.getvalue()
+
+def build_attendance_matrix(start_date=None, end_date=None, member_ids=None, chunk_size=10000):
+    """Build the members x meetings attendance matrix in one pass.
+
+    Args:
+        start_date: Only include meetings starting at or after this datetime
+        end_date: Only include meetings starting before this datetime
+        member_ids: Optional iterable of member IDs to restrict the rows to
+        chunk_size: Number of attendance rows pulled from the cursor at a time
+
+    Returns:
+        AttendanceMatrix
+    """
+    db = get_db()
+
+    where = []
+    params = []
+    if start_date is not None:
+        where.append('start_time >= ?')
+        params.append(start_date)
+    if end_date is not None:
+        where.append('start_time < ?')
+        params.append(end_date)
+    where_sql = (' WHERE ' + ' AND '.join(where)) if where else ''
+
+    meetings = db.execute(
+        'SELECT id, title, start_time FROM meetings' + where_sql +
+        ' ORDER BY start_time, id',
+        params
+    ).fetchall()
+
+    members = db.execute(
+        'SELECT id, name, major FROM members ORDER BY name'
+    ).fetchall()
+    if member_ids is not None:
+        wanted = set(int(m) for m in member_ids)
+        members = [m for m in members if m['id'] in wanted]
+
+    n_members, n_meetings = len(members), len(meetings)
+    bits = np.zeros((n_members, (n_meetings + 7) // 8), dtype=np.uint8)
+    matrix = AttendanceMatrix(members, meetings, bits)
+
+    if n_members == 0 or n_meetings == 0:
+        return matrix
+
+    # Sorted lookups let whole chunks of ids be mapped to grid positions at once
+    member_order = np.argsort(matrix.member_ids)
+    sorted_members = matrix.member_ids[member_order]
+    meeting_order = np.argsort(matrix.meeting_ids)
+    sorted_meetings = matrix.meeting_ids[meeting_order]
+
+    cursor = db.cursor()
+    cursor.row_factory = None  # Plain tuples convert straight to numpy
+    cursor.execute(
+        'SELECT a.member_id, a.meeting_id FROM attendance a'
+        ' JOIN meetings ON a.meeting_id = meetings.id' + where_sql,
+        params
+    )
+
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        pairs = np.array(chunk, dtype=np.int64).reshape(-1, 2)
+
+        rows = _positions(pairs[:, 0], sorted_members, member_order)
+        cols = _positions(pairs[:, 1], sorted_meetings, meeting_order)
+        keep = (rows >= 0) & (cols >= 0)
+        rows, cols = rows[keep], cols[keep]
+
+        # Set bit (col % 8) of byte (col // 8), most significant bit first like np.packbits
+        np.bitwise_or.at(bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+
+    return matrix
+
+def _positions(ids, sorted_ids, order):
+    """Map ids to their index in the original (unsorted) id vector, -1 if absent."""
+    idx = np.searchsorted(sorted_ids, ids)
+    idx = np.minimum(idx, len(sorted_ids) - 1)
+    found = sorted_ids[idx] == ids
+    return np.where(found, order[idx], -1)
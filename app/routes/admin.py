@@ -1,11 +1,15 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for, current_app
+    Blueprint, flash, g, redirect, render_template, request, url_for, current_app,
+    Response
 )
 from werkzeug.exceptions import abort
 from app.database import get_db
 from app.database.members import get_all_members
 from app.database.meetings import get_all_meetings, get_active_meeting
+from app.database.analytics import get_attendance_analytics
 import os
+import uuid
+from io import StringIO
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -38,13 +42,29 @@ def dashboard():
         ' ORDER BY meeting_count DESC LIMIT 5'
     ).fetchall()
     
+    # Attendance analytics (cached until attendance changes)
+    analytics = get_attendance_analytics()
+    recent_meetings = analytics['meetings'][-10:][::-1]
+    
+    # Longest current streaks, joined with member names for display
+    names = {m['id']: m['name'] for m in get_all_members()}
+    streak_leaders = sorted(
+        ((names.get(member_id), stats) for member_id, stats in analytics['members'].items()
+         if stats['current_streak'] > 0 and member_id in names),
+        key=lambda item: item[1]['current_streak'],
+        reverse=True
+    )[:5]
+    
     return render_template('admin/dashboard.html', 
                            member_count=member_count,
                            meeting_count=meeting_count,
                            attendance_count=attendance_count,
                            active_meeting=active_meeting,
                            recent_attendees=recent_attendees,
-                           top_attendees=top_attendees)
+                           top_attendees=top_attendees,
+                           recent_meetings=recent_meetings,
+                           streak_leaders=streak_leaders,
+                           arrivals=analytics['arrivals'])
 
 @bp.route('/database')
 def database():
@@ -68,4 +88,81 @@ def reset_database():
     except Exception as e:
         flash(f'Error resetting database: {e}', 'danger')
     
-    return redirect(url_for('admin.database'))
\ No newline at end of file
+    return redirect(url_for('admin.database'))
+
+@bp.route('/import', methods=('GET', 'POST'))
+def import_members():
+    """Bulk-create members from a CSV file and a zip of photos."""
+    from app.camera.bulk_import import start_import_job
+    
+    if request.method == 'POST':
+        csv_file = request.files.get('csv_file')
+        photos = request.files.get('photos')
+        
+        if not csv_file or not csv_file.filename:
+            flash('Please choose a CSV file.', 'danger')
+            return render_template('admin/import.html')
+        if photos and photos.filename and not photos.filename.lower().endswith('.zip'):
+            flash('Photos must be uploaded as a zip archive.', 'danger')
+            return render_template('admin/import.html')
+        
+        # The import outlives the request, so the uploads are kept until it finishes
+        directory = os.path.join(current_app.instance_path, 'imports', uuid.uuid4().hex)
+        os.makedirs(directory)
+        csv_path = os.path.join(directory, 'members.csv')
+        csv_file.save(csv_path)
+        photos_path = None
+        if photos and photos.filename:
+            photos_path = os.path.join(directory, 'photos.zip')
+            photos.save(photos_path)
+        
+        job_id = start_import_job(current_app._get_current_object(), directory, csv_path, photos_path)
+        return redirect(url_for('admin.import_status', job_id=job_id))
+    
+    return render_template('admin/import.html')
+
+@bp.route('/import/<job_id>')
+def import_status(job_id):
+    """Show the progress or report of a bulk import."""
+    from app.camera.bulk_import import import_jobs
+    
+    job = import_jobs.get(job_id)
+    if job is None:
+        abort(404, "Import not found.")
+    
+    counts = {}
+    for entry in job['report'] or []:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    
+    return render_template('admin/import_status.html', job=job, counts=counts)
+
+@bp.route('/import/<job_id>/report.csv')
+def import_report(job_id):
+    """Download the per-row report of a finished import."""
+    from app.camera.bulk_import import import_jobs, write_report
+    
+    job = import_jobs.get(job_id)
+    if job is None or job['report'] is None:
+        abort(404, "Report not found.")
+    
+    output = StringIO()
+    write_report(job['report'], output)
+    response = Response(output.getvalue(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=import_report.csv'
+    return response
+
+
+@bp.route('/reencode', methods=('GET', 'POST'))
+def reencode():
+    """Re-encode every member's face from their stored photo."""
+    from app.camera.reencode import reencode_job, start_reencode_job
+    
+    if request.method == 'POST':
+        restart = request.form.get('restart') == 'on'
+        if start_reencode_job(current_app._get_current_object(), restart=restart):
+            flash('Re-encoding started. Recognition uses the current faces until it finishes.', 'info')
+        else:
+            flash('Re-encoding is already running.', 'warning')
+        return redirect(url_for('admin.reencode'))
+    
+    return render_template('admin/reencode.html', job=reencode_job)
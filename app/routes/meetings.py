@@ -1,14 +1,23 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, flash, g, redirect, render_template, request, url_for,
+    Response, stream_with_context, current_app
 )
 from werkzeug.exceptions import abort
-from datetime import datetime
+from werkzeug.utils import secure_filename
+from datetime import datetime, timedelta
+import csv
+from io import StringIO
 from app.database.meetings import (
     get_all_meetings, get_meeting, create_meeting, update_meeting, 
-    delete_meeting, end_meeting, get_active_meeting
+    delete_meeting, end_meeting, get_active_meeting, get_meeting_roster,
+    set_meeting_roster, get_expected_attendees
 )
-from app.database.attendance import get_meeting_attendance
-from app.database.members import get_member
+from app.database.attendance import (
+    get_meeting_attendance, iter_meeting_attendance, iter_attendance_between,
+    record_attendance_batch
+)
+from app.database.members import get_member, get_all_members
+from app.database.pivot import build_attendance_matrix
 
 bp = Blueprint('meetings', __name__, url_prefix='/meetings')
 
@@ -28,7 +37,14 @@ def view(id):
     # Get attendees for this meeting
     attendees = get_meeting_attendance(id)
     
-    return render_template('meetings/view.html', meeting=meeting, attendees=attendees)
+    # Members the cameras match first while this meeting is active
+    expected, expected_source = get_expected_attendees(
+        id, history=current_app.config['ROSTER_HISTORY_MEETINGS'],
+        min_attended=current_app.config['ROSTER_MIN_ATTENDED'])
+    roster = get_meeting_roster(id)
+    
+    return render_template('meetings/view.html', meeting=meeting, attendees=attendees,
+                           expected_count=len(expected), expected_source=expected_source, roster=roster)
 
 @bp.route('/create', methods=('GET', 'POST'))
 def create():
@@ -46,6 +62,7 @@ def create():
             flash(error, 'danger')
         else:
             meeting_id = create_meeting(title, description)
+            refresh_camera_roster()
             flash(f'Meeting "{title}" was successfully created and started.', 'success')
             return redirect(url_for('meetings.view', id=meeting_id))
             
@@ -71,6 +88,9 @@ def edit(id):
             flash(error, 'danger')
         else:
             update_meeting(id, title, description)
+            # A new title can match a different series of past meetings
+            if meeting['end_time'] is None:
+                refresh_camera_roster()
             flash(f'Meeting "{title}" was successfully updated.', 'success')
             return redirect(url_for('meetings.view', id=id))
             
@@ -84,6 +104,8 @@ def delete(id):
         abort(404, f"Meeting id {id} doesn't exist.")
         
     delete_meeting(id)
+    # The active meeting, or the history expected attendees come from, may have changed
+    refresh_camera_roster()
     flash(f'Meeting "{meeting["title"]}" was successfully deleted.', 'success')
     return redirect(url_for('meetings.list'))
 
@@ -98,10 +120,94 @@ def end(id):
         flash(f'Meeting "{meeting["title"]}" is already ended.', 'info')
     else:
         end_meeting(id)
+        refresh_camera_roster()
         flash(f'Meeting "{meeting["title"]}" was successfully ended.', 'success')
         
     return redirect(url_for('meetings.view', id=id))
 
+@bp.route('/<int:id>/roster', methods=('POST',))
+def roster(id):
+    """Set the members expected at a meeting (empty to use attendance history)."""
+    meeting = get_meeting(id)
+    if meeting is None:
+        abort(404, f"Meeting id {id} doesn't exist.")
+        
+    text = request.form.get('member_ids', '').replace(',', ' ')
+    member_ids = sorted({int(value) for value in text.split() if value.isdigit()})
+    known = {member['id'] for member in get_all_members()}
+    unknown = [member_id for member_id in member_ids if member_id not in known]
+    if unknown:
+        flash(f'Unknown member IDs: {", ".join(map(str, unknown))}', 'danger')
+        return redirect(url_for('meetings.view', id=id))
+        
+    set_meeting_roster(id, member_ids)
+    if meeting['end_time'] is None:
+        refresh_camera_roster()
+    if member_ids:
+        flash(f'Roster saved with {len(member_ids)} members.', 'success')
+    else:
+        flash('Roster cleared; expected attendees come from similar past meetings.', 'success')
+    return redirect(url_for('meetings.view', id=id))
+
+@bp.route('/<int:id>/photos', methods=('POST',))
+def upload_photos(id):
+    """Find members in uploaded group photos and show them for review."""
+    from app.camera.group_photos import decode_upload, recognize_group_photos
+    from app.database.gallery import load_gallery
+    
+    meeting = get_meeting(id)
+    if meeting is None:
+        abort(404, f"Meeting id {id} doesn't exist.")
+        
+    # Decode straight from the upload; the photos are never written to disk
+    images = []
+    for upload in request.files.getlist('photos'):
+        if not upload.filename:
+            continue
+        image = decode_upload(upload.read())
+        if image is None:
+            flash(f'"{upload.filename}" is not an image and was skipped.', 'warning')
+            continue
+        images.append((secure_filename(upload.filename), image))
+        
+    if not images:
+        flash('Please choose at least one photo.', 'danger')
+        return redirect(url_for('meetings.view', id=id))
+        
+    faces = recognize_group_photos(
+        images, load_gallery(),
+        threshold=request.form.get('threshold', default=0.6, type=float),
+        workers=current_app.config['GROUP_PHOTO_WORKERS']
+    )
+    
+    members = get_all_members()
+    names = {member['id']: member['name'] for member in members}
+    attending = {attendee['member_id'] for attendee in get_meeting_attendance(id)}
+    for face in faces:
+        face['name'] = names.get(face['member_id'])
+        face['already_recorded'] = face['member_id'] in attending
+        
+    matched = sum(1 for face in faces if face['member_id'] is not None)
+    return render_template('meetings/photo_review.html', meeting=meeting, faces=faces,
+                           members=members, matched=matched, photo_count=len(images))
+
+@bp.route('/<int:id>/photos/confirm', methods=('POST',))
+def confirm_photos(id):
+    """Record attendance for the members confirmed on the review page."""
+    meeting = get_meeting(id)
+    if meeting is None:
+        abort(404, f"Meeting id {id} doesn't exist.")
+        
+    member_ids = {int(value) for value in request.form.getlist('member_id') if value.isdigit()}
+    if not member_ids:
+        flash('No members were confirmed.', 'info')
+        return redirect(url_for('meetings.view', id=id))
+        
+    now = datetime.now()
+    recorded = record_attendance_batch(id, {member_id: now for member_id in member_ids})
+    flash(f'Recorded attendance for {recorded} members from the group photos.', 'success')
+    return redirect(url_for('meetings.view', id=id))
+
 @bp.route('/active')
 def active():
     """Show the currently active meeting, if any."""
@@ -114,4 +220,137 @@ def active():
     # Get attendees for this meeting
     attendees = get_meeting_attendance(meeting['id'])
     
-    return render_template('meetings/active.html', meeting=meeting, attendees=attendees)
\ No newline at end of file
+    return render_template('meetings/active.html', meeting=meeting, attendees=attendees)
+
+@bp.route('/export/<int:id>')
+def export(id):
+    """Stream a meeting's attendance as a CSV download."""
+    meeting = get_meeting(id)
+    if meeting is None:
+        abort(404, f"Meeting id {id} doesn't exist.")
+    
+    header = ['Name', 'Major', 'Age', 'Check-in Time']
+    rows = (
+        [a['name'], a['major'] or '', a['age'] or '', a['timestamp']]
+        for a in iter_meeting_attendance(id)
+    )
+    
+    filename = f"attendance_{meeting['title'].replace(' ', '_')}_{meeting['start_time'].strftime('%Y%m%d')}.csv"
+    return csv_response(header, rows, filename)
+
+@bp.route('/export')
+def export_range():
+    """Stream attendance for every meeting in a date range as one CSV.
+    
+    Query parameters:
+        start: First day of the range (YYYY-MM-DD)
+        end: Last day of the range, inclusive (YYYY-MM-DD)
+    """
+    start_date, end_date, error = parse_date_range(request.args)
+    if error is None and (start_date is None or end_date is None):
+        error = 'Please provide a start and end date for the export.'
+    if error is not None:
+        flash(error, 'danger')
+        return redirect(url_for('meetings.list'))
+    
+    header = ['Meeting ID', 'Meeting', 'Meeting Start', 'Name', 'Major', 'Age', 'Check-in Time']
+    rows = (
+        [a['meeting_id'], a['title'], a['start_time'],
+         a['name'], a['major'] or '', a['age'] or '', a['timestamp']]
+        for a in iter_attendance_between(start_date, end_date)
+    )
+    
+    filename = f"attendance_{request.args['start']}_to_{request.args['end']}.csv"
+    return csv_response(header, rows, filename)
+
+@bp.route('/matrix')
+def matrix():
+    """Export the members x meetings attendance grid.
+    
+    Query parameters:
+        start, end: Optional date range (YYYY-MM-DD, end inclusive)
+        members: Optional comma separated list of member IDs
+        format: 'csv' (default) or 'npz'
+    """
+    start_date, end_date, error = parse_date_range(request.args)
+    
+    member_ids = None
+    if request.args.get('members'):
+        try:
+            member_ids = [int(m) for m in request.args['members'].split(',') if m.strip()]
+        except ValueError:
+            error = 'Member IDs must be numbers.'
+    
+    if error is not None:
+        flash(error, 'danger')
+        return redirect(url_for('meetings.list'))
+    
+    grid = build_attendance_matrix(start_date, end_date, member_ids)
+    
+    if request.args.get('format', 'csv') == 'npz':
+        response = Response(grid.to_npz(), mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = 'attachment; filename="attendance_matrix.npz"'
+        return response
+    
+    rows = grid.iter_csv_rows()
+    header = next(rows)
+    return csv_response(header, rows, 'attendance_matrix.csv')
+
+def refresh_camera_roster():
+    """Point the cameras' first matching stage at the active meeting's expected attendees."""
+    from app.camera.routes import get_camera_manager
+    
+    try:
+        get_camera_manager().refresh_roster()
+    except RuntimeError as e:
+        # The daemon being down isn't fatal; it builds the roster when it starts
+        print(f"Error refreshing camera roster: {e}")
+
+def parse_date_range(args):
+    """Read optional start/end dates (YYYY-MM-DD) from request arguments.
+    
+    Returns:
+        (start_date, end_date, error) where end_date is the day after the
+        requested end so it can be used as an exclusive bound
+    """
+    try:
+        start_date = datetime.strptime(args['start'], '%Y-%m-%d') if args.get('start') else None
+        end_date = datetime.strptime(args['end'], '%Y-%m-%d') + timedelta(days=1) if args.get('end') else None
+    except ValueError:
+        return None, None, 'Dates must be in YYYY-MM-DD format.'
+    
+    if start_date and end_date and end_date <= start_date:
+        return None, None, 'The end date must not be before the start date.'
+    
+    return start_date, end_date, None
+
+def csv_response(header, rows, filename):
+    """Build a streaming CSV download response.
+    
+    Args:
+        header: List of column names
+        rows: Iterable of row lists, consumed lazily while the response is sent
+        filename: Name suggested to the browser
+    """
+    response = Response(stream_with_context(generate_csv(header, rows)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(filename)}"'
+    return response
+
+def generate_csv(header, rows, batch_size=500):
+    """Generate CSV text in small chunks.
+    
+    A single line buffer is reused, so memory stays flat no matter how
+    many rows the export produces.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    
+    yield buffer.getvalue()
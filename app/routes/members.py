@@ -1,16 +1,20 @@
 import os
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for, current_app
+    Blueprint, flash, g, redirect, render_template, request, url_for, current_app, jsonify,
+    send_from_directory
 )
 from werkzeug.exceptions import abort
 from werkzeug.utils import secure_filename
-import face_recognition
-import cv2
 import numpy as np
 from app.camera.camera import Camera
+from app.camera.duplicates import DuplicateFaceError, check_duplicate_face
+from app.camera.enrollment import get_enrollment_queue
+from app.camera.member_images import DERIVED_DIR, generate_member_derivatives
 from app.database.members import (
     get_all_members, get_member, create_member, update_member, delete_member
 )
+from app.database.analytics import get_member_analytics
+from app.database.gallery import load_gallery
 
 bp = Blueprint('members', __name__, url_prefix='/members')
 
@@ -20,6 +24,26 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_photo(filename, data):
+    """Write an uploaded profile photo to the upload folder."""
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+def queue_face_extraction(member_id, data):
+    """Hand a profile photo to the enrollment queue.
+    
+    Face detection and encoding take seconds on a phone photo, so they run
+    in the background; the member page polls the job until it finishes.
+    
+    Returns:
+        int: Job ID
+    """
+    queue = get_enrollment_queue(current_app.config['ENROLLMENT_WORKERS'])
+    # Ticked when staff confirm a look-alike is a different person
+    allow_duplicate = request.form.get('allow_duplicate_face') == 'on'
+    return queue.submit(current_app._get_current_object(), member_id, data, allow_duplicate)
+
 @bp.route('/')
 def list():
     """Show all members."""
@@ -32,7 +56,10 @@ def view(id):
     member = get_member(id)
     if member is None:
         abort(404, f"Member id {id} doesn't exist.")
-    return render_template('members/view.html', member=member)
+    stats = get_member_analytics(id)
+    # Face extraction job started by create/edit, polled by the page
+    job_id = request.args.get('job', type=int)
+    return render_template('members/view.html', member=member, stats=stats, job_id=job_id)
 
 @bp.route('/create', methods=('GET', 'POST'))
 def create():
@@ -44,6 +71,7 @@ def create():
         bio = request.form['bio']
         face_encoding = None
         image_path = None
+        photo_data = None  # Photo bytes to extract a face encoding from
         
         # Handle profile image upload
         if 'profile_image' in request.files:
@@ -53,20 +81,9 @@ def create():
                 # Create a unique filename with member name
                 file_ext = os.path.splitext(filename)[1]
                 filename = f"{name.replace(' ', '_').lower()}{file_ext}"
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
+                photo_data = file.read()
+                save_photo(filename, photo_data)
                 image_path = filename
-                
-                # Generate face encoding from the uploaded image
-                try:
-                    image = face_recognition.load_image_file(filepath)
-                    face_encodings = face_recognition.face_encodings(image)
-                    if face_encodings:
-                        face_encoding = face_encodings[0]
-                    else:
-                        flash('No face detected in the uploaded image.', 'danger')
-                except Exception as e:
-                    flash(f'Error processing face: {e}', 'danger')
         
         error = None
         
@@ -78,7 +95,8 @@ def create():
         else:
             member_id = create_member(name, major, age, bio, face_encoding, image_path)
             flash(f'Member "{name}" was successfully created.', 'success')
-            return redirect(url_for('members.view', id=member_id))
+            job_id = queue_face_extraction(member_id, photo_data) if photo_data else None
+            return redirect(url_for('members.view', id=member_id, job=job_id))
             
     return render_template('members/create.html')
 
@@ -96,6 +114,7 @@ def edit(id):
         bio = request.form['bio']
         face_encoding = None
         image_path = member['image_path']
+        photo_data = None  # Photo bytes to extract a face encoding from
         
         # Check for captured image data first (from webcam)
         if 'captured_image_data' in request.form and request.form['captured_image_data']:
@@ -105,27 +124,15 @@ def edit(id):
                     # Extract the base64 data
                     image_data = captured_data.split(',')[1]
                     import base64
-                    decoded_data = base64.b64decode(image_data)
+                    photo_data = base64.b64decode(image_data)
                     
                     # Create a unique filename
                     filename = f"{name.replace(' ', '_').lower()}_webcam.jpg"
-                    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                    
-                    # Save the image file
-                    with open(filepath, 'wb') as f:
-                        f.write(decoded_data)
-                    
+                    save_photo(filename, photo_data)
                     image_path = filename
                     
-                    # Generate face encoding from the captured image
-                    image = face_recognition.load_image_file(filepath)
-                    face_encodings = face_recognition.face_encodings(image)
-                    if face_encodings:
-                        face_encoding = face_encodings[0]
-                    else:
-                        flash('No face detected in the captured image.', 'warning')
-                    
                 except Exception as e:
+                    photo_data = None
                     flash(f'Error processing captured image: {e}', 'danger')
         
         # Handle profile image upload - only if no webcam image
@@ -136,20 +143,9 @@ def edit(id):
                 # Create a unique filename with member name
                 file_ext = os.path.splitext(filename)[1]
                 filename = f"{name.replace(' ', '_').lower()}{file_ext}"
-                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
+                photo_data = file.read()
+                save_photo(filename, photo_data)
                 image_path = filename
-                
-                # Generate face encoding from the uploaded image
-                try:
-                    image = face_recognition.load_image_file(filepath)
-                    face_encodings = face_recognition.face_encodings(image)
-                    if face_encodings:
-                        face_encoding = face_encodings[0]
-                    else:
-                        flash('No face detected in the uploaded image.', 'warning')
-                except Exception as e:
-                    flash(f'Error processing face: {e}', 'danger')
         
         error = None
         
@@ -161,10 +157,32 @@ def edit(id):
         else:
             update_member(id, name, major, age, bio, face_encoding, image_path)
             flash(f'Member "{name}" was successfully updated.', 'success')
-            return redirect(url_for('members.view', id=id))
+            job_id = queue_face_extraction(id, photo_data) if photo_data else None
+            return redirect(url_for('members.view', id=id, job=job_id))
             
     return render_template('members/edit.html', member=member)
 
+@bp.route('/images/<path:filename>')
+def image(filename):
+    """Serve a sized member photo.
+    
+    Derivative names contain a hash of their contents, so browsers may keep
+    them for a year without checking back.
+    """
+    if not filename.startswith(DERIVED_DIR + '/'):
+        abort(404)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, max_age=31536000)
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Return the status of a face extraction job."""
+    job = get_enrollment_queue(current_app.config['ENROLLMENT_WORKERS']).get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
 @bp.route('/delete/<int:id>', methods=('POST',))
 def delete(id):
     """Delete a member."""
@@ -195,12 +213,23 @@ def enroll():
                 face_encoding = np.fromstring(face_encoding_str, sep=',')
             except Exception as e:
                 flash(f'Error processing face data: {e}', 'danger')
+        
+        error = None
+        
+        if not name:
+            error = 'Name is required.'
+        elif face_encoding is not None and request.form.get('allow_duplicate_face') != 'on':
+            # Same look-alike check as photo enrollment; ticking "different person" overrides it
+            try:
+                check_duplicate_face(face_encoding, load_gallery(), current_app.config['DUPLICATE_FACE_THRESHOLD'])
+            except DuplicateFaceError as e:
+                error = f'{e}. If this is a different person, enroll again with "different person" ticked.'
                 
         # Save the camera frame as the profile image
         image_path = None
         frame_data = request.form.get('frame_data')
         
-        if frame_data:
+        if frame_data and error is None:
             try:
                 # Create a unique filename with member name
                 filename = f"{name.replace(' ', '_').lower()}.jpg"
@@ -211,14 +240,10 @@ def enroll():
                     f.write(frame_data.encode('latin1'))
                 
                 image_path = filename
+                generate_member_derivatives(image_path, frame_data.encode('latin1'))
             except Exception as e:
                 flash(f'Error saving image: {e}', 'danger')
         
-        error = None
-        
-        if not name:
-            error = 'Name is required.'
-        
         if error is not None:
             flash(error, 'danger')
         else:
@@ -0,0 +1,6 @@
+from app import create_app
+from app.camera.asgi import create_asgi_app
+
+# Serve with an ASGI server for many concurrent stream viewers, e.g.
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+app = create_asgi_app(create_app())
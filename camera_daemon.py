@@ -0,0 +1,11 @@
+import argparse
+from app import create_app
+from app.camera.daemon import run_daemon
+
+app = create_app()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the cameras and face recognition for the web workers")
+    parser.add_argument('--socket', help="Unix socket path (default: CAMERA_DAEMON_SOCKET or instance/camera.sock)")
+    args = parser.parse_args()
+    run_daemon(app, args.socket)